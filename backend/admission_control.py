@@ -0,0 +1,200 @@
+"""
+Admission control for outbound calls
+
+`AdmissionLimiter` caps how many calls to a dependency (the Gemini API) are
+in flight at once. Callers beyond the cap wait in a short queue for up to
+`max_wait` seconds; when the queue is full, or the wait runs out, the call
+is rejected straight away with `AdmissionRejected` so the caller can answer
+with its local fallback instead of piling more load on a provider that is
+already rate limiting.
+
+Priority callers (high-severity crisis messages) are queued ahead of
+routine ones and are never rejected because the queue is full, only when
+their wait runs out.
+
+The limiter is thread-safe and works from both blocking code and any event
+loop, since the Gemini client is used from request handlers and from
+worker threads.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from config import GEMINI_MAX_CONCURRENCY, GEMINI_ADMISSION_QUEUE_SIZE, GEMINI_ADMISSION_WAIT_SECONDS
+
+# Wait-time samples kept for percentiles
+_SAMPLE_WINDOW = 1024
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call is shed instead of admitted"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+
+class _Waiter:
+    __slots__ = ("notify", "priority", "granted")
+
+    def __init__(self, notify, priority: bool):
+        self.notify = notify
+        self.priority = priority
+        self.granted = False
+
+
+class AdmissionLimiter:
+    """Bounded concurrency with a short wait queue; excess load is rejected"""
+
+    def __init__(self, name: str, capacity: int = GEMINI_MAX_CONCURRENCY,
+                 max_queue: int = GEMINI_ADMISSION_QUEUE_SIZE,
+                 max_wait: float = GEMINI_ADMISSION_WAIT_SECONDS):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max(0.0, max_wait)
+        self.in_use = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=_SAMPLE_WINDOW)
+        self._stats = {
+            "admitted": 0,
+            "queued": 0,
+            "max_queue_depth": 0,
+            "shed_queue_full": 0,
+            "shed_wait_timeout": 0,
+        }
+
+    def _try_enter(self, waiter: _Waiter, priority: bool) -> Optional[bool]:
+        """Take a free slot (True), join the queue (None) or reject (False); caller holds the lock"""
+        if self.in_use < self.capacity and not self._queue:
+            self.in_use += 1
+            return True
+        if not priority and len(self._queue) >= self.max_queue:
+            self._stats["shed_queue_full"] += 1
+            return False
+        if priority:
+            # Behind earlier priority callers, ahead of all routine ones
+            position = next((i for i, queued in enumerate(self._queue) if not queued.priority), len(self._queue))
+            self._queue.insert(position, waiter)
+        else:
+            self._queue.append(waiter)
+        self._stats["queued"] += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+        return None
+
+    def _give_up(self, waiter: _Waiter) -> bool:
+        """Leave the queue after a timeout or cancellation; True if the slot was granted meanwhile"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._queue.remove(waiter)
+            return False
+
+    def _admitted(self, waited: float):
+        with self._lock:
+            self._stats["admitted"] += 1
+            self._waits.append(waited)
+
+    def _timed_out(self):
+        with self._lock:
+            self._stats["shed_wait_timeout"] += 1
+        raise AdmissionRejected(f"{self.name}: no slot within {self.max_wait}s")
+
+    def release(self):
+        """Free a slot, handing it straight to the next queued caller"""
+        with self._lock:
+            if self._queue:
+                waiter = self._queue.popleft()
+                waiter.granted = True
+            else:
+                self.in_use -= 1
+                return
+        waiter.notify()
+
+    def acquire(self, priority: bool = False):
+        """Blocking acquire; raises AdmissionRejected when the call is shed"""
+        start = time.perf_counter()
+        event = threading.Event()
+        waiter = _Waiter(event.set, priority)
+        with self._lock:
+            entered = self._try_enter(waiter, priority)
+        if entered is False:
+            raise AdmissionRejected(f"{self.name}: queue full")
+        if entered is None and not event.wait(self.max_wait) and not self._give_up(waiter):
+            self._timed_out()
+        self._admitted(time.perf_counter() - start)
+
+    async def acquire_async(self, priority: bool = False):
+        """Async acquire from any event loop; raises AdmissionRejected when the call is shed"""
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def notify():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = _Waiter(notify, priority)
+        with self._lock:
+            entered = self._try_enter(waiter, priority)
+        if entered is False:
+            raise AdmissionRejected(f"{self.name}: queue full")
+        if entered is None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+            except asyncio.TimeoutError:
+                if not self._give_up(waiter):
+                    self._timed_out()
+            except asyncio.CancelledError:
+                if self._give_up(waiter):
+                    # Slot was granted just as the caller gave up: pass it on
+                    self.release()
+                raise
+        self._admitted(time.perf_counter() - start)
+
+    @contextmanager
+    def slot(self, priority: bool = False):
+        """Hold a slot for the body of a `with` block"""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, priority: bool = False):
+        """Hold a slot for the body of an `async with` block"""
+        await self.acquire_async(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        """Slot usage, queue depth, wait percentiles and shed counts"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_use"] = self.in_use
+            stats["queue_depth"] = len(self._queue)
+            waits = list(self._waits)
+        stats.update({
+            "capacity": self.capacity,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait,
+            "shed": stats["shed_queue_full"] + stats["shed_wait_timeout"],
+            "wait_p50_ms": 1000.0 * _percentile(waits, 50),
+            "wait_p99_ms": 1000.0 * _percentile(waits, 99),
+        })
+        return stats
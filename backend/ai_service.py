@@ -1,31 +1,79 @@
+import gc
 import os
 import random
 import re
+import threading
+import time
 import torch
 import numpy as np
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 from transformers import (
     AutoTokenizer, AutoModelForSequenceClassification,
     pipeline, AutoModel
 )
 import logging
 
+from chat_streaming import StreamingChatGenerator
+from config import (
+    EMOTION_MODEL, EMOTION_BACKEND, EMOTION_MAX_TOKENS, EMOTION_CHUNK_OVERLAP,
+    EMOTION_LENGTH_BUCKETS, EMOTION_BATCH_SIZE, AI_PRELOAD_COMPONENTS,
+    AI_MEMORY_LIMIT_MB, AI_COMPONENT_IDLE_SECONDS, WARMUP_MAX_ROUNDS, WARMUP_STEADY_TOLERANCE
+)
+from emotion_backends import create_emotion_backend
+from emotion_batching import chunk_token_ids, bucket_by_length, aggregate_chunk_scores
+from emotion_cache import get_emotion_cache
+from inference_threads import configure_torch_threads, thread_report
+from keyword_matcher import KeywordMatcher
+from process_stats import current_rss_mb
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Model-backed components, loaded on demand; values are the attributes each one owns
+AI_COMPONENTS = {
+    'emotion': ('emotion_model', 'emotion_tokenizer', 'emotion_backend'),
+    'chat': ('chat_pipeline', 'chat_streamer'),
+}
+
 class AIService:
-    def __init__(self):
+    def __init__(self, progress_callback=None, preload_components=None):
+        # Optional callable(stage, status) notified as each model loads
+        self.progress_callback = progress_callback
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         logger.info(f"Using device: {self.device}")
         
+        # Size torch thread pools for this process's share of the host CPUs
+        if self.device == "cpu":
+            configure_torch_threads()
+        
         # Model cache directory
         self.cache_dir = "models"
         os.makedirs(self.cache_dir, exist_ok=True)
         
-        # Initialize models
-        self._load_emotion_model()
-        self._load_chat_model()
+        # Shared cache for emotion inference results
+        self.emotion_cache = get_emotion_cache()
+        self.emotion_model_version = EMOTION_MODEL
+        # Filled in by warm_up()
+        self.warmup_report = None
+        
+        # Components start unloaded and are loaded when configured or first needed
+        self._component_lock = threading.RLock()
+        self.components = {}
+        for name, attributes in AI_COMPONENTS.items():
+            for attribute in attributes:
+                setattr(self, attribute, None)
+            self.components[name] = {"state": "unloaded", "last_used": None}
+        
+        # Initialize configured models (e.g. skip the local chat model when Gemini serves chat)
+        preload = AI_PRELOAD_COMPONENTS if preload_components is None else preload_components
+        for name in AI_COMPONENTS:
+            if name in preload:
+                self._report_progress(f"{name}_model", "loading")
+                loaded = self._ensure_component(name)
+                self._report_progress(f"{name}_model", "loaded" if loaded else "failed")
+            else:
+                self._report_progress(f"{name}_model", "deferred")
         
         # Predefined responses for different emotions and contexts
         self.emotion_responses = {
@@ -124,6 +172,8 @@ class AIService:
             'violence': ['kill someone', 'hurt someone', 'murder', 'violence', 'weapon', 'gun', 'knife', 'attack'],
             'severe_distress': ['can\'t take it', 'give up', 'hopeless', 'no point', 'worthless', 'hate myself', 'nobody cares']
         }
+        # Crisis keywords match anywhere in the message: missing a crisis costs more than a false alarm
+        self.crisis_matcher = KeywordMatcher(self.crisis_keywords, whole_words=False)
         
         self.crisis_responses = {
             'immediate_danger': [
@@ -146,11 +196,106 @@ class AIService:
             ]
         }
 
+    def _report_progress(self, stage: str, status: str):
+        """Notify the progress callback (if any) about a loading stage"""
+        if self.progress_callback:
+            try:
+                self.progress_callback(stage, status)
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
+
+    def _ensure_component(self, name: str) -> bool:
+        """Load a component on first use; returns whether it is available"""
+        info = self.components[name]
+        info["last_used"] = time.time()
+        if info["state"] == "loaded":
+            return True
+        if info["state"] == "failed":
+            return False
+        
+        with self._component_lock:
+            if info["state"] == "unloaded":
+                self._release_idle_components(exclude=name)
+                
+                rss_before = current_rss_mb()
+                started = time.perf_counter()
+                getattr(self, f"_load_{name}_model")()
+                loaded = getattr(self, AI_COMPONENTS[name][0]) is not None
+                
+                info.update({
+                    "state": "loaded" if loaded else "failed",
+                    "load_seconds": round(time.perf_counter() - started, 3),
+                    "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+                })
+                logger.info(f"Component '{name}' {info['state']} in {info['load_seconds']}s")
+                
+                if loaded:
+                    self._enforce_memory_limit(keep=name)
+        
+        return info["state"] == "loaded"
+
+    def unload_component(self, name: str):
+        """Drop a component's models from memory; it reloads on next use"""
+        with self._component_lock:
+            for attribute in AI_COMPONENTS[name]:
+                setattr(self, attribute, None)
+            self.components[name].update({"state": "unloaded", "rss_delta_mb": None})
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        logger.info(f"Component '{name}' unloaded")
+
+    def _release_idle_components(self, exclude: str = None):
+        """Unload components unused for longer than AI_COMPONENT_IDLE_SECONDS"""
+        if AI_COMPONENT_IDLE_SECONDS <= 0:
+            return
+        cutoff = time.time() - AI_COMPONENT_IDLE_SECONDS
+        for name, info in self.components.items():
+            if name != exclude and info["state"] == "loaded" and (info["last_used"] or 0) < cutoff:
+                self.unload_component(name)
+
+    def _enforce_memory_limit(self, keep: str):
+        """Under memory pressure, unload least recently used components other than `keep`"""
+        if AI_MEMORY_LIMIT_MB <= 0:
+            return
+        candidates = sorted(
+            (name for name, info in self.components.items() if name != keep and info["state"] == "loaded"),
+            key=lambda name: self.components[name]["last_used"] or 0
+        )
+        for name in candidates:
+            if current_rss_mb() <= AI_MEMORY_LIMIT_MB:
+                break
+            logger.warning(f"RSS above {AI_MEMORY_LIMIT_MB} MB, unloading component '{name}'")
+            self.unload_component(name)
+
+    def memory_report(self) -> Dict:
+        """Per-component load state and memory footprint"""
+        report = {"process_rss_mb": round(current_rss_mb(), 1), "components": {}}
+        for name, info in self.components.items():
+            entry = {key: value for key, value in info.items() if key != "last_used"}
+            if info["state"] == "loaded":
+                entry["parameter_mb"] = round(self._component_parameter_bytes(name) / (1024.0 * 1024.0), 1)
+                entry["idle_seconds"] = round(time.time() - info["last_used"], 1)
+            report["components"][name] = entry
+        return report
+
+    def thread_report(self) -> Dict:
+        """Effective torch thread settings for this worker process"""
+        return thread_report()
+
+    def _component_parameter_bytes(self, name: str) -> int:
+        """Bytes held by a component's torch parameters and buffers"""
+        model = self.emotion_model if name == 'emotion' else getattr(self.chat_pipeline, 'model', None)
+        if model is None:
+            return 0
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
     def _load_emotion_model(self):
         """Load pretrained emotion classification model"""
         try:
             # Using a robust emotion classification model
-            model_name = "j-hartmann/emotion-english-distilroberta-base"
+            model_name = EMOTION_MODEL
             cache_path = os.path.join(self.cache_dir, "emotion")
             
             self.emotion_tokenizer = AutoTokenizer.from_pretrained(
@@ -164,14 +309,27 @@ class AIService:
             self.emotion_model.to(self.device)
             self.emotion_model.eval()
             
+            # Select how forward passes are executed (PyTorch, ONNX Runtime, int8)
+            self.emotion_backend = create_emotion_backend(
+                EMOTION_BACKEND,
+                self.emotion_model,
+                self.emotion_tokenizer,
+                model_name,
+                self.cache_dir,
+                self.device
+            )
+            # Different backends give slightly different scores, so keep their cache entries apart
+            self.emotion_model_version = f"{model_name}@{self.emotion_backend.name}"
+            
             # Emotion labels for this model
             self.emotion_labels = ['anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise']
-            logger.info("Emotion model loaded successfully")
+            logger.info(f"Emotion model loaded successfully (backend: {self.emotion_backend.name})")
             
         except Exception as e:
             logger.error(f"Failed to load emotion model: {e}")
             self.emotion_model = None
             self.emotion_tokenizer = None
+            self.emotion_backend = None
 
     def _load_chat_model(self):
         """Load pretrained conversational model"""
@@ -203,37 +361,159 @@ class AIService:
             except Exception as e2:
                 logger.error(f"Failed to load fallback model: {e2}")
                 self.chat_pipeline = None
+        
+        # Streaming replies reuse the pipeline's model and tokenizer with a per-conversation KV cache
+        if self.chat_pipeline is not None:
+            self.chat_streamer = StreamingChatGenerator(
+                self.chat_pipeline.model, self.chat_pipeline.tokenizer, device=self.device
+            )
 
     def detect_emotion(self, text: str) -> Dict[str, float]:
         """Detect emotions in text using pretrained model"""
-        if not self.emotion_model or not self.emotion_tokenizer:
+        if not self._ensure_component('emotion'):
             return {"neutral": 1.0}
         
+        # Repeated inputs are served from the shared cache
+        cached_scores = self.emotion_cache.get(text, self.emotion_model_version)
+        if cached_scores is not None:
+            return cached_scores
+        
         try:
-            # Tokenize and predict
-            inputs = self.emotion_tokenizer(
-                text, 
-                return_tensors="pt", 
-                truncation=True, 
-                padding=True, 
-                max_length=512
-            )
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            with torch.no_grad():
-                outputs = self.emotion_model(**inputs)
-                predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            
-            # Convert to probabilities
-            emotion_scores = {}
-            for i, label in enumerate(self.emotion_labels):
-                emotion_scores[label] = float(predictions[0][i])
-            
-            return emotion_scores
-            
+            emotion_scores = self._predict_emotion(text)
         except Exception as e:
             logger.error(f"Error in emotion detection: {e}")
             return {"neutral": 1.0}
+        
+        self.emotion_cache.set(text, self.emotion_model_version, emotion_scores)
+        return emotion_scores
+
+    def detect_emotion_batch(self, texts: List[str], batch_size: int = EMOTION_BATCH_SIZE) -> List[Dict[str, float]]:
+        """Detect emotions for many texts, batching the uncached ones through the model"""
+        if not self._ensure_component('emotion'):
+            return [{"neutral": 1.0} for _ in texts]
+        
+        results = [self.emotion_cache.get(text, self.emotion_model_version) for text in texts]
+        pending = [i for i, scores in enumerate(results) if scores is None]
+        if not pending:
+            return results
+        
+        try:
+            batch_scores = self._predict_emotion_batch([texts[i] for i in pending], batch_size)
+        except Exception as e:
+            logger.error(f"Error in batched emotion detection: {e}")
+            for i in pending:
+                results[i] = {"neutral": 1.0}
+            return results
+        
+        for i, scores in zip(pending, batch_scores):
+            self.emotion_cache.set(texts[i], self.emotion_model_version, scores)
+            results[i] = scores
+        
+        return results
+
+    def _predict_emotion_batch(self, texts: List[str], batch_size: int = EMOTION_BATCH_SIZE) -> List[Dict[str, float]]:
+        """
+        Run the emotion model on many texts (uncached).
+        
+        Texts longer than the model window are split into overlapping chunks
+        rather than truncated; chunks are batched by length bucket and their
+        scores are aggregated back per text.
+        """
+        # Hold local references so a concurrent unload can't pull models out mid-batch
+        tokenizer = self.emotion_tokenizer
+        backend = self.emotion_backend
+        max_content_tokens = EMOTION_MAX_TOKENS - tokenizer.num_special_tokens_to_add(pair=False)
+        
+        # Tokenize without truncation and split long texts into windows
+        token_ids = tokenizer(list(texts), add_special_tokens=False, truncation=False)["input_ids"]
+        chunks, owners = [], []
+        for text_index, ids in enumerate(token_ids):
+            for chunk in chunk_token_ids(ids, max_content_tokens, EMOTION_CHUNK_OVERLAP):
+                chunks.append(tokenizer.build_inputs_with_special_tokens(chunk))
+                owners.append(text_index)
+        
+        # Batch chunks of similar length so padding stays small
+        chunk_scores = [None] * len(chunks)
+        lengths = [len(chunk) for chunk in chunks]
+        for batch in bucket_by_length(lengths, EMOTION_LENGTH_BUCKETS, batch_size):
+            inputs = tokenizer.pad(
+                {"input_ids": [chunks[i] for i in batch]},
+                padding=True,
+                return_tensors="np"
+            )
+            predictions = backend.predict(dict(inputs))
+            for i, row in zip(batch, predictions):
+                chunk_scores[i] = {label: float(row[j]) for j, label in enumerate(self.emotion_labels)}
+        
+        # Fold chunk scores back into one result per text, weighted by chunk length
+        per_text_scores = [[] for _ in texts]
+        per_text_weights = [[] for _ in texts]
+        for i, text_index in enumerate(owners):
+            per_text_scores[text_index].append(chunk_scores[i])
+            per_text_weights[text_index].append(lengths[i])
+        
+        return [
+            aggregate_chunk_scores(scores, weights)
+            for scores, weights in zip(per_text_scores, per_text_weights)
+        ]
+
+    def _predict_emotion(self, text: str) -> Dict[str, float]:
+        """Run the emotion model on a single text (uncached)"""
+        return self._predict_emotion_batch([text])[0]
+
+    def warm_up(self, max_rounds: int = WARMUP_MAX_ROUNDS, tolerance: float = WARMUP_STEADY_TOLERANCE) -> Dict:
+        """
+        Run representative emotion batches so the first real request doesn't pay for warm-up.
+        
+        For every length bucket a single text and a full batch are run
+        repeatedly (uncached) until two consecutive rounds are within
+        `tolerance` of each other, which is taken as steady state.
+        """
+        report = {"steady_state": True, "buckets": []}
+        if max_rounds <= 0 or not self._ensure_component('emotion'):
+            report["skipped"] = True
+            self.warmup_report = report
+            return report
+        
+        started = time.perf_counter()
+        tokenizer = self.emotion_tokenizer
+        max_content_tokens = EMOTION_MAX_TOKENS - tokenizer.num_special_tokens_to_add(pair=False)
+        seed_ids = tokenizer("I have been feeling a bit anxious about work, but talking helps me calm down. ",
+                             add_special_tokens=False)["input_ids"]
+        
+        for bucket in EMOTION_LENGTH_BUCKETS:
+            # Text that tokenizes to (about) this bucket's length
+            length = max(1, min(bucket, EMOTION_MAX_TOKENS) - tokenizer.num_special_tokens_to_add(pair=False))
+            ids = (seed_ids * (length // len(seed_ids) + 1))[:min(length, max_content_tokens)]
+            text = tokenizer.decode(ids)
+            
+            for batch_size in sorted({1, EMOTION_BATCH_SIZE}):
+                texts = [text] * batch_size
+                timings = []
+                for _ in range(max_rounds):
+                    round_start = time.perf_counter()
+                    self._predict_emotion_batch(texts, batch_size)
+                    timings.append(time.perf_counter() - round_start)
+                    if len(timings) >= 2 and abs(timings[-1] - timings[-2]) <= tolerance * timings[-2]:
+                        break
+                
+                steady = len(timings) >= 2 and abs(timings[-1] - timings[-2]) <= tolerance * timings[-2]
+                report["steady_state"] = report["steady_state"] and steady
+                report["buckets"].append({
+                    "tokens": bucket,
+                    "batch_size": batch_size,
+                    "rounds": len(timings),
+                    "first_ms": round(1000.0 * timings[0], 2),
+                    "steady_ms": round(1000.0 * timings[-1], 2),
+                    "steady_state": steady,
+                })
+        
+        report["total_seconds"] = round(time.perf_counter() - started, 3)
+        if not report["steady_state"]:
+            logger.warning(f"Emotion model warm-up did not reach steady state within {max_rounds} rounds")
+        logger.info(f"Emotion model warmed up in {report['total_seconds']}s")
+        self.warmup_report = report
+        return report
 
     def get_dominant_emotion(self, text: str) -> str:
         """Get the dominant emotion from text"""
@@ -247,8 +527,9 @@ class AIService:
 
     def generate_chat_response(self, message: str, context: str = "") -> str:
         """Generate conversational response using pretrained model"""
-        if not self.chat_pipeline:
+        if not self._ensure_component('chat'):
             return self._get_fallback_response(message)
+        chat_pipeline = self.chat_pipeline
         
         try:
             # Prepare input for the model
@@ -258,7 +539,7 @@ class AIService:
                 input_text = message
             
             # Generate response
-            response = self.chat_pipeline(
+            response = chat_pipeline(
                 input_text,
                 max_length=len(input_text.split()) + 50,
                 num_return_sequences=1,
@@ -282,6 +563,26 @@ class AIService:
             logger.error(f"Error in chat generation: {e}")
             return self._get_fallback_response(message)
 
+    async def stream_chat_response(self, message: str, conversation_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a conversational response token by token, reusing the conversation's KV cache"""
+        if not self._ensure_component('chat') or self.chat_streamer is None:
+            yield self._get_fallback_response(message)
+            return
+        chat_streamer = self.chat_streamer
+        
+        produced = False
+        try:
+            async for text in chat_streamer.stream(message, conversation_id):
+                produced = True
+                yield text
+        except Exception as e:
+            logger.error(f"Error in streaming chat generation: {e}")
+            if conversation_id:
+                chat_streamer.reset(conversation_id)
+        
+        if not produced:
+            yield self._get_fallback_response(message)
+
     def _get_fallback_response(self, message: str) -> str:
         """Fallback response when model fails"""
         message_lower = message.lower()
@@ -303,28 +604,30 @@ class AIService:
             "I appreciate you opening up. What's the most challenging part about this?"
         ])
 
+    def reload_keywords(self, crisis_keywords: Optional[Dict[str, List[str]]] = None):
+        """Swap in new crisis keyword lists without restarting"""
+        if crisis_keywords is not None:
+            self.crisis_matcher.reload(crisis_keywords)
+            self.crisis_keywords = crisis_keywords
+            logger.info("Crisis keyword lists reloaded")
+
     def detect_crisis(self, message: str) -> Dict[str, any]:
         """Detect crisis situations in user messages"""
-        message_lower = message.lower()
         crisis_detected = False
         crisis_type = None
         severity = 'low'
         
-        # Check for crisis keywords
-        for crisis_category, keywords in self.crisis_keywords.items():
-            for keyword in keywords:
-                if keyword in message_lower:
-                    crisis_detected = True
-                    crisis_type = crisis_category
-                    
-                    # Determine severity based on keyword type
-                    if crisis_category in ['suicide', 'self_harm', 'violence','die','kill','knife','drown']:
-                        severity = 'high'
-                    elif crisis_category == 'severe_distress':
-                        severity = 'medium'
-                    break
-            if crisis_detected:
-                break
+        # One pass over the message finds every crisis keyword; earlier categories take priority
+        crisis_category = self.crisis_matcher.first_label(message)
+        if crisis_category:
+            crisis_detected = True
+            crisis_type = crisis_category
+            
+            # Determine severity based on keyword type
+            if crisis_category in ['suicide', 'self_harm', 'violence','die','kill','knife','drown']:
+                severity = 'high'
+            elif crisis_category == 'severe_distress':
+                severity = 'medium'
         
         return {
             'crisis_detected': crisis_detected,
@@ -427,9 +730,9 @@ class AIService:
             mood = entry['mood']
             mood_counts[mood] = mood_counts.get(mood, 0) + 1
             
-            # If we have notes, analyze emotions in them
-            if entry.get('notes'):
-                emotions = self.detect_emotion(entry['notes'])
+            # Emotion scores for notes are computed once when the entry is written
+            emotions = entry.get('emotion_scores')
+            if emotions:
                 for emotion, score in emotions.items():
                     if emotion not in emotion_scores:
                         emotion_scores[emotion] = []
@@ -1,8 +1,11 @@
 import random
 import re
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 import logging
 
+from emotion_cache import get_emotion_cache
+from keyword_matcher import KeywordMatcher
+
 # Lightweight AI service without heavy dependencies
 logger = logging.getLogger(__name__)
 
@@ -10,6 +13,9 @@ class AIService:
     def __init__(self):
         logger.info("Using lightweight AI service (no ML dependencies)")
         
+        # Shared cache for emotion inference results
+        self.emotion_cache = get_emotion_cache()
+        
         # Simple keyword-based emotion detection
         self.emotion_keywords = {
             'joy': ['happy', 'joy', 'excited', 'great', 'awesome', 'wonderful', 'amazing', 'fantastic', 'love', 'perfect', 'excellent'],
@@ -119,6 +125,13 @@ class AIService:
             'severe_distress': ['can\'t take it', 'give up', 'hopeless', 'no point', 'worthless', 'hate myself', 'nobody cares']
         }
         
+        # Keyword lists compiled into single-pass matchers
+        self.emotion_matcher = KeywordMatcher(self.emotion_keywords)
+        # Crisis keywords match anywhere in the message: missing a crisis costs more than a false alarm
+        self.crisis_matcher = KeywordMatcher(self.crisis_keywords, whole_words=False)
+        # Cached emotion results are tied to the keyword lists that produced them
+        self.emotion_model_version = f"lite-keywords-v2-{self.emotion_matcher.fingerprint}"
+        
         self.crisis_responses = {
             'immediate_danger': [
                 "🚨 I'm very concerned about what you've shared. Your life has value and you deserve support right now.",
@@ -142,14 +155,16 @@ class AIService:
 
     def detect_emotion(self, text: str) -> Dict[str, float]:
         """Simple keyword-based emotion detection"""
-        text_lower = text.lower()
-        emotion_scores = {emotion: 0.0 for emotion in self.emotion_keywords.keys()}
-        
-        total_matches = 0
-        for emotion, keywords in self.emotion_keywords.items():
-            matches = sum(1 for keyword in keywords if keyword in text_lower)
-            emotion_scores[emotion] = matches
-            total_matches += matches
+        return self.emotion_cache.get_or_compute(text, self.emotion_model_version, self._score_emotion_keywords)
+
+    def detect_emotion_batch(self, texts: List[str], batch_size: int = 16) -> List[Dict[str, float]]:
+        """Keyword-based emotion detection for many texts"""
+        return [self.detect_emotion(text) for text in texts]
+
+    def _score_emotion_keywords(self, text: str) -> Dict[str, float]:
+        """Score emotions by keyword matches (uncached)"""
+        emotion_scores = {emotion: float(matches) for emotion, matches in self.emotion_matcher.count_keywords(text).items()}
+        total_matches = sum(emotion_scores.values())
         
         # Normalize scores
         if total_matches > 0:
@@ -160,6 +175,18 @@ class AIService:
         
         return emotion_scores
 
+    def reload_keywords(self, crisis_keywords: Optional[Dict[str, List[str]]] = None,
+                        emotion_keywords: Optional[Dict[str, List[str]]] = None):
+        """Swap in new keyword lists without restarting; requests in flight keep the old ones"""
+        if crisis_keywords is not None:
+            self.crisis_matcher.reload(crisis_keywords)
+            self.crisis_keywords = crisis_keywords
+        if emotion_keywords is not None:
+            self.emotion_matcher.reload(emotion_keywords)
+            self.emotion_keywords = emotion_keywords
+            self.emotion_model_version = f"lite-keywords-v2-{self.emotion_matcher.fingerprint}"
+        logger.info("Keyword lists reloaded")
+
     def get_dominant_emotion(self, text: str) -> str:
         """Get the dominant emotion from text"""
         emotion_scores = self.detect_emotion(text)
@@ -172,26 +199,21 @@ class AIService:
 
     def detect_crisis(self, message: str) -> Dict[str, any]:
         """Detect crisis situations in user messages"""
-        message_lower = message.lower()
         crisis_detected = False
         crisis_type = None
         severity = 'low'
         
-        # Check for crisis keywords
-        for crisis_category, keywords in self.crisis_keywords.items():
-            for keyword in keywords:
-                if keyword in message_lower:
-                    crisis_detected = True
-                    crisis_type = crisis_category
-                    
-                    # Determine severity based on keyword type
-                    if crisis_category in ['suicide', 'self_harm', 'violence','kill','die','knife']:
-                        severity = 'high'
-                    elif crisis_category == 'severe_distress':
-                        severity = 'medium'
-                    break
-            if crisis_detected:
-                break
+        # One pass over the message finds every crisis keyword; earlier categories take priority
+        crisis_category = self.crisis_matcher.first_label(message)
+        if crisis_category:
+            crisis_detected = True
+            crisis_type = crisis_category
+            
+            # Determine severity based on keyword type
+            if crisis_category in ['suicide', 'self_harm', 'violence','kill','die','knife']:
+                severity = 'high'
+            elif crisis_category == 'severe_distress':
+                severity = 'medium'
         
         return {
             'crisis_detected': crisis_detected,
@@ -282,6 +304,10 @@ class AIService:
             "I appreciate you opening up. What's the most challenging part about this?"
         ])
 
+    async def stream_chat_response(self, message: str, conversation_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream interface for chat replies; the templated reply arrives as one chunk"""
+        yield self.generate_response(message)
+
     def get_mood_insights(self, mood_history: List[Dict]) -> Dict:
         """Analyze mood patterns and provide insights"""
         if not mood_history:
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Backfill emotion scores for mood entries written before scores were stored
+
+New mood entries get their notes scored once at write time. This script
+scores existing rows in batches so the insights endpoints never have to
+run inference on read.
+"""
+
+import argparse
+import logging
+
+from config import DATABASE_PATH
+from database import Database
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_ai_service():
+    """Use the same AI service the API server would use"""
+    try:
+        from ai_service import AIService
+    except ImportError as e:
+        logger.warning(f"Full AI dependencies not available ({e}), using lite AI service")
+        from ai_service_lite import AIService
+    return AIService()
+
+
+def backfill_mood_emotions(db_path=DATABASE_PATH, batch_size=64):
+    """Score all mood entries that have notes but no stored emotion scores"""
+    db = Database(db_path)
+    ai_service = load_ai_service()
+
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.get_mood_entries_missing_emotions(limit=batch_size, after_id=last_id)
+        if not rows:
+            break
+
+        mood_ids = [row[0] for row in rows]
+        scores = ai_service.detect_emotion_batch([row[1] for row in rows], batch_size=batch_size)
+        db.update_mood_emotion_scores(zip(mood_ids, scores))
+
+        total += len(rows)
+        last_id = mood_ids[-1]
+        logger.info(f"Backfilled {total} mood entries (last id {last_id})")
+
+    logger.info(f"✅ Emotion backfill complete: {total} mood entries updated")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill emotion scores for mood entry notes")
+    parser.add_argument("--db", default=DATABASE_PATH, help="Path to the SQLite database")
+    parser.add_argument("--batch-size", type=int, default=64, help="Entries scored per model batch")
+    args = parser.parse_args()
+
+    backfill_mood_emotions(args.db, args.batch_size)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the full and lite AI services
+
+Measures throughput, p50/p99 latency and peak RSS of detect_emotion,
+detect_crisis, get_mood_insights and analyze_conversation_sentiment for
+`ai_service.py` and `ai_service_lite.py`, across message lengths and batch
+sizes. Each service runs in its own process so peak RSS is attributable to
+it. No network access is needed once the models are in the local cache.
+
+Every message is made unique, so emotion results come from the model
+rather than the emotion cache unless --cached is given.
+
+Usage:
+    python benchmarks/ai_services.py --services full lite --output ai_services.json
+    python benchmarks/ai_services.py --services lite --lengths 8 64 --batch-sizes 1 16
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import sys
+
+from common import SAMPLE_MESSAGES, collect_results, emit_results, peak_rss_mb, summarize_latencies, time_calls
+
+MOODS = ["happy", "sad", "anxious", "calm", "angry", "neutral"]
+
+
+def make_messages(words: int, count: int, unique: bool):
+    """`count` messages of about `words` words, built from the sample messages"""
+    vocabulary = " ".join(SAMPLE_MESSAGES).split()
+    messages = []
+    for i in range(count):
+        start = (i * 7) % len(vocabulary)
+        text = " ".join(itertools.islice(itertools.cycle(vocabulary), start, start + words))
+        messages.append(f"{text} ({i})" if unique else text)
+    return messages
+
+
+def make_batches(words: int, batch_size: int, count: int, tag: str, cached: bool):
+    """`count` batches of messages; distinct across batches and operations unless `cached`"""
+    batch = make_messages(words, batch_size, unique=not cached)
+    if cached:
+        return [batch] * count
+    return [[f"{text} [{tag} {b}]" for text in batch] for b in range(count)]
+
+
+def make_mood_history(size: int, words: int, service):
+    """Mood entries shaped like Database.get_mood_history rows"""
+    notes = make_messages(words, size, unique=False)
+    return [
+        {
+            "mood": MOODS[i % len(MOODS)],
+            "notes": notes[i],
+            "emotion_scores": service.detect_emotion(notes[i]),
+            "timestamp": f"2024-01-{(i % 28) + 1:02d}T12:00:00",
+        }
+        for i in range(size)
+    ]
+
+
+def _run_service(name, lengths, batch_sizes, repeat, cached, warm_up, results):
+    import common  # noqa: F401  (puts the backend directory on sys.path)
+
+    if name == "full":
+        from ai_service import AIService
+        service = AIService(preload_components=["emotion"])
+        if warm_up:
+            service.warm_up()
+    else:
+        from ai_service_lite import AIService
+        service = AIService()
+
+    rows = []
+    for words in lengths:
+        calls = max(1, repeat)
+        messages = make_messages(words, calls, unique=not cached)
+
+        for operation, fn in (("detect_emotion", service.detect_emotion), ("detect_crisis", service.detect_crisis)):
+            rows.append({
+                "operation": operation,
+                "message_words": words,
+                "batch_size": 1,
+                **summarize_latencies(time_calls(fn, messages)),
+            })
+
+        for batch_size in batch_sizes:
+            count = max(1, repeat // batch_size)
+            batches = make_batches(words, batch_size, count, "batch", cached)
+            latencies = time_calls(lambda batch: service.detect_emotion_batch(batch, batch_size), batches)
+            rows.append({
+                "operation": "detect_emotion_batch",
+                "message_words": words,
+                "batch_size": batch_size,
+                **summarize_latencies(latencies, items=batch_size * len(batches)),
+            })
+
+            batches = make_batches(words, batch_size, count, "conversation", cached)
+            latencies = time_calls(service.analyze_conversation_sentiment, batches)
+            rows.append({
+                "operation": "analyze_conversation_sentiment",
+                "message_words": words,
+                "batch_size": batch_size,
+                **summarize_latencies(latencies, items=batch_size * len(batches)),
+            })
+
+            # Notes are scored when entries are written, so that cost is excluded here
+            history = make_mood_history(batch_size, words, service)
+            latencies = time_calls(service.get_mood_insights, [history] * count)
+            rows.append({
+                "operation": "get_mood_insights",
+                "message_words": words,
+                "batch_size": batch_size,
+                **summarize_latencies(latencies, items=batch_size * count),
+            })
+
+    results.put({"service": name, "peak_rss_mb": round(peak_rss_mb(), 1), "rows": rows})
+
+
+def run_service(name, lengths, batch_sizes, repeat, cached, warm_up, timeout):
+    """Benchmark one service in a fresh process"""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=_run_service, args=(name, lengths, batch_sizes, repeat, cached, warm_up, results))
+    process.start()
+    output = collect_results(results, [process], 1, timeout)[0]
+    process.join()
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the full and lite AI services")
+    parser.add_argument("--services", nargs="+", choices=["full", "lite"], default=["full", "lite"])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[8, 64, 400],
+                        help="Message lengths in words")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=64, help="Messages per length and operation")
+    parser.add_argument("--cached", action="store_true", help="Reuse messages so the emotion cache is hit")
+    parser.add_argument("--no-warm-up", action="store_true", help="Skip the full service warm-up")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="Seconds to wait for each service")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    for name in args.services:
+        print(f"Benchmarking {name} AI service...", flush=True)
+        try:
+            results.append(run_service(name, args.lengths, args.batch_sizes, args.repeat, args.cached,
+                                       not args.no_warm_up, args.timeout))
+        except RuntimeError as e:
+            print(f"{name} AI service benchmark failed: {e}", file=sys.stderr, flush=True)
+            results.append({"service": name, "error": str(e)})
+            failed = True
+
+    emit_results("ai_services", results, args.output)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
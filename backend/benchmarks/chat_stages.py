@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Stage fan-out check for the /chat/send pipeline
+
+Replays the shape of a chat request with stand-in stages of fixed duration:
+emotion inference, the latest-mood lookup and the conversation context load
+(blocking calls on the thread pool), followed by the Gemini call (awaited).
+Each request is run twice through `StageTrace`: once with the stages back to
+back, as the handler used to, and once with the three inputs started
+together and Gemini started when the last of them is done. With the fan-out
+the time before Gemini should be close to the slowest input rather than
+their sum. Exits non-zero if it is not.
+
+Usage:
+    python benchmarks/chat_stages.py --requests 20 --emotion 0.08 --mood 0.03 --context 0.02 --gemini 0.2
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from common import emit_results, percentile
+from stage_timings import StageTrace, StageTimings
+
+
+def blocking_stage(seconds: float):
+    time.sleep(seconds)
+    return seconds
+
+
+async def run_request(trace: StageTrace, durations, fan_out: bool):
+    loop = asyncio.get_running_loop()
+    inputs = ("emotion", "mood_lookup", "context")
+    if fan_out:
+        tasks = [trace.start(stage, loop.run_in_executor(None, blocking_stage, durations[stage])) for stage in inputs]
+        await asyncio.gather(*tasks)
+    else:
+        for stage in inputs:
+            await trace.run(stage, loop.run_in_executor(None, blocking_stage, durations[stage]))
+    ready = trace.elapsed()
+    await trace.run("gemini", asyncio.sleep(durations["gemini"]))
+    return ready
+
+
+async def run_checks(requests: int, durations):
+    results = {"durations_s": durations}
+    failures = []
+    for mode, fan_out in (("serial", False), ("fan_out", True)):
+        timings = StageTimings(mode)
+        ready_times = []
+        for _ in range(requests):
+            trace = StageTrace()
+            ready_times.append(await run_request(trace, durations, fan_out))
+            timings.record(trace)
+        results[mode] = {
+            "gemini_start_p50_ms": 1000.0 * percentile(ready_times, 50),
+            "gemini_start_p99_ms": 1000.0 * percentile(ready_times, 99),
+            **timings.stats(),
+        }
+
+    slowest_input = max(durations["emotion"], durations["mood_lookup"], durations["context"])
+    # Allow for thread pool hand-off and timer jitter on a small machine
+    slack = 0.02 + 0.25 * slowest_input
+    fan_out_start = results["fan_out"]["gemini_start_p50_ms"] / 1000.0
+    if fan_out_start > slowest_input + slack:
+        failures.append(f"Gemini started after {fan_out_start:.3f}s with fan-out, "
+                        f"slowest input stage takes {slowest_input:.3f}s")
+    if results["fan_out"]["end_to_end_p50_ms"] >= results["serial"]["end_to_end_p50_ms"]:
+        failures.append("fan-out was not faster than running the stages back to back")
+    results["failures"] = failures
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs concurrent chat stages with stand-in durations")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--emotion", type=float, default=0.08, help="Emotion inference time (s)")
+    parser.add_argument("--mood", type=float, default=0.03, help="Latest mood lookup time (s)")
+    parser.add_argument("--context", type=float, default=0.02, help="Conversation context load time (s)")
+    parser.add_argument("--gemini", type=float, default=0.2, help="Gemini reply time (s)")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    durations = {"emotion": args.emotion, "mood_lookup": args.mood, "context": args.context, "gemini": args.gemini}
+    results = asyncio.run(run_checks(args.requests, durations))
+    emit_results("chat_stages", results, args.output)
+    if results["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Shared helpers for CuraCore benchmark scripts
+"""
+
+import json
+import math
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+# Allow benchmark scripts to import backend modules
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Representative user inputs, from short check-ins to longer journal-style notes
+SAMPLE_MESSAGES = [
+    "hi",
+    "I'm fine",
+    "I feel great today!",
+    "I'm so stressed about my exams tomorrow.",
+    "Nothing is working and I'm really frustrated with everything.",
+    "I've been feeling lonely since I moved to the hostel.",
+    "Honestly I don't know how I feel, it's been a weird week.",
+    "My friend surprised me with a birthday cake, I was shocked!",
+    "I can't sleep and I keep worrying about what people think of me.",
+    "The food at the mess was disgusting today, I felt sick.",
+    "I got the internship! I'm so excited I can barely think straight.",
+    "I'm scared I'll fail the semester and disappoint my parents.",
+    "Today was okay. Classes, lunch, some reading, nothing special.",
+    "I'm angry that my roommate keeps taking my things without asking.",
+    "I finally finished the project and I feel relieved and proud of myself.",
+    ("Today started badly because I overslept and missed my first lecture, and then I found out "
+     "the assignment deadline had been moved up. I spent the afternoon in the library trying to "
+     "catch up but I couldn't focus at all. By the evening I felt exhausted and a bit hopeless, "
+     "although talking to my sister on the phone helped me calm down a little."),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize_latencies(latencies_s: List[float], items: Optional[int] = None) -> Dict[str, float]:
+    """Summarize per-call latencies (seconds) as throughput and millisecond percentiles"""
+    total = sum(latencies_s)
+    count = items if items is not None else len(latencies_s)
+    return {
+        "calls": len(latencies_s),
+        "items": count,
+        "throughput_per_s": count / total if total else 0.0,
+        "mean_ms": 1000.0 * total / len(latencies_s) if latencies_s else 0.0,
+        "p50_ms": 1000.0 * percentile(latencies_s, 50),
+        "p99_ms": 1000.0 * percentile(latencies_s, 99),
+    }
+
+
+def time_calls(fn, args_list: List, repeat: int = 1) -> List[float]:
+    """Call fn(arg) for every arg, `repeat` times, returning per-call latencies in seconds"""
+    latencies = []
+    for _ in range(repeat):
+        for arg in args_list:
+            start = time.perf_counter()
+            fn(arg)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def collect_results(results, processes: List, count: int, timeout: float) -> List:
+    """Read `count` results from child processes' queue
+
+    Raises RuntimeError instead of hanging when a child crashes (missing
+    model, OOM), exits without reporting or runs past `timeout` seconds.
+    """
+    outputs = []
+    deadline = time.monotonic() + timeout
+    while len(outputs) < count:
+        try:
+            outputs.append(results.get(timeout=1.0))
+            continue
+        except queue.Empty:
+            pass
+        crashed = [process.exitcode for process in processes if process.exitcode not in (None, 0)]
+        if crashed:
+            error = f"benchmark process exited with code {crashed[0]}"
+        elif all(process.exitcode == 0 for process in processes):
+            error = "benchmark process exited without reporting results"
+        elif time.monotonic() > deadline:
+            error = f"benchmark process gave no results within {timeout:.0f}s"
+        else:
+            continue
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise RuntimeError(error)
+    return outputs
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def environment_info() -> Dict[str, str]:
+    """Describe the machine and revision a benchmark ran on"""
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": str(os.cpu_count()),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def emit_results(name: str, results, output_path: Optional[str] = None) -> Dict:
+    """Print results as JSON and optionally write them to a file for comparison between commits"""
+    payload = {"benchmark": name, "environment": environment_info(), "results": results}
+    text = json.dumps(payload, indent=2)
+    print(text)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(text + "\n")
+    return payload
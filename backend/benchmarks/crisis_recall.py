@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Crisis detection recall check against the original substring loop
+
+Runs every available AI service's `detect_crisis` and the original
+`keyword in message_lower` loop over a corpus of crisis phrasings
+(inflections, compounds, punctuation, mixed case) plus the benchmark
+sample messages. Any message the original loop flagged must still be
+flagged, with the same category. Extra detections are reported but allowed:
+for crisis detection a false alarm is cheaper than a miss. Exits non-zero if
+a baseline hit is lost.
+
+Usage:
+    python benchmarks/crisis_recall.py
+"""
+
+import argparse
+import sys
+
+from common import SAMPLE_MESSAGES, emit_results
+
+CRISIS_PHRASES = [
+    "I want to kill myself",
+    "I keep thinking about killing myself tonight",
+    "I've been thinking about self-harming again",
+    "self harming is the only thing that helps",
+    "I was attacked on my way home",
+    "he keeps attacking me and I'm scared",
+    "I feel like hurting myself",
+    "I hurt myself last night",
+    "I want to harm myself",
+    "I cut my arm yesterday",
+    "I bought razors today",
+    "I keep a blade in my drawer",
+    "there are guns in my house",
+    "I took the knife from the kitchen",
+    "I could murder him",
+    "he was murdered last year",
+    "they have weapons",
+    "I want to die.",
+    "WANT TO DIE",
+    "everyone would be better off dead without me",
+    "life is not worth living anymore",
+    "I just want to end it all",
+    "I'm going to take my own life",
+    "suicidal thoughts won't stop",
+    "I can't take it anymore",
+    "I give up on everything",
+    "I feel hopeless and worthless",
+    "the hopelessness is crushing me",
+    "there's no point in trying",
+    "I hate myself so much",
+    "nobody cares about me",
+    "I want to hurt someone",
+    "I might kill someone if this continues",
+    "there was violence at home again",
+]
+
+
+def substring_first_label(keywords, message):
+    """The original detect_crisis loop"""
+    message_lower = message.lower()
+    for label, words in keywords.items():
+        for keyword in words:
+            if keyword.rstrip("*") in message_lower:
+                return label
+    return None
+
+
+def load_services(names):
+    services = {}
+    for name in names:
+        try:
+            if name == "full":
+                from ai_service import AIService
+            else:
+                from ai_service_lite import AIService
+        except ImportError as e:
+            print(f"Skipping {name} AI service: {e}", file=sys.stderr, flush=True)
+            continue
+        # Crisis detection is keyword-only, so the full service needs no models loaded
+        services[name] = AIService(preload_components=[]) if name == "full" else AIService()
+    return services
+
+
+def check_service(service, messages):
+    lost, extra = [], []
+    for message in messages:
+        expected = substring_first_label(service.crisis_keywords, message)
+        info = service.detect_crisis(message)
+        found = info['crisis_type'] if info['crisis_detected'] else None
+        if expected and found != expected:
+            lost.append({"message": message, "baseline": expected, "now": found})
+        elif found and not expected:
+            extra.append({"message": message, "now": found})
+    return {"messages": len(messages), "lost": lost, "extra": extra}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crisis detection must keep every substring-loop hit")
+    parser.add_argument("--services", nargs="+", choices=["full", "lite"], default=["full", "lite"])
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    messages = CRISIS_PHRASES + SAMPLE_MESSAGES
+    services = load_services(args.services)
+    results = {name: check_service(service, messages) for name, service in services.items()}
+    failures = [f"{name}: baseline hit lost for {item['message']!r}"
+                for name, result in results.items() for item in result["lost"]]
+    if not services:
+        failures.append("no AI service could be loaded")
+    results["failures"] = failures
+    emit_results("crisis_recall", results, args.output)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Accuracy-versus-latency comparison of emotion inference backends
+
+Runs the sample corpus through every requested backend and compares it
+against the fp32 PyTorch reference: top-1 label agreement, mean/max
+absolute probability difference, and per-message latency.
+
+Usage:
+    python benchmarks/emotion_backends.py --backends pytorch torch_int8 onnx onnx_int8
+"""
+
+import argparse
+import os
+
+from common import SAMPLE_MESSAGES, emit_results, summarize_latencies, time_calls
+
+import numpy as np
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from config import EMOTION_MODEL
+from emotion_backends import EMOTION_BACKENDS, create_emotion_backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", nargs="+", default=list(EMOTION_BACKENDS), choices=EMOTION_BACKENDS)
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the sample corpus per backend")
+    parser.add_argument("--cache-dir", default="models", help="Model/artifact cache directory")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    cache_path = os.path.join(args.cache_dir, "emotion")
+    tokenizer = AutoTokenizer.from_pretrained(EMOTION_MODEL, cache_dir=cache_path)
+    model = AutoModelForSequenceClassification.from_pretrained(EMOTION_MODEL, cache_dir=cache_path).eval()
+
+    encoded = [
+        dict(tokenizer(text, return_tensors="np", truncation=True, padding=True, max_length=512))
+        for text in SAMPLE_MESSAGES
+    ]
+
+    reference_backend = create_emotion_backend("pytorch", model, tokenizer, EMOTION_MODEL, args.cache_dir)
+    reference = np.vstack([reference_backend.predict(inputs) for inputs in encoded])
+
+    results = {}
+    for name in args.backends:
+        backend = create_emotion_backend(name, model, tokenizer, EMOTION_MODEL, args.cache_dir)
+        if backend.name != name:
+            results[name] = {"error": f"backend unavailable, fell back to {backend.name}"}
+            continue
+
+        # One untimed pass so session/kernel initialization is not measured
+        probabilities = np.vstack([backend.predict(inputs) for inputs in encoded])
+        latencies = time_calls(backend.predict, encoded, repeat=args.repeat)
+
+        diff = np.abs(probabilities - reference)
+        results[name] = {
+            "latency": summarize_latencies(latencies),
+            "top1_agreement": float(np.mean(probabilities.argmax(axis=1) == reference.argmax(axis=1))),
+            "mean_abs_prob_diff": float(diff.mean()),
+            "max_abs_prob_diff": float(diff.max()),
+        }
+
+    baseline_mean = results.get("pytorch", {}).get("latency", {}).get("mean_ms")
+    if baseline_mean:
+        for result in results.values():
+            if "latency" in result:
+                result["speedup_vs_pytorch"] = baseline_mean / result["latency"]["mean_ms"]
+
+    emit_results("emotion_backends", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
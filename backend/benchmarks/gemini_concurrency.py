@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for the async Gemini path against a local stand-in server
+
+Starts the fake Gemini server (fake_gemini_server.py) with a fixed reply
+delay, then fires many `generate_chat_response_async` calls at once
+from a single event loop. With a non-blocking client the whole burst takes
+about one round trip, not one round trip per call. Also checks that the
+per-call timeout returns the fallback reply, that cancelling a call
+cancels its request and that a burst beyond the admission limit is shed to
+the fallback reply at once instead of queueing. Finally it slows the server
+down past the reply deadline and checks that replies are hedged to the
+fallback, that the circuit breaker opens and that it closes again after a
+successful probe. Exits non-zero if any check fails.
+
+Usage:
+    python benchmarks/gemini_concurrency.py --calls 200 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from common import emit_results, percentile
+from fake_gemini_server import FakeGeminiServer
+
+
+async def run_checks(calls: int, latency: float):
+    server = FakeGeminiServer(latency=latency, seed=0)
+    api_base = await server.start()
+
+    os.environ.setdefault("GEMINI_API_KEY", "stand-in-key")
+    import common  # noqa: F401  (puts the backend directory on sys.path)
+    from admission_control import AdmissionLimiter
+    from circuit_breaker import CircuitBreaker
+    from gemini_client import GeminiClient
+
+    client = GeminiClient(api_base=api_base)
+    # Admit the whole burst; shedding is checked separately below
+    client.admission = AdmissionLimiter("gemini", capacity=calls, max_queue=0)
+    mood_context = {"mood_label": "neutral", "mood_score": 0.5, "mood_timestamp": "N/A"}
+    results = {"calls": calls, "server_latency_s": latency}
+    failures = []
+
+    async def timed_call(i):
+        start = time.perf_counter()
+        # The fake server tags replies to messages mentioning "calm" with MOOD_UPDATE: calm
+        reply = await client.generate_chat_response_async(f"message {i}, feeling calm", mood_context)
+        return time.perf_counter() - start, reply
+
+    # Burst: every call in flight at once on one event loop
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(timed_call(i) for i in range(calls)))
+    wall = time.perf_counter() - start
+    latencies = [latency_s for latency_s, _ in outcomes]
+    ok = sum(1 for _, (text, mood) in outcomes if mood == "calm")
+    results.update({
+        "wall_seconds": wall,
+        "successful": ok,
+        "server_max_in_flight": server.stats["max_in_flight"],
+        "p50_ms": 1000.0 * percentile(latencies, 50),
+        "p99_ms": 1000.0 * percentile(latencies, 99),
+        "sequential_estimate_seconds": calls * latency,
+        "speedup_vs_sequential": calls * latency / wall,
+    })
+    if ok != calls:
+        failures.append(f"{calls - ok} calls did not get the stand-in reply")
+    # Client and server share this machine's CPU, so allow for per-call overhead
+    if server.stats["max_in_flight"] < min(calls, 2) or wall > max(calls * latency / 4, 2 * latency):
+        failures.append(f"burst took {wall:.2f}s, calls were not concurrent")
+
+    # Timeout: server is slower than the per-call deadline
+    start = time.perf_counter()
+    text, mood = await client.generate_chat_response_async("slow", mood_context, timeout=latency / 4)
+    results["timeout_returned_after_s"] = time.perf_counter() - start
+    if mood is not None or results["timeout_returned_after_s"] > latency:
+        failures.append("per-call timeout did not return the fallback reply in time")
+
+    # Cancellation: the caller gives up, the request is abandoned
+    task = asyncio.create_task(client.generate_chat_response_async("cancel me", mood_context))
+    await asyncio.sleep(latency / 4)
+    task.cancel()
+    try:
+        await task
+        failures.append("cancelled call completed anyway")
+    except asyncio.CancelledError:
+        pass
+
+    # Shedding: a burst well past capacity + queue gets fallbacks at once
+    capacity, queue = max(1, calls // 20), max(1, calls // 20)
+    client.admission = AdmissionLimiter("gemini", capacity=capacity, max_queue=queue, max_wait=latency * 4)
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(timed_call(i) for i in range(calls)))
+    served = sum(1 for _, (text, mood) in outcomes if mood == "calm")
+    shed_latencies = [latency_s for latency_s, (text, mood) in outcomes if mood is None]
+    results["shedding"] = {
+        "capacity": capacity,
+        "queue": queue,
+        "served": served,
+        "shed": len(shed_latencies),
+        "shed_p99_ms": 1000.0 * percentile(shed_latencies, 99),
+        "wall_seconds": time.perf_counter() - start,
+        "admission": client.admission.stats(),
+    }
+    if served != capacity + queue:
+        failures.append(f"expected {capacity + queue} calls served past the admission limit, got {served}")
+    # Shed calls must not wait for a round trip (the burst itself shares one CPU)
+    if shed_latencies and percentile(shed_latencies, 99) > latency:
+        failures.append("shed calls were not answered immediately")
+
+    # Outage: replies miss their deadline, the breaker opens, then a probe closes it
+    client.admission = AdmissionLimiter("gemini", capacity=calls)
+    client.breaker = CircuitBreaker("gemini", failure_threshold=3, slow_call_seconds=latency,
+                                    open_seconds=latency * 4)
+    server.latency = latency * 2
+    hedged_latencies = []
+    for i in range(3):
+        start = time.perf_counter()
+        text, mood = await client.generate_chat_response_async(f"slow {i}", mood_context, deadline=latency / 4)
+        hedged_latencies.append(time.perf_counter() - start)
+    # Let the hedged calls finish in the background and reach the breaker
+    await asyncio.sleep(latency * 2.5)
+    tripped = client.breaker.state
+    start = time.perf_counter()
+    await client.generate_chat_response_async("while open", mood_context)
+    short_circuit_s = time.perf_counter() - start
+    server.latency = latency / 10
+    await asyncio.sleep(latency * 4)
+    text, mood = await client.generate_chat_response_async("calm probe", mood_context)
+    results["outage"] = {
+        "hedged_max_s": max(hedged_latencies),
+        "state_after_slow_calls": tripped,
+        "short_circuit_s": short_circuit_s,
+        "state_after_probe": client.breaker.state,
+        "breaker": client.breaker.stats(),
+    }
+    if max(hedged_latencies) > latency:
+        failures.append("replies past the deadline were not hedged to the fallback")
+    if tripped != "open" or short_circuit_s > latency / 4:
+        failures.append("circuit breaker did not open after slow calls")
+    if client.breaker.state != "closed" or mood != "calm":
+        failures.append("circuit breaker did not close after a successful probe")
+
+    results["client"] = client.stats()
+    results["failures"] = failures
+    client.close()
+    await server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async Gemini calls against a local stand-in server")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="Stand-in server delay per call (s)")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_checks(args.calls, args.latency))
+    emit_results("gemini_concurrency", results, args.output)
+    if results["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
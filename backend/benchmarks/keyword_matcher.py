@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Aho-Corasick keyword matcher vs per-keyword substring loops
+
+Compares the single-pass `KeywordMatcher` with the original
+`keyword in message_lower` loops for crisis detection and keyword emotion
+scoring, across message lengths and keyword list sizes. Also reports how
+often the two disagree. Crisis keywords match anywhere, like the loop, so
+they should never disagree; emotion keywords require word boundaries, so
+the loop also fires on words like "made" for "mad".
+
+Usage:
+    python benchmarks/keyword_matcher.py --lengths 8 64 512 --keyword-scale 1 4 16
+"""
+
+import argparse
+import itertools
+
+from common import SAMPLE_MESSAGES, emit_results, summarize_latencies, time_calls
+
+
+def substring_first_label(keywords, message):
+    """The original detect_crisis loop"""
+    message_lower = message.lower()
+    for label, words in keywords.items():
+        for keyword in words:
+            if keyword.rstrip("*") in message_lower:
+                return label
+    return None
+
+
+def substring_counts(keywords, text):
+    """The original keyword emotion scoring loop"""
+    text_lower = text.lower()
+    return {
+        label: sum(1 for keyword in words if keyword.rstrip("*") in text_lower)
+        for label, words in keywords.items()
+    }
+
+
+def scale_keywords(keywords, factor):
+    """Grow every list with synthetic keywords so larger vocabularies can be measured"""
+    if factor <= 1:
+        return keywords
+    return {
+        label: list(words) + [f"{word.rstrip('*')}x{i}" for i in range(1, factor) for word in words]
+        for label, words in keywords.items()
+    }
+
+
+def make_messages(words, count):
+    vocabulary = " ".join(SAMPLE_MESSAGES).split()
+    return [
+        " ".join(itertools.islice(itertools.cycle(vocabulary), i * 5, i * 5 + words))
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the keyword matcher against substring loops")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[8, 64, 512], help="Message lengths in words")
+    parser.add_argument("--keyword-scale", type=int, nargs="+", default=[1, 4, 16],
+                        help="Multiply keyword list sizes by these factors")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    from ai_service_lite import AIService
+    from keyword_matcher import KeywordMatcher
+
+    service = AIService()
+    keyword_sets = {"crisis": service.crisis_keywords, "emotion": service.emotion_keywords}
+
+    results = []
+    for name, base_keywords in keyword_sets.items():
+        for factor in args.keyword_scale:
+            keywords = scale_keywords(base_keywords, factor)
+            # Same matching mode as the services use for each list
+            matcher = KeywordMatcher(keywords, whole_words=(name != "crisis"))
+            keyword_count = sum(len(words) for words in keywords.values())
+
+            if name == "crisis":
+                loop_fn = lambda text: substring_first_label(keywords, text)
+                matcher_fn = matcher.first_label
+            else:
+                loop_fn = lambda text: substring_counts(keywords, text)
+                matcher_fn = matcher.count_keywords
+
+            for words in args.lengths:
+                messages = make_messages(words, args.messages)
+                loop = summarize_latencies(time_calls(loop_fn, messages, args.repeat))
+                compiled = summarize_latencies(time_calls(matcher_fn, messages, args.repeat))
+                disagreements = sum(1 for text in messages if loop_fn(text) != matcher_fn(text))
+                results.append({
+                    "keywords": name,
+                    "keyword_count": keyword_count,
+                    "message_words": words,
+                    "substring_loop": loop,
+                    "aho_corasick": compiled,
+                    "speedup": loop["mean_ms"] / compiled["mean_ms"] if compiled["mean_ms"] else None,
+                    "disagreement_rate": disagreements / len(messages),
+                })
+
+    emit_results("keyword_matcher", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Reply cache hit rate over scripted chat sessions
+
+Plays chat sessions through the real `ConversationContextManager` and
+`ResponseCache`, the way `/chat/send` uses them: build the context, look the
+message up, store the reply on a miss and record the turn. Chat history is
+kept in memory instead of SQLite. Each script lists the messages of one
+session and whether each should be answered from the cache: greetings,
+how-to questions and exact repeats must hit, and follow-ups such as "yes"
+must never be answered with a reply to a different turn. Exits non-zero if
+any message hits or misses unexpectedly.
+
+Usage:
+    python benchmarks/reply_cache.py
+"""
+
+import argparse
+import sys
+import threading
+
+from common import emit_results
+from conversation_context import ConversationContextManager
+from response_cache import ResponseCache, cache_scope
+
+MOOD_CONTEXT = {"mood_label": "neutral", "mood_score": 0.5}
+
+# (message, expected to hit)
+SESSIONS = {
+    "greetings_and_how_to": [
+        ("hi", False),
+        ("hi", True),
+        ("how do I manage stress?", False),
+        ("How do I manage stress", True),
+        ("hello", False),
+        ("hello!", True),
+    ],
+    "repeats": [
+        ("I failed my exam today", False),
+        ("I failed my exam today", True),
+        ("my roommate is annoying", False),
+        ("I failed my exam today", False),
+    ],
+    "follow_ups": [
+        ("I can't sleep lately", False),
+        ("yes", False),
+        ("tell me more", False),
+        ("I keep worrying about my grades", False),
+        ("yes", False),
+    ],
+}
+
+
+class MemoryHistory:
+    """Stand-in for the chat and summary tables"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chats = []
+        self.summary = None
+
+    def get_chat_history(self, user_id, limit=50):
+        with self.lock:
+            return list(reversed(self.chats))[:limit]
+
+    def get_conversation_summary(self, user_id):
+        return self.summary
+
+    def update_conversation_summary(self, user_id, merge):
+        with self.lock:
+            self.summary = merge(self.summary)
+            return self.summary
+
+
+def play(session):
+    history = MemoryHistory()
+    context_manager = ConversationContextManager(history)
+    cache = ResponseCache(max_users=4, per_user=32, ttl_seconds=None)
+    failures = []
+    for chat_id, (message, expect_hit) in enumerate(session, start=1):
+        context = context_manager.context_for(1)
+        scope = cache_scope(message, context)
+        cached = cache.get(1, message, MOOD_CONTEXT, scope)
+        if cached is None:
+            # Unique per turn, so a reply reused for the wrong turn is visible
+            reply = f"reply to turn {chat_id}"
+            cache.set(1, message, MOOD_CONTEXT, reply, None, 1.0, scope)
+        else:
+            reply = cached.text
+        if (cached is not None) != expect_hit:
+            failures.append(f"{message!r} (turn {chat_id}) {'hit' if cached else 'missed'} the cache")
+        context_manager.record_turn(1, chat_id, message, reply)
+        with history.lock:
+            history.chats.append({"id": chat_id, "user_message": message, "bot_response": reply,
+                                  "detected_emotion": None, "timestamp": f"2026-01-01 00:00:{chat_id:02d}.000"})
+    return cache.stats(), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reply cache hits and misses over scripted sessions")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    results, failures = {}, []
+    for name, session in SESSIONS.items():
+        stats, session_failures = play(session)
+        results[name] = {key: stats[key] for key in ("hits", "misses", "skipped_context", "hit_rate")}
+        failures += [f"{name}: {failure}" for failure in session_failures]
+    results["failures"] = failures
+    emit_results("reply_cache", results, args.output)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
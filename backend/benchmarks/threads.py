@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Workers x threads benchmark matrix for detect_emotion
+
+For every (worker processes, torch threads) combination, starts that many
+processes, each configuring torch the way an API worker would, and runs
+uncached emotion inference concurrently for a fixed duration. Reports
+aggregate throughput and p50/p99 latency per combination.
+
+Usage:
+    python benchmarks/threads.py --workers 1 2 4 --threads 1 2 4 --duration 20
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from common import SAMPLE_MESSAGES, collect_results, emit_results, percentile
+
+
+def _run_worker(workers, threads, affinity, duration, barrier, results):
+    # Configuration is read at import time, so set it before importing backend modules
+    os.environ["INFERENCE_WORKER_PROCESSES"] = str(workers)
+    os.environ["TORCH_NUM_THREADS"] = str(threads)
+    os.environ["TORCH_CPU_AFFINITY"] = affinity
+
+    import common  # noqa: F401  (puts the backend directory on sys.path)
+    from ai_service import AIService
+
+    service = AIService(preload_components=["emotion"])
+    report = service.thread_report()
+    # Bypass the emotion cache so every call does real model work
+    service._predict_emotion(SAMPLE_MESSAGES[0])
+
+    barrier.wait()
+    latencies = []
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        service._predict_emotion(SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)])
+        latencies.append(time.perf_counter() - start)
+        i += 1
+
+    results.put({"latencies": latencies, "threads": report})
+
+
+def run_combination(workers, threads, affinity, duration, timeout):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_run_worker, args=(workers, threads, affinity, duration, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outputs = collect_results(results, processes, len(processes), duration + timeout)
+    for process in processes:
+        process.join()
+
+    latencies = [latency for output in outputs for latency in output["latencies"]]
+    return {
+        "workers": workers,
+        "threads_per_worker": threads,
+        "cpu_affinity": affinity,
+        "calls": len(latencies),
+        "throughput_per_s": len(latencies) / duration,
+        "p50_ms": 1000.0 * percentile(latencies, 50),
+        "p99_ms": 1000.0 * percentile(latencies, 99),
+        "effective_threads": [output["threads"] for output in outputs],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers x threads matrix for detect_emotion")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--affinity", choices=["off", "auto"], default="off")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per combination")
+    parser.add_argument("--timeout", type=float, default=600.0,
+                        help="Seconds on top of --duration to wait for workers (model loading)")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    for workers in args.workers:
+        for threads in args.threads:
+            print(f"Running {workers} worker(s) x {threads} thread(s)...", flush=True)
+            try:
+                results.append(run_combination(workers, threads, args.affinity, args.duration, args.timeout))
+            except RuntimeError as e:
+                print(f"{workers} worker(s) x {threads} thread(s) failed: {e}", file=sys.stderr, flush=True)
+                results.append({"workers": workers, "threads_per_worker": threads, "error": str(e)})
+                failed = True
+
+    emit_results("threads_matrix", results, args.output)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Tiered emotion analysis: keyword pass first, transformer only when ambiguous
+
+`CascadeAIService` scores every message with the lite keyword matcher,
+which takes microseconds. A message is answered from that pass when its
+keywords clearly point at one emotion (or it is a short keyword-free
+check-in such as "hi"). Otherwise it is escalated to the wrapped service,
+normally the `AIServiceManager`, whose transformer model does the forward
+pass. Keyword counts can't read negation ("not happy") or contrast
+("happy but worried"), so messages with those cues always escalate.
+Everything other than emotion detection is delegated unchanged.
+
+Escalation rate and how often the two tiers agree are reported by
+`cascade_stats()`. A fraction of confidently classified messages is also
+checked against the model in the background (`CASCADE_SHADOW_RATE`), to
+show whether the threshold is letting wrong answers through.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    CASCADE_ESCALATION_THRESHOLD, CASCADE_MIN_KEYWORD_HITS, CASCADE_SHORT_MESSAGE_WORDS, CASCADE_SHADOW_RATE
+)
+
+logger = logging.getLogger(__name__)
+
+# Negation and contrast cues: keyword counts would score these messages backwards or one-sided
+_NEGATION_OR_CONTRAST = re.compile(
+    r"\b(?:not|no|never|nothing|nobody|none|neither|nor|without|hardly|barely|cannot"
+    r"|but|although|though|however|yet)\b|n['\u2019]t\b",
+    re.IGNORECASE,
+)
+
+
+def _dominant(scores: Dict[str, float]) -> str:
+    return max(scores, key=scores.get) if scores else "neutral"
+
+
+class CascadeAIService:
+    """Answers emotion detection from keywords when confident, escalating the rest"""
+
+    def __init__(self, escalation_service, lite=None,
+                 threshold: float = CASCADE_ESCALATION_THRESHOLD,
+                 min_keyword_hits: int = CASCADE_MIN_KEYWORD_HITS,
+                 short_message_words: int = CASCADE_SHORT_MESSAGE_WORDS,
+                 shadow_rate: float = CASCADE_SHADOW_RATE):
+        if lite is None:
+            from ai_service_lite import AIService as LiteAIService
+            lite = getattr(escalation_service, "lite", None) or LiteAIService()
+        self.escalation_service = escalation_service
+        self.lite = lite
+        self.threshold = threshold
+        self.min_keyword_hits = min_keyword_hits
+        self.short_message_words = short_message_words
+        self.shadow_rate = shadow_rate
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cascade-shadow") \
+            if shadow_rate > 0 else None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "messages": 0,
+            "escalations": 0,
+            "escalation_agreements": 0,
+            "shadow_checks": 0,
+            "shadow_agreements": 0,
+            "lite_seconds": 0.0,
+            "escalated_seconds": 0.0,
+        }
+
+    def __getattr__(self, name):
+        # Only called for attributes not defined here: delegate to the escalation service
+        if name.startswith("_") or name in ("escalation_service", "lite"):
+            raise AttributeError(name)
+        return getattr(self.escalation_service, name)
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def classify_lite(self, text: str) -> Tuple[bool, Dict[str, float]]:
+        """Keyword pass: (confident, scores)"""
+        counts = self.lite.emotion_matcher.count_keywords(text)
+        total = sum(counts.values())
+        if _NEGATION_OR_CONTRAST.search(text):
+            confident = False
+        elif total == 0:
+            # No emotional keywords: only trust the neutral answer for short check-ins
+            confident = len(text.split()) <= self.short_message_words
+        else:
+            confident = total >= self.min_keyword_hits and max(counts.values()) / total >= self.threshold
+        return confident, self.lite.detect_emotion(text)
+
+    def detect_emotion(self, text: str) -> Dict[str, float]:
+        """Keyword scores when they are decisive, transformer scores otherwise"""
+        return self.detect_emotion_batch([text])[0]
+
+    def detect_emotion_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[Dict[str, float]]:
+        """Cascade over many texts; escalated texts go to the model as one batch"""
+        start = time.perf_counter()
+        results: List[Optional[Dict[str, float]]] = [None] * len(texts)
+        lite_results = {}
+        escalate = []
+        for i, text in enumerate(texts):
+            confident, scores = self.classify_lite(text)
+            if confident:
+                results[i] = scores
+                self._maybe_shadow(text, scores)
+            else:
+                lite_results[i] = scores
+                escalate.append(i)
+        lite_done = time.perf_counter()
+        self._count(messages=len(texts), escalations=len(escalate), lite_seconds=lite_done - start)
+
+        if escalate:
+            escalated_texts = [texts[i] for i in escalate]
+            if hasattr(self.escalation_service, "detect_emotion_batch"):
+                kwargs = {"batch_size": batch_size} if batch_size else {}
+                model_scores = self.escalation_service.detect_emotion_batch(escalated_texts, **kwargs)
+            else:
+                model_scores = [self.escalation_service.detect_emotion(text) for text in escalated_texts]
+            agreements = 0
+            for i, scores in zip(escalate, model_scores):
+                results[i] = scores
+                agreements += _dominant(scores) == _dominant(lite_results[i])
+            self._count(escalation_agreements=agreements, escalated_seconds=time.perf_counter() - lite_done)
+
+        return results
+
+    def _maybe_shadow(self, text: str, lite_scores: Dict[str, float]):
+        """Check a sample of confident keyword answers against the model, off the request path"""
+        if self._shadow_executor is None or random.random() >= self.shadow_rate:
+            return
+
+        def check():
+            try:
+                model_scores = self.escalation_service.detect_emotion(text)
+                self._count(shadow_checks=1, shadow_agreements=int(_dominant(model_scores) == _dominant(lite_scores)))
+            except Exception as e:
+                logger.warning(f"Cascade shadow check failed: {e}")
+
+        self._shadow_executor.submit(check)
+
+    def get_dominant_emotion(self, text: str) -> str:
+        """Get the dominant emotion from text"""
+        emotion_scores = self.detect_emotion(text)
+        dominant_emotion = _dominant(emotion_scores)
+        if emotion_scores[dominant_emotion] > 0.3:
+            return dominant_emotion
+        return "neutral"
+
+    def cascade_stats(self) -> Dict:
+        """Escalation rate, tier agreement and time spent per tier"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        messages = stats["messages"]
+        escalations = stats["escalations"]
+        stats.update({
+            "threshold": self.threshold,
+            "escalation_rate": escalations / messages if messages else 0.0,
+            # How often the keyword guess matched the model on messages it was unsure about
+            "escalation_agreement_rate": stats["escalation_agreements"] / escalations if escalations else None,
+            # How often confident keyword answers matched the model (sampled)
+            "shadow_agreement_rate": (stats["shadow_agreements"] / stats["shadow_checks"]
+                                      if stats["shadow_checks"] else None),
+            "lite_mean_ms": 1000.0 * stats["lite_seconds"] / messages if messages else 0.0,
+            "escalated_mean_ms": 1000.0 * stats["escalated_seconds"] / escalations if escalations else 0.0,
+        })
+        return stats
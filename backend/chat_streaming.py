@@ -0,0 +1,137 @@
+"""
+Streaming, KV-cached token generation for the local chat model
+
+`StreamingChatGenerator` samples DialoGPT/GPT-2 one token at a time and
+yields text as soon as it is produced. The model's past key/values are kept
+per conversation, so a follow-up turn only encodes the new message instead
+of re-encoding the whole history. Generation runs on a small fixed pool of
+threads (`CHAT_STREAM_WORKERS`), so a burst of clients queues instead of
+starting a thread each.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+import torch
+
+from config import CHAT_STREAM_WORKERS, CHAT_MAX_NEW_TOKENS, CHAT_SESSION_CACHE_SIZE, CHAT_SESSION_TTL_SECONDS
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Sentinel pushed onto the token queue when generation ends
+_DONE = object()
+
+
+class StreamingChatGenerator:
+    """Token-by-token generation with per-conversation KV cache reuse"""
+
+    def __init__(self, model, tokenizer, device: str = "cpu",
+                 max_new_tokens: int = CHAT_MAX_NEW_TOKENS,
+                 temperature: float = 0.7, top_k: int = 50, workers: int = CHAT_STREAM_WORKERS):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_k = top_k
+        self.eos_token_id = tokenizer.eos_token_id
+        self.max_positions = getattr(model.config, "n_positions", 1024)
+        # conversation_id -> {"past": past_key_values, "length": tokens cached, "pending": [ids not yet fed]}
+        self.sessions = TTLCache(max_size=CHAT_SESSION_CACHE_SIZE, ttl_seconds=CHAT_SESSION_TTL_SECONDS)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="chat-stream")
+
+    def reset(self, conversation_id: str):
+        """Forget the cached history of a conversation"""
+        self.sessions.delete(conversation_id)
+
+    async def stream(self, message: str, conversation_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield reply text incrementally; cancelling the iterator stops generation"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def emit(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        self._executor.submit(self._generate, message, conversation_id, emit, stop)
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Client went away or consumer stopped early: let the thread finish quickly
+            # (a stream still queued for a thread returns as soon as it starts)
+            stop.set()
+
+    def _generate(self, message: str, conversation_id: Optional[str], emit, stop: threading.Event):
+        try:
+            self._generate_tokens(message, conversation_id, emit, stop)
+        except Exception as e:
+            logger.error(f"Error in streaming chat generation: {e}")
+            emit(e)
+        finally:
+            emit(_DONE)
+
+    def _generate_tokens(self, message: str, conversation_id: Optional[str], emit, stop: threading.Event):
+        # Take the session out of the cache so concurrent turns never share mutable state
+        session = self.sessions.get(conversation_id) if conversation_id else None
+        if conversation_id:
+            self.sessions.delete(conversation_id)
+
+        new_ids = session["pending"] if session else []
+        new_ids = new_ids + self.tokenizer.encode(message) + [self.eos_token_id]
+        past = session["past"] if session else None
+        length = session["length"] if session else 0
+
+        # Start a fresh context when the cached history would overflow the model window
+        if length + len(new_ids) + self.max_new_tokens > self.max_positions:
+            past, length = None, 0
+            new_ids = self.tokenizer.encode(message) + [self.eos_token_id]
+
+        input_ids = torch.tensor([new_ids], device=self.device)
+        generated = []
+        emitted_text = ""
+        # Sampled tokens not yet fed through the model; they open the next turn
+        pending = [self.eos_token_id]
+
+        with torch.no_grad():
+            for _ in range(self.max_new_tokens):
+                if stop.is_set():
+                    return
+                outputs = self.model(input_ids=input_ids, past_key_values=past, use_cache=True)
+                past = outputs.past_key_values
+                length += input_ids.shape[1]
+
+                next_id = self._sample(outputs.logits[0, -1, :])
+                if next_id == self.eos_token_id:
+                    pending = [self.eos_token_id]
+                    break
+                generated.append(next_id)
+                pending = [next_id, self.eos_token_id]
+                input_ids = torch.tensor([[next_id]], device=self.device)
+
+                # Decode the whole reply so far so multi-token characters come out intact
+                text = self.tokenizer.decode(generated, skip_special_tokens=True)
+                if len(text) > len(emitted_text) and not text.endswith("�"):
+                    emit(text[len(emitted_text):])
+                    emitted_text = text
+
+        if conversation_id and past is not None:
+            self.sessions.set(conversation_id, {"past": past, "length": length, "pending": pending})
+
+    def _sample(self, logits: torch.Tensor) -> int:
+        logits = logits / max(self.temperature, 1e-5)
+        if self.top_k:
+            threshold = torch.topk(logits, self.top_k).values[-1]
+            logits = logits.masked_fill(logits < threshold, float("-inf"))
+        probabilities = torch.softmax(logits, dim=-1)
+        return int(torch.multinomial(probabilities, num_samples=1))
@@ -0,0 +1,141 @@
+"""
+Circuit breaker for calls to a remote dependency
+
+`CircuitBreaker` watches the outcome of every call to the Gemini API. After
+`failure_threshold` consecutive failures (errors, timeouts or calls slower
+than `slow_call_seconds`) it opens: calls are refused straight away so the
+caller can answer locally instead of waiting on a provider that is down.
+After `open_seconds` it goes half-open and lets a few probe calls through;
+if they succeed it closes again, if one fails it reopens.
+
+Usage:
+    ticket = breaker.allow()
+    if ticket is None:
+        ...  # open: answer locally
+    try:
+        result = call()
+    except Exception:
+        breaker.on_failure(ticket)
+        raise
+    breaker.on_success(ticket, elapsed_seconds)
+
+The breaker is thread-safe.
+"""
+
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from config import (
+    GEMINI_BREAKER_FAILURE_THRESHOLD, GEMINI_BREAKER_SLOW_CALL_SECONDS,
+    GEMINI_BREAKER_OPEN_SECONDS, GEMINI_BREAKER_HALF_OPEN_PROBES
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CallTicket(NamedTuple):
+    """Permission for one call; probe tickets are the half-open trial calls"""
+    probe: bool
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures or slow calls, probes with half-open trials"""
+
+    def __init__(self, name: str,
+                 failure_threshold: int = GEMINI_BREAKER_FAILURE_THRESHOLD,
+                 slow_call_seconds: float = GEMINI_BREAKER_SLOW_CALL_SECONDS,
+                 open_seconds: float = GEMINI_BREAKER_OPEN_SECONDS,
+                 half_open_probes: int = GEMINI_BREAKER_HALF_OPEN_PROBES):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._stats = {
+            "successes": 0,
+            "failures": 0,
+            "slow_calls": 0,
+            "short_circuited": 0,
+            "probes": 0,
+            "trips": 0,
+        }
+
+    def _trip(self):
+        """Open the circuit; caller holds the lock"""
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._stats["trips"] += 1
+
+    def allow(self) -> Optional[CallTicket]:
+        """A ticket if the call may go ahead, None if the circuit refuses it"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+            if self.state == CLOSED:
+                return CallTicket(probe=False)
+            if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                self._stats["probes"] += 1
+                return CallTicket(probe=True)
+            self._stats["short_circuited"] += 1
+            return None
+
+    def on_success(self, ticket: CallTicket, seconds: float = 0.0):
+        """Record a completed call; calls slower than slow_call_seconds count as failures"""
+        if self.slow_call_seconds and seconds > self.slow_call_seconds:
+            with self._lock:
+                self._stats["slow_calls"] += 1
+            self.on_failure(ticket)
+            return
+        with self._lock:
+            self._stats["successes"] += 1
+            self._consecutive_failures = 0
+            if ticket.probe:
+                self._probes_in_flight -= 1
+                if self.state == HALF_OPEN:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self.state = CLOSED
+
+    def on_failure(self, ticket: CallTicket):
+        """Record a failed call (error or timeout)"""
+        with self._lock:
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            if ticket.probe:
+                self._probes_in_flight -= 1
+                if self.state == HALF_OPEN:
+                    self._trip()
+            elif self.state == CLOSED and self._consecutive_failures >= self.failure_threshold:
+                self._trip()
+
+    def on_abandoned(self, ticket: CallTicket):
+        """The call never reached the remote (shed or cancelled): says nothing about its health"""
+        if ticket.probe:
+            with self._lock:
+                self._probes_in_flight -= 1
+
+    def stats(self) -> Dict:
+        """Current state, trip count and call outcomes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "state": self.state,
+                "consecutive_failures": self._consecutive_failures,
+                "open_for_seconds": time.monotonic() - self._opened_at if self.state == OPEN else 0.0,
+                "failure_threshold": self.failure_threshold,
+                "slow_call_seconds": self.slow_call_seconds,
+                "open_seconds": self.open_seconds,
+            })
+        return stats
@@ -5,7 +5,14 @@ import os
 from typing import Literal
 
 # AI Service Configuration
-AI_SERVICE_MODE: Literal["full", "lite"] = os.getenv("AI_SERVICE_MODE", "lite")
+AI_SERVICE_MODE: Literal["full", "lite", "remote", "cascade"] = os.getenv("AI_SERVICE_MODE", "lite")
+
+# Shared inference worker (AI_SERVICE_MODE=remote): one process owns the models
+# and API workers talk to it over a Unix socket
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "/tmp/curacore-inference.sock")
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "5"))
+INFERENCE_RETRY_SECONDS = float(os.getenv("INFERENCE_RETRY_SECONDS", "10"))
+INFERENCE_WORKER_CONCURRENCY = int(os.getenv("INFERENCE_WORKER_CONCURRENCY", "2"))
 
 # Database Configuration
 DATABASE_PATH = os.getenv("DATABASE_PATH", "users.db")
@@ -30,16 +37,129 @@ EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
 CHAT_MODEL = "microsoft/DialoGPT-medium"
 CHAT_FALLBACK_MODEL = "gpt2"
 
+# Full AI service components loaded at startup; the rest load on first use.
+# Chat replies come from Gemini, so the local chat model is not preloaded by default.
+AI_PRELOAD_COMPONENTS = [c.strip() for c in os.getenv("AI_PRELOAD_COMPONENTS", "emotion").split(",") if c.strip()]
+# Unload least recently used components when RSS exceeds this many MB (0 disables)
+AI_MEMORY_LIMIT_MB = float(os.getenv("AI_MEMORY_LIMIT_MB", "0"))
+# Unload components idle for this many seconds (0 disables)
+AI_COMPONENT_IDLE_SECONDS = float(os.getenv("AI_COMPONENT_IDLE_SECONDS", "0"))
+
+# Streaming local chat: tokens generated per reply, generation threads per process
+# and per-conversation KV caches kept
+CHAT_STREAM_WORKERS = int(os.getenv("CHAT_STREAM_WORKERS", "2"))
+CHAT_MAX_NEW_TOKENS = int(os.getenv("CHAT_MAX_NEW_TOKENS", "50"))
+CHAT_SESSION_CACHE_SIZE = int(os.getenv("CHAT_SESSION_CACHE_SIZE", "32"))
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "900"))
+
+# Emotion inference backend: pytorch | torch_int8 | onnx | onnx_int8
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "pytorch")
+
+# Torch CPU threading: processes on this host that run inference share the CPUs.
+# TORCH_NUM_THREADS=0 means an even share of the available CPUs per process.
+INFERENCE_WORKER_PROCESSES = int(os.getenv("INFERENCE_WORKER_PROCESSES", os.getenv("WEB_CONCURRENCY", "1")))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "1"))
+# "auto" pins each process to its own slice of cores, "off" leaves scheduling to the OS
+TORCH_CPU_AFFINITY = os.getenv("TORCH_CPU_AFFINITY", "off")
+
+# Emotion inference batching: long texts are split into overlapping chunks
+# and chunks are batched by length bucket to minimise padding
+EMOTION_MAX_TOKENS = int(os.getenv("EMOTION_MAX_TOKENS", "512"))
+EMOTION_CHUNK_OVERLAP = int(os.getenv("EMOTION_CHUNK_OVERLAP", "64"))
+EMOTION_LENGTH_BUCKETS = [int(b) for b in os.getenv("EMOTION_LENGTH_BUCKETS", "16,32,64,128,256,512").split(",")]
+EMOTION_BATCH_SIZE = int(os.getenv("EMOTION_BATCH_SIZE", "16"))
+
+# Warm-up before readiness: up to this many rounds per length bucket (0 disables),
+# stopping once two consecutive rounds are within the tolerance of each other
+WARMUP_MAX_ROUNDS = int(os.getenv("WARMUP_MAX_ROUNDS", "5"))
+WARMUP_STEADY_TOLERANCE = float(os.getenv("WARMUP_STEADY_TOLERANCE", "0.2"))
+
+# Emotion inference cache (shared by full and lite AI services)
+EMOTION_CACHE_SIZE = int(os.getenv("EMOTION_CACHE_SIZE", "4096"))
+EMOTION_CACHE_TTL_SECONDS = float(os.getenv("EMOTION_CACHE_TTL_SECONDS", "86400"))
+
+# Cascade mode (AI_SERVICE_MODE=cascade): keyword scores answer a message when one emotion
+# has at least this share of at least this many keyword hits; other messages, and any with
+# negation or contrast ("not", "never", "but"), go to the transformer model
+CASCADE_ESCALATION_THRESHOLD = float(os.getenv("CASCADE_ESCALATION_THRESHOLD", "0.75"))
+CASCADE_MIN_KEYWORD_HITS = int(os.getenv("CASCADE_MIN_KEYWORD_HITS", "2"))
+# Keyword-free messages up to this many words are treated as neutral without the model
+CASCADE_SHORT_MESSAGE_WORDS = int(os.getenv("CASCADE_SHORT_MESSAGE_WORDS", "3"))
+# Fraction of keyword-answered messages also checked against the model in the background
+CASCADE_SHADOW_RATE = float(os.getenv("CASCADE_SHADOW_RATE", "0.05"))
+
+# Chat pipeline stages (emotion inference, LLM call, DB writes) run in bounded slots.
+# High-severity crisis messages are admitted first and routine work never takes the reserved slots.
+SCHEDULER_INFERENCE_CONCURRENCY = int(os.getenv("SCHEDULER_INFERENCE_CONCURRENCY", "2"))
+# Gemini calls are async, so many can be in flight per worker
+SCHEDULER_LLM_CONCURRENCY = int(os.getenv("SCHEDULER_LLM_CONCURRENCY", "256"))
+SCHEDULER_WRITE_CONCURRENCY = int(os.getenv("SCHEDULER_WRITE_CONCURRENCY", "2"))
+CRISIS_RESERVED_SLOTS = int(os.getenv("CRISIS_RESERVED_SLOTS", "1"))
+# Per-stage latency budgets (wait + run); misses are counted in /metrics
+CRISIS_LATENCY_BUDGET_SECONDS = float(os.getenv("CRISIS_LATENCY_BUDGET_SECONDS", "2"))
+ROUTINE_LATENCY_BUDGET_SECONDS = float(os.getenv("ROUTINE_LATENCY_BUDGET_SECONDS", "10"))
+
+# Chat turns are saved after the reply is sent: writes run in order per user and failed
+# writes are retried with exponential backoff. Chat ids come from blocks reserved in the database.
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+WRITE_BEHIND_RETRY_SECONDS = float(os.getenv("WRITE_BEHIND_RETRY_SECONDS", "0.2"))
+CHAT_ID_BLOCK_SIZE = int(os.getenv("CHAT_ID_BLOCK_SIZE", "100"))
+
+# Per-user cache of Gemini replies, keyed by normalized message and mood bucket
+# (RESPONSE_CACHE_PER_USER=0 disables); crisis messages always skip it
+RESPONSE_CACHE_USERS = int(os.getenv("RESPONSE_CACHE_USERS", "1024"))
+RESPONSE_CACHE_PER_USER = int(os.getenv("RESPONSE_CACHE_PER_USER", "32"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "900"))
+
+# Conversation context in chat prompts: a compact summary of older messages plus the
+# last few turns, capped at this many (estimated) tokens (CONTEXT_TOKEN_BUDGET=0 disables)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "4"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "200"))
+CONTEXT_MAX_USERS = int(os.getenv("CONTEXT_MAX_USERS", "1024"))
+
+# Rolling conversation sentiment: weight of the newest message in the per-user EWMA
+CONVERSATION_SENTIMENT_ALPHA = float(os.getenv("CONVERSATION_SENTIMENT_ALPHA", "0.2"))
+
 # Gemini API Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+# Reply deadline: past this the chat gets the local fallback reply while the call
+# finishes in the background (hedged). Streams must send their first chunk by then.
+GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", "8"))
+# Keep-alive connection pool shared by all chat requests
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "256"))
+GEMINI_KEEPALIVE_SECONDS = float(os.getenv("GEMINI_KEEPALIVE_SECONDS", "60"))
+# Admission control: at most this many Gemini calls in flight per process, with a short
+# wait queue in front; calls beyond that get the local fallback reply straight away
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+GEMINI_ADMISSION_QUEUE_SIZE = int(os.getenv("GEMINI_ADMISSION_QUEUE_SIZE", "64"))
+GEMINI_ADMISSION_WAIT_SECONDS = float(os.getenv("GEMINI_ADMISSION_WAIT_SECONDS", "0.5"))
+# Circuit breaker: opens after this many consecutive failed or slow calls, then refuses
+# calls for GEMINI_BREAKER_OPEN_SECONDS before letting half-open probe calls through
+GEMINI_BREAKER_FAILURE_THRESHOLD = int(os.getenv("GEMINI_BREAKER_FAILURE_THRESHOLD", "5"))
+GEMINI_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("GEMINI_BREAKER_SLOW_CALL_SECONDS", "8"))
+GEMINI_BREAKER_OPEN_SECONDS = float(os.getenv("GEMINI_BREAKER_OPEN_SECONDS", "30"))
+GEMINI_BREAKER_HALF_OPEN_PROBES = int(os.getenv("GEMINI_BREAKER_HALF_OPEN_PROBES", "1"))
 
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
 def get_ai_service():
     """Factory function to get the appropriate AI service"""
-    if AI_SERVICE_MODE == "full":
+    if AI_SERVICE_MODE == "remote":
+        from inference_client import RemoteAIService
+        return RemoteAIService()
+    elif AI_SERVICE_MODE == "cascade":
+        from cascade_service import CascadeAIService
+        from service_manager import AIServiceManager
+        manager = AIServiceManager()
+        manager.start_background_load()
+        return CascadeAIService(manager)
+    elif AI_SERVICE_MODE == "full":
         try:
             from ai_service import AIService
             return AIService()
@@ -0,0 +1,291 @@
+"""
+Token-budgeted conversation context for chat prompts
+
+Each user keeps the last few turns verbatim plus a compact summary of
+everything older. When a turn falls out of the recent window it is folded
+into the summary by a background worker, one turn at a time, so building a
+prompt never re-reads or re-summarises the whole history. The rendered
+context is capped at `CONTEXT_TOKEN_BUDGET` tokens: oldest recent turns are
+dropped first, then the remaining ones are trimmed.
+
+The summary is extractive (one short line per earlier message, tagged with
+its detected emotion) so compaction costs no extra LLM calls. It is stored
+in the `conversation_summary` table and survives restarts.
+
+Chat ids come from per-process id blocks, so with several API workers a
+newer turn can have a smaller id than an older one. Turns are therefore
+ordered by timestamp and deduplicated by chat id, never compared by id.
+Every worker merges the latest turns from the database into its own state
+before building a prompt, and summaries are merged in the database, keyed
+by the chat ids already folded in, so workers don't overwrite each other.
+"""
+
+import logging
+import math
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_RECENT_TURNS, CONTEXT_SUMMARY_TOKENS, CONTEXT_MAX_USERS
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token in characters for budgeting (no tokenizer needed)
+CHARS_PER_TOKEN = 4
+# Words kept from an earlier message in its summary line
+_SUMMARY_LINE_WORDS = 24
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+# Section headings added by ConversationContext.render
+_HEADER_TOKENS = 16
+# Context sizes kept for percentiles
+_SAMPLE_WINDOW = 1024
+# Ids of summarized turns remembered so a turn is never summarized twice
+_SUMMARIZED_IDS_KEPT = 256
+
+
+def turn_timestamp() -> str:
+    """UTC time of a chat turn, in the database's timestamp format (with milliseconds)"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)].rstrip() + "..."
+
+
+class Turn(NamedTuple):
+    chat_id: int
+    user_message: str
+    bot_response: str
+    emotion: Optional[str] = None
+    timestamp: str = ""
+
+    def order(self):
+        return self.timestamp, self.chat_id
+
+
+class ConversationContext(NamedTuple):
+    summary: str
+    turns: List[Turn]
+    tokens: int
+
+    def render(self) -> str:
+        """Prompt section for GeminiClient._build_prompt ('' when there is no history)"""
+        parts = []
+        if self.summary:
+            parts.append(f"Earlier in the conversation:\n{self.summary}")
+        if self.turns:
+            lines = []
+            for turn in self.turns:
+                lines.append(f"User: {turn.user_message}")
+                lines.append(f"CuraCore: {turn.bot_response}")
+            parts.append("Most recent messages:\n" + "\n".join(lines))
+        return "\n\n".join(parts)
+
+
+def summary_line(turn: Turn) -> str:
+    """One compact line for an earlier message: its first sentence, tagged with the emotion"""
+    first_sentence = _SENTENCE_END.split(turn.user_message.strip(), maxsplit=1)[0]
+    words = first_sentence.split()
+    text = " ".join(words[:_SUMMARY_LINE_WORDS]) + ("..." if len(words) > _SUMMARY_LINE_WORDS else "")
+    tag = f"[{turn.emotion}] " if turn.emotion and turn.emotion != "neutral" else ""
+    return f"- {tag}{text}"
+
+
+class _UserState:
+    __slots__ = ("lock", "summary_lines", "summarized_count", "summarized_ids", "recent", "pending")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.summary_lines: List[str] = []
+        self.summarized_count = 0
+        self.summarized_ids: List[int] = []
+        # Oldest first, by timestamp
+        self.recent: List[Turn] = []
+        # Turns that left the recent window and are waiting to be summarised
+        self.pending: List[Turn] = []
+
+    def known(self, chat_id: int) -> bool:
+        return (chat_id in self.summarized_ids or any(turn.chat_id == chat_id for turn in self.recent)
+                or any(turn.chat_id == chat_id for turn in self.pending))
+
+
+class ConversationContextManager:
+    """Per-user summary plus recent turns, under a token budget"""
+
+    def __init__(self, db, budget_tokens: int = CONTEXT_TOKEN_BUDGET, recent_turns: int = CONTEXT_RECENT_TURNS,
+                 summary_tokens: int = CONTEXT_SUMMARY_TOKENS, max_users: int = CONTEXT_MAX_USERS):
+        self.db = db
+        self.enabled = budget_tokens > 0
+        self.budget_tokens = budget_tokens
+        self.recent_turns = max(1, recent_turns)
+        self.summary_tokens = min(summary_tokens, budget_tokens)
+        self._users = TTLCache(max_size=max_users, ttl_seconds=None)
+        self._users_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="context-compaction")
+        self._stats_lock = threading.Lock()
+        self._context_tokens = deque(maxlen=_SAMPLE_WINDOW)
+        self._stats = {"contexts_built": 0, "compactions": 0, "turns_summarized": 0, "trimmed_turns": 0,
+                       "refresh_failures": 0}
+
+    def _state(self, user_id, refresh: bool = False) -> _UserState:
+        """In-memory state for a user, loaded from the database on first use (and on `refresh`)"""
+        with self._users_lock:
+            state = self._users.get(user_id)
+            created = state is None
+            if created:
+                state = _UserState()
+                self._users.set(user_id, state)
+        if created or refresh:
+            self._refresh(user_id, state)
+        return state
+
+    def _refresh(self, user_id, state: _UserState) -> None:
+        """Merge the saved summary and latest turns, which other workers may have written, into a user's state"""
+        try:
+            saved = self.db.get_conversation_summary(user_id)
+            history = self.db.get_chat_history(user_id, limit=self.recent_turns)
+        except Exception as e:
+            with self._stats_lock:
+                self._stats["refresh_failures"] += 1
+            logger.warning(f"Could not load conversation context for user {user_id}: {e}")
+            return
+        with state.lock:
+            if saved:
+                state.summary_lines = [line for line in saved["summary"].split("\n") if line]
+                state.summarized_count = saved["summarized_count"]
+                state.summarized_ids = saved["summarized_ids"]
+            for chat in history:
+                if not state.known(chat["id"]):
+                    state.recent.append(Turn(chat["id"], chat["user_message"], chat["bot_response"],
+                                             chat.get("detected_emotion"), str(chat.get("timestamp") or "")))
+            needs_compaction = self._settle(state)
+        if needs_compaction:
+            self._executor.submit(self._compact, user_id, state)
+
+    def _settle(self, state: _UserState) -> bool:
+        """Order recent turns by time and move any past the window to pending; True if compaction is needed"""
+        state.recent.sort(key=Turn.order)
+        overflow = len(state.recent) - self.recent_turns
+        if overflow > 0:
+            state.pending.extend(state.recent[:overflow])
+            del state.recent[:overflow]
+        return bool(state.pending)
+
+    def context_for(self, user_id) -> ConversationContext:
+        """Summary and recent turns for the next prompt, within the token budget"""
+        if not self.enabled:
+            return ConversationContext("", [], 0)
+        # Picks up turns saved by other workers since the last request
+        state = self._state(user_id, refresh=True)
+        with state.lock:
+            summary = "\n".join(state.summary_lines)
+            turns = list(state.recent)
+
+        summary = _truncate(summary, self.summary_tokens)
+        budget = self.budget_tokens - estimate_tokens(summary) - _HEADER_TOKENS
+        trimmed = 0
+        # Newest turns matter most: drop from the oldest end first
+        while turns and sum(self._turn_tokens(turn) for turn in turns) > budget:
+            if len(turns) == 1:
+                turn = turns[0]
+                half = max(1, budget // 2)
+                turns = [turn._replace(user_message=_truncate(turn.user_message, half),
+                                       bot_response=_truncate(turn.bot_response, budget - half))]
+                break
+            turns.pop(0)
+            trimmed += 1
+
+        context = ConversationContext(summary, turns, 0)
+        context = context._replace(tokens=estimate_tokens(context.render()))
+        with self._stats_lock:
+            self._stats["contexts_built"] += 1
+            self._stats["trimmed_turns"] += trimmed
+            self._context_tokens.append(context.tokens)
+        return context
+
+    @staticmethod
+    def _turn_tokens(turn: Turn) -> int:
+        # Includes the "User: " / "CuraCore: " labels
+        return estimate_tokens(turn.user_message) + estimate_tokens(turn.bot_response) + 5
+
+    def record_turn(self, user_id, chat_id: int, user_message: str, bot_response: str,
+                    emotion: Optional[str] = None, timestamp: Optional[str] = None) -> None:
+        """Add a saved turn; turns pushed out of the recent window are summarised in the background"""
+        if not self.enabled:
+            return
+        state = self._state(user_id)
+        with state.lock:
+            if state.known(chat_id):
+                # Already loaded from the database along with the rest of the history
+                return
+            state.recent.append(Turn(chat_id, user_message, bot_response, emotion, timestamp or turn_timestamp()))
+            needs_compaction = self._settle(state)
+        if needs_compaction:
+            self._executor.submit(self._compact, user_id, state)
+
+    def _compact(self, user_id, state: _UserState) -> None:
+        """Fold pending turns into the saved summary, keeping it under its token budget"""
+        with state.lock:
+            pending, state.pending = sorted(state.pending, key=Turn.order), []
+        if not pending:
+            return
+        folded = []
+
+        def merge(saved: Optional[Dict]) -> Dict:
+            # Runs inside the database transaction, against the summary other workers saved
+            lines = [line for line in saved["summary"].split("\n") if line] if saved else []
+            ids = saved["summarized_ids"] if saved else []
+            new = [turn for turn in pending if turn.chat_id not in ids]
+            lines += [summary_line(turn) for turn in new]
+            # Oldest summary lines fade out first
+            while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+                lines.pop(0)
+            folded[:] = new
+            return {
+                "summary": "\n".join(lines),
+                "summarized_count": (saved["summarized_count"] if saved else 0) + len(new),
+                "summarized_ids": (ids + [turn.chat_id for turn in new])[-_SUMMARIZED_IDS_KEPT:],
+            }
+
+        try:
+            saved = self.db.update_conversation_summary(user_id, merge)
+        except Exception as e:
+            with state.lock:
+                # Try again with the next compaction
+                state.pending = pending + state.pending
+            logger.warning(f"Conversation summary compaction failed for user {user_id}: {e}")
+            return
+        with state.lock:
+            state.summary_lines = [line for line in saved["summary"].split("\n") if line]
+            state.summarized_count = saved["summarized_count"]
+            state.summarized_ids = saved["summarized_ids"]
+        with self._stats_lock:
+            self._stats["compactions"] += 1
+            self._stats["turns_summarized"] += len(folded)
+
+    def stats(self) -> Dict:
+        """Context sizes against the budget and compaction counts"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            sizes = sorted(self._context_tokens)
+        stats.update({
+            "budget_tokens": self.budget_tokens,
+            "recent_turns": self.recent_turns,
+            "summary_tokens": self.summary_tokens,
+            "users": len(self._users),
+            "context_tokens_p50": sizes[len(sizes) // 2] if sizes else 0,
+            "context_tokens_max": sizes[-1] if sizes else 0,
+        })
+        return stats
@@ -1,5 +1,6 @@
 import sqlite3
 import bcrypt
+import json
 from datetime import datetime
 import os
 
@@ -46,11 +47,55 @@ class Database:
                 user_id INTEGER NOT NULL,
                 mood TEXT NOT NULL,
                 notes TEXT,
+                emotion_scores TEXT,
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
         
+        # Rolling per-user conversation sentiment (exponentially weighted emotion vector)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_sentiment (
+                user_id INTEGER PRIMARY KEY,
+                emotion_vector TEXT NOT NULL,
+                message_count INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        
+        # Compacted per-user conversation summary used as prompt context
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_summary (
+                user_id INTEGER PRIMARY KEY,
+                summary TEXT NOT NULL,
+                summarized_count INTEGER DEFAULT 0,
+                summarized_ids TEXT DEFAULT '[]',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        
+        # Next unreserved id per table for ids handed out in blocks (see write_behind.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS id_blocks (
+                name TEXT PRIMARY KEY,
+                next_id INTEGER NOT NULL
+            )
+        ''')
+        
+        # Older databases predate stored emotion scores on mood entries
+        cursor.execute("PRAGMA table_info(mood_entries)")
+        mood_columns = [column[1] for column in cursor.fetchall()]
+        if 'emotion_scores' not in mood_columns:
+            cursor.execute('ALTER TABLE mood_entries ADD COLUMN emotion_scores TEXT')
+        
+        # Summaries used to track an id watermark, which per-process id blocks make unordered
+        cursor.execute("PRAGMA table_info(conversation_summary)")
+        summary_columns = [column[1] for column in cursor.fetchall()]
+        if 'summarized_ids' not in summary_columns:
+            cursor.execute("ALTER TABLE conversation_summary ADD COLUMN summarized_ids TEXT DEFAULT '[]'")
+        
 
         
         # Create quiz sessions table
@@ -193,8 +238,14 @@ class Database:
             }
         return None
     
-    def save_chat_message(self, user_id, user_message, bot_response, mood=None, detected_emotion=None, emotion_scores=None):
-        """Save chat conversation with emotion data"""
+    def save_chat_message(self, user_id, user_message, bot_response, mood=None, detected_emotion=None, emotion_scores=None, chat_id=None, timestamp=None):
+        """Save chat conversation with emotion data
+        
+        `chat_id` is a pre-allocated id (see reserve_id_block). Saving the same turn
+        again under that id is a no-op, so a retried write never duplicates it.
+        `timestamp` is when the turn happened (defaults to now), so a turn saved
+        late by the write queue still sorts where it belongs.
+        """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -202,26 +253,65 @@ class Database:
         cursor.execute("PRAGMA table_info(chat_conversations)")
         columns = [column[1] for column in cursor.fetchall()]
         
-        if 'detected_emotion' in columns and 'emotion_scores' in columns:
-            # New schema with emotion data
-            emotion_scores_json = str(emotion_scores) if emotion_scores else None
-            
-            cursor.execute('''
-                INSERT INTO chat_conversations (user_id, user_message, bot_response, mood, detected_emotion, emotion_scores)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (user_id, user_message, bot_response, mood, detected_emotion, emotion_scores_json))
-        else:
-            # Old schema without emotion data
+        try:
+            if 'detected_emotion' in columns and 'emotion_scores' in columns:
+                # New schema with emotion data
+                emotion_scores_json = str(emotion_scores) if emotion_scores else None
+                
+                cursor.execute('''
+                    INSERT INTO chat_conversations (id, user_id, user_message, bot_response, mood, detected_emotion, emotion_scores, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+                ''', (chat_id, user_id, user_message, bot_response, mood, detected_emotion, emotion_scores_json, timestamp))
+            else:
+                # Old schema without emotion data
+                cursor.execute('''
+                    INSERT INTO chat_conversations (id, user_id, user_message, bot_response, mood, timestamp)
+                    VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+                ''', (chat_id, user_id, user_message, bot_response, mood, timestamp))
+        except sqlite3.IntegrityError:
             cursor.execute('''
-                INSERT INTO chat_conversations (user_id, user_message, bot_response, mood)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, user_message, bot_response, mood))
+                SELECT user_id, user_message FROM chat_conversations WHERE id = ?
+            ''', (chat_id,))
+            existing = cursor.fetchone()
+            conn.close()
+            if chat_id is not None and existing == (user_id, user_message):
+                # An earlier attempt already saved this turn
+                return chat_id
+            raise
         
         chat_id = cursor.lastrowid
         conn.commit()
         conn.close()
         return chat_id
     
+    def reserve_id_block(self, table, size):
+        """Reserve `size` consecutive ids for `table`; returns the first one
+        
+        Blocks never overlap, across threads and processes sharing the database,
+        and always start past the table's current largest id.
+        """
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        cursor = conn.cursor()
+        
+        try:
+            # Take the write lock before reading so two reservations cannot interleave
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT next_id FROM id_blocks WHERE name = ?", (table,))
+            row = cursor.fetchone()
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+            start = max(row[0] if row else 1, cursor.fetchone()[0])
+            cursor.execute('''
+                INSERT OR REPLACE INTO id_blocks (name, next_id) VALUES (?, ?)
+            ''', (table, start + size))
+            cursor.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return start
+    
     def get_chat_history(self, user_id, limit=50):
         """Get chat history for user"""
         conn = sqlite3.connect(self.db_path)
@@ -276,28 +366,180 @@ class Database:
                 "timestamp": chat[4]
             } for chat in chats]
     
-    def save_mood_entry(self, user_id, mood, notes=None):
-        """Save mood entry"""
+    def get_conversation_sentiment(self, user_id):
+        """Get the rolling conversation sentiment state for a user"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO mood_entries (user_id, mood, notes)
-            VALUES (?, ?, ?)
-        ''', (user_id, mood, notes))
+            SELECT emotion_vector, message_count, updated_at
+            FROM conversation_sentiment WHERE user_id = ?
+        ''', (user_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            return {
+                "emotion_vector": json.loads(row[0]),
+                "message_count": row[1],
+                "updated_at": row[2]
+            }
+        return None
+    
+    def save_conversation_sentiment(self, user_id, emotion_vector, message_count):
+        """Replace the rolling conversation sentiment state for a user"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO conversation_sentiment (user_id, emotion_vector, message_count, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (user_id, json.dumps(emotion_vector), message_count))
+        
+        conn.commit()
+        conn.close()
+    
+    def update_conversation_sentiment(self, user_id, emotion_scores):
+        """Fold one message's emotion scores into the user's rolling sentiment state"""
+        from sentiment_state import blend_emotion_vector
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            # Read-modify-write under a write lock so concurrent messages don't lose updates
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT emotion_vector, message_count FROM conversation_sentiment WHERE user_id = ?
+            ''', (user_id,))
+            row = cursor.fetchone()
+            
+            previous = json.loads(row[0]) if row else None
+            message_count = (row[1] if row else 0) + 1
+            emotion_vector = blend_emotion_vector(previous, emotion_scores)
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO conversation_sentiment (user_id, emotion_vector, message_count, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (user_id, json.dumps(emotion_vector), message_count))
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return {"emotion_vector": emotion_vector, "message_count": message_count}
+    
+    def get_conversation_summary(self, user_id):
+        """Get the compacted conversation summary for a user"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT summary, summarized_count, summarized_ids, updated_at
+            FROM conversation_summary WHERE user_id = ?
+        ''', (user_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            return {
+                "summary": row[0],
+                "summarized_count": row[1],
+                "summarized_ids": json.loads(row[2] or '[]'),
+                "updated_at": row[3]
+            }
+        return None
+    
+    def update_conversation_summary(self, user_id, merge):
+        """Read-modify-write a user's conversation summary
+        
+        `merge` gets the saved summary (as returned by get_conversation_summary, or
+        None) and returns the new one. It runs under the database write lock, so
+        summaries compacted by different API workers are merged, not overwritten.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT summary, summarized_count, summarized_ids, updated_at
+                FROM conversation_summary WHERE user_id = ?
+            ''', (user_id,))
+            row = cursor.fetchone()
+            
+            saved = {
+                "summary": row[0],
+                "summarized_count": row[1],
+                "summarized_ids": json.loads(row[2] or '[]'),
+                "updated_at": row[3]
+            } if row else None
+            summary = merge(saved)
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO conversation_summary (user_id, summary, summarized_count, summarized_ids, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (user_id, summary["summary"], summary["summarized_count"], json.dumps(summary["summarized_ids"])))
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return summary
+    
+    def save_mood_entry(self, user_id, mood, notes=None, emotion_scores=None):
+        """Save mood entry, optionally with precomputed emotion scores for the notes"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        emotion_scores_json = json.dumps(emotion_scores) if emotion_scores else None
+        
+        cursor.execute('''
+            INSERT INTO mood_entries (user_id, mood, notes, emotion_scores)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, mood, notes, emotion_scores_json))
         
         mood_id = cursor.lastrowid
         conn.commit()
         conn.close()
         return mood_id
     
+    def update_mood_emotion_scores(self, updates):
+        """Store emotion scores for existing mood entries from (mood_id, scores) pairs"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            UPDATE mood_entries SET emotion_scores = ? WHERE id = ?
+        ''', [(json.dumps(scores), mood_id) for mood_id, scores in updates])
+        
+        conn.commit()
+        conn.close()
+    
+    def get_mood_entries_missing_emotions(self, limit=256, after_id=0):
+        """Get mood entries with notes but no stored emotion scores, oldest first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, notes
+            FROM mood_entries
+            WHERE emotion_scores IS NULL AND notes IS NOT NULL AND notes != '' AND id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (after_id, limit))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
     def get_mood_history(self, user_id, limit=30):
         """Get mood history for user"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, mood, notes, timestamp
+            SELECT id, mood, notes, timestamp, emotion_scores
             FROM mood_entries 
             WHERE user_id = ?
             ORDER BY timestamp DESC
@@ -311,7 +553,8 @@ class Database:
             "id": mood[0],
             "mood": mood[1],
             "notes": mood[2],
-            "timestamp": mood[3]
+            "timestamp": mood[3],
+            "emotion_scores": json.loads(mood[4]) if mood[4] else None
         } for mood in moods]
     
     def save_quiz_session(self, user_id, quiz_state):
@@ -0,0 +1,171 @@
+"""
+Inference backends for the emotion classification model
+
+The emotion model is always loaded through transformers first; a backend
+then decides how forward passes are executed:
+
+- pytorch:     plain fp32 PyTorch (default, works on CPU and CUDA)
+- torch_int8:  PyTorch with dynamic int8 quantization of Linear layers
+- onnx:        ONNX Runtime with full graph optimizations
+- onnx_int8:   ONNX Runtime on a dynamically int8-quantized graph
+
+Converted artifacts are cached under the models directory so the export
+or quantization cost is only paid once per host.
+"""
+
+import os
+import logging
+from typing import Dict
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+EMOTION_BACKENDS = ("pytorch", "torch_int8", "onnx", "onnx_int8")
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _artifact_dir(cache_dir: str, backend_name: str, model_name: str) -> str:
+    path = os.path.join(cache_dir, "emotion", backend_name, model_name.replace("/", "--"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class PyTorchEmotionBackend:
+    """Runs the transformers model directly"""
+
+    name = "pytorch"
+
+    def __init__(self, model, device: str = "cpu"):
+        self.model = model
+        self.device = device
+
+    def predict(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """Return class probabilities for a tokenized batch"""
+        tensors = {k: torch.from_numpy(v).to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            logits = self.model(**tensors).logits
+        return _softmax(logits.float().cpu().numpy())
+
+
+class TorchInt8EmotionBackend(PyTorchEmotionBackend):
+    """PyTorch with dynamic int8 quantization (CPU only)"""
+
+    name = "torch_int8"
+
+    def __init__(self, model, model_name: str, cache_dir: str):
+        artifact = os.path.join(_artifact_dir(cache_dir, self.name, model_name), "model.pt")
+
+        if os.path.exists(artifact):
+            quantized = torch.load(artifact, map_location="cpu", weights_only=False)
+            logger.info(f"Loaded cached int8 emotion model from {artifact}")
+        else:
+            quantized = torch.quantization.quantize_dynamic(
+                model.to("cpu"), {torch.nn.Linear}, dtype=torch.qint8
+            )
+            torch.save(quantized, artifact)
+            logger.info(f"Quantized emotion model to int8 and cached it at {artifact}")
+
+        quantized.eval()
+        super().__init__(quantized, device="cpu")
+
+
+class OnnxEmotionBackend:
+    """ONNX Runtime session with graph optimizations enabled"""
+
+    name = "onnx"
+    quantize = False
+
+    def __init__(self, model, tokenizer, model_name: str, cache_dir: str):
+        import onnxruntime as ort
+
+        artifact_dir = _artifact_dir(cache_dir, self.name, model_name)
+        fp32_path = os.path.join(artifact_dir, "model.onnx")
+        if not os.path.exists(fp32_path):
+            self._export(model, tokenizer, fp32_path)
+
+        model_path = fp32_path
+        if self.quantize:
+            model_path = os.path.join(artifact_dir, "model.int8.onnx")
+            if not os.path.exists(model_path):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+                logger.info(f"Quantized ONNX emotion model to int8 at {model_path}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.optimized_model_filepath = model_path.replace(".onnx", ".opt.onnx")
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"ONNX Runtime emotion backend ready ({os.path.basename(model_path)})")
+
+    @staticmethod
+    def _export(model, tokenizer, path: str):
+        """Export the transformers model to ONNX with dynamic batch/sequence axes"""
+        sample = tokenizer("Exporting the emotion model", return_tensors="pt")
+        model = model.to("cpu").eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"},
+                },
+                opset_version=14,
+            )
+        logger.info(f"Exported emotion model to ONNX at {path}")
+
+    def predict(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """Return class probabilities for a tokenized batch"""
+        feed = {k: v.astype(np.int64) for k, v in inputs.items() if k in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        return _softmax(logits)
+
+
+class OnnxInt8EmotionBackend(OnnxEmotionBackend):
+    """ONNX Runtime on a dynamically quantized int8 graph"""
+
+    name = "onnx_int8"
+    quantize = True
+
+
+def create_emotion_backend(backend_name: str, model, tokenizer, model_name: str, cache_dir: str, device: str = "cpu"):
+    """
+    Build the configured emotion inference backend.
+
+    Falls back to the plain PyTorch backend if the requested one is unknown,
+    needs a GPU-incompatible path, or its optional dependencies are missing.
+    """
+    if backend_name not in EMOTION_BACKENDS:
+        logger.warning(f"Unknown emotion backend '{backend_name}', using pytorch")
+        backend_name = "pytorch"
+
+    if backend_name != "pytorch" and device != "cpu":
+        logger.warning(f"Emotion backend '{backend_name}' is CPU-only, using pytorch on {device}")
+        backend_name = "pytorch"
+
+    try:
+        if backend_name == "torch_int8":
+            return TorchInt8EmotionBackend(model, model_name, cache_dir)
+        if backend_name == "onnx":
+            return OnnxEmotionBackend(model, tokenizer, model_name, cache_dir)
+        if backend_name == "onnx_int8":
+            return OnnxInt8EmotionBackend(model, tokenizer, model_name, cache_dir)
+    except Exception as e:
+        logger.error(f"Failed to initialize emotion backend '{backend_name}': {e}")
+        logger.info("Falling back to pytorch emotion backend")
+
+    return PyTorchEmotionBackend(model, device)
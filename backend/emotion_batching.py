@@ -0,0 +1,75 @@
+"""
+Chunking and length-bucketed batching for emotion inference
+
+Long messages are split into overlapping token windows instead of being
+truncated, windows of similar length are batched together so little
+compute is spent on padding, and per-window scores are folded back into
+one score dictionary per message.
+"""
+
+from typing import Dict, List, Sequence
+
+
+def chunk_token_ids(token_ids: Sequence[int], max_tokens: int, overlap: int) -> List[List[int]]:
+    """
+    Split a token sequence into overlapping windows.
+
+    Args:
+        token_ids: Token ids without special tokens
+        max_tokens: Maximum window length (excluding special tokens)
+        overlap: Number of tokens shared by consecutive windows
+
+    Returns:
+        List of windows; a short sequence yields a single window
+    """
+    token_ids = list(token_ids)
+    if len(token_ids) <= max_tokens:
+        return [token_ids]
+
+    overlap = max(0, min(overlap, max_tokens // 2))
+    step = max_tokens - overlap
+    chunks = []
+    for start in range(0, len(token_ids), step):
+        chunks.append(token_ids[start:start + max_tokens])
+        if start + max_tokens >= len(token_ids):
+            break
+    return chunks
+
+
+def bucket_by_length(lengths: Sequence[int], boundaries: Sequence[int], batch_size: int) -> List[List[int]]:
+    """
+    Group item indices into batches of similar length.
+
+    Each item goes to the smallest bucket boundary that fits it (items longer
+    than every boundary share a final bucket). Buckets are then cut into
+    batches of at most `batch_size`, shortest items first.
+
+    Returns:
+        List of batches, each a list of indices into `lengths`
+    """
+    boundaries = sorted(boundaries)
+    size = max(1, batch_size)
+    buckets: Dict[int, List[int]] = {}
+    for index, length in enumerate(lengths):
+        bucket = next((b for b in boundaries if length <= b), None)
+        buckets.setdefault(bucket if bucket is not None else -1, []).append(index)
+
+    batches = []
+    for bucket in sorted(buckets, key=lambda b: float("inf") if b == -1 else b):
+        indices = sorted(buckets[bucket], key=lambda i: lengths[i])
+        for start in range(0, len(indices), size):
+            batches.append(indices[start:start + size])
+    return batches
+
+
+def aggregate_chunk_scores(chunk_scores: List[Dict[str, float]], weights: List[int]) -> Dict[str, float]:
+    """Average per-chunk emotion scores, weighting each chunk by its token count"""
+    if len(chunk_scores) == 1:
+        return dict(chunk_scores[0])
+
+    total_weight = float(sum(weights)) or 1.0
+    aggregated: Dict[str, float] = {}
+    for scores, weight in zip(chunk_scores, weights):
+        for label, score in scores.items():
+            aggregated[label] = aggregated.get(label, 0.0) + score * weight / total_weight
+    return aggregated
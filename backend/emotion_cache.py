@@ -0,0 +1,76 @@
+"""
+Content-addressed cache for emotion inference results
+
+Both AI service implementations route `detect_emotion` through the shared
+cache returned by `get_emotion_cache()`. Entries are keyed by a hash of the
+normalized text plus the model version, so results from different models
+(or from the keyword-based lite service) never collide.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Callable, Dict, Optional
+
+from config import EMOTION_CACHE_SIZE, EMOTION_CACHE_TTL_SECONDS
+from ttl_cache import TTLCache
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry"""
+    text = unicodedata.normalize("NFC", text or "")
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def emotion_cache_key(text: str, model_version: str) -> str:
+    """Build the content-addressed key for a text/model pair"""
+    payload = f"{model_version}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmotionCache:
+    """Caches emotion score dictionaries per (model version, text)"""
+
+    def __init__(self, max_size: int = EMOTION_CACHE_SIZE, ttl_seconds: Optional[float] = EMOTION_CACHE_TTL_SECONDS):
+        self._cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def get(self, text: str, model_version: str) -> Optional[Dict[str, float]]:
+        """Return a copy of the cached scores, or None on miss"""
+        scores = self._cache.get(emotion_cache_key(text, model_version))
+        return dict(scores) if scores is not None else None
+
+    def set(self, text: str, model_version: str, scores: Dict[str, float]) -> None:
+        """Store scores for a text/model pair"""
+        self._cache.set(emotion_cache_key(text, model_version), dict(scores))
+
+    def get_or_compute(
+        self,
+        text: str,
+        model_version: str,
+        compute: Callable[[str], Dict[str, float]]
+    ) -> Dict[str, float]:
+        """Return cached scores, computing and storing them on a miss"""
+        scores = self.get(text, model_version)
+        if scores is None:
+            scores = compute(text)
+            self.set(text, model_version, scores)
+        return dict(scores)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+_emotion_cache: Optional[EmotionCache] = None
+
+
+def get_emotion_cache() -> EmotionCache:
+    """Return the process-wide emotion cache shared by all AI services"""
+    global _emotion_cache
+    if _emotion_cache is None:
+        _emotion_cache = EmotionCache()
+    return _emotion_cache
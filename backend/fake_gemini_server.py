@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini REST API
+
+Serves `generateContent` and `streamGenerateContent?alt=sse` with canned
+supportive replies, ending in a `MOOD_UPDATE:` tag when the message names a
+feeling, so the chat path can be load tested offline and reproducibly. Latency, stream chunk timing, error
+rates and rate limiting (429) are configurable, and a seed makes every run
+pick the same delays and failures.
+
+Point the backend at it with GEMINI_API_BASE (any API key is accepted):
+
+    python fake_gemini_server.py --port 8765 --latency 0.4 --jitter 0.1
+    GEMINI_API_BASE=http://127.0.0.1:8765 GEMINI_API_KEY=fake python main.py
+
+Benchmarks can also run it in-process with `FakeGeminiServer` (async) or
+`start_in_thread()`. `GET /stats` returns the server's own counters.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+_MODEL_PATH = re.compile(r"^/v1beta/models/([^/:]+):(generateContent|streamGenerateContent)$")
+_USER_MESSAGE = re.compile(r'User Message:\s*"(.*)"', re.DOTALL)
+
+# Canned replies; one is picked per message so repeats get the same answer
+REPLIES = [
+    "Thank you for telling me how you're feeling. It makes sense that this is weighing on you. "
+    "Would it help to take a slow breath together before we talk it through?",
+    "I'm really glad you reached out. You don't have to sort everything out at once. "
+    "What feels like the smallest next step you could take today?",
+    "That sounds like a lot to carry. Be gentle with yourself right now. "
+    "Is there something that usually helps you feel a little more grounded?",
+    "I hear you, and what you're feeling matters. Let's take it one moment at a time. "
+    "What has been on your mind the most?",
+]
+
+# First matching keyword decides the MOOD_UPDATE tag; other messages get none
+MOOD_KEYWORDS = [
+    ("happy", ("happy", "relieved", "glad", "great", "joy")),
+    ("anxious", ("worried", "nervous", "anxious", "panic", "scared", "afraid")),
+    ("stressed", ("stressed", "overwhelmed", "pressure", "deadline", "exam")),
+    ("tired", ("tired", "exhausted", "slept", "sleepy", "drained")),
+    ("angry", ("angry", "furious", "frustrat", "annoyed")),
+    ("sad", ("sad", "lonely", "cry", "down", "grief", "hopeless")),
+    ("excited", ("excited", "can't wait", "thrilled")),
+    ("calm", ("calm", "peaceful", "relaxed")),
+]
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+               429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def mood_for(message: str) -> Optional[str]:
+    """Mood tag the fake model appends for a user message"""
+    lowered = message.lower()
+    for mood, keywords in MOOD_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return mood
+    return None
+
+
+def reply_for(prompt: str) -> str:
+    """Canned reply for a prompt built by GeminiClient._build_prompt"""
+    match = _USER_MESSAGE.search(prompt)
+    message = match.group(1) if match else prompt
+    reply = REPLIES[sum(message.encode("utf-8")) % len(REPLIES)]
+    mood = mood_for(message)
+    return f"{reply}\nMOOD_UPDATE: {mood}" if mood else reply
+
+
+class FakeGeminiServer:
+    """Async HTTP/1.1 server that imitates the Gemini generateContent endpoints"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.3, jitter: float = 0.0, latency_dist: str = "fixed",
+                 chunk_words: int = 4, chunk_delay: float = 0.05,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 rate_limit_rps: float = 0.0, retry_after: int = 1,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            host, port: Address to listen on (port 0 picks a free one)
+            latency: Seconds before the reply (median for lognormal)
+            jitter: Spread: +/- seconds for uniform, sigma for lognormal
+            latency_dist: fixed | uniform | lognormal
+            chunk_words: Words per streamed chunk
+            chunk_delay: Seconds between streamed chunks
+            error_rate: Fraction of requests answered with 500
+            rate_limit_rate: Fraction of requests answered with 429
+            rate_limit_rps: Requests per second allowed before 429s (0 for no limit)
+            retry_after: Retry-After header on 429 responses
+            seed: Seed for delays and injected failures
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_dist = latency_dist
+        self.chunk_words = max(1, chunk_words)
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limit_rps = rate_limit_rps
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.server = None
+        self._tokens = rate_limit_rps
+        self._tokens_at = time.monotonic()
+        self.stats = {
+            "requests": 0,
+            "streamed": 0,
+            "errors_injected": 0,
+            "rate_limited": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "connections": 0,
+        }
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        """Start listening; returns the base URL for GEMINI_API_BASE"""
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.base_url
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def delay(self) -> float:
+        """Reply latency drawn from the configured distribution"""
+        if self.latency_dist == "uniform":
+            return max(0.0, self.random.uniform(self.latency - self.jitter, self.latency + self.jitter))
+        if self.latency_dist == "lognormal" and self.latency > 0:
+            return self.random.lognormvariate(math.log(self.latency), self.jitter)
+        return self.latency
+
+    def _rate_limited(self) -> bool:
+        if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+            return True
+        if self.rate_limit_rps > 0:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit_rps, self._tokens + (now - self._tokens_at) * self.rate_limit_rps)
+            self._tokens_at = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+        return False
+
+    async def _read_request(self, reader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return method, target, headers, body
+
+    async def _handle(self, reader, writer):
+        self.stats["connections"] += 1
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                await self._respond(writer, *request)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, method: str, target: str, headers: Dict[str, str], body: bytes):
+        url = urlsplit(target)
+        if method == "GET" and url.path == "/stats":
+            return await self._send_json(writer, 200, self.stats)
+
+        match = _MODEL_PATH.match(url.path)
+        if method != "POST" or not match:
+            return await self._send_error(writer, 404, "NOT_FOUND", f"Unknown endpoint {url.path}")
+        if not headers.get("x-goog-api-key") and "key" not in parse_qs(url.query):
+            return await self._send_error(writer, 403, "PERMISSION_DENIED", "API key not valid")
+
+        self.stats["requests"] += 1
+        if self._rate_limited():
+            self.stats["rate_limited"] += 1
+            return await self._send_error(writer, 429, "RESOURCE_EXHAUSTED",
+                                          "Resource has been exhausted (e.g. check quota).",
+                                          {"Retry-After": str(self.retry_after)})
+
+        try:
+            payload = json.loads(body or b"{}")
+            prompt = "".join(part.get("text", "") for part in payload["contents"][-1]["parts"])
+        except (ValueError, KeyError, IndexError):
+            return await self._send_error(writer, 400, "INVALID_ARGUMENT", "Invalid request body")
+
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            await asyncio.sleep(self.delay())
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.stats["errors_injected"] += 1
+                return await self._send_error(writer, 500, "INTERNAL", "An internal error has occurred.")
+
+            reply = reply_for(prompt)
+            if match.group(2) == "streamGenerateContent":
+                self.stats["streamed"] += 1
+                await self._send_stream(writer, reply)
+            else:
+                await self._send_json(writer, 200, self._candidate(reply))
+        finally:
+            self.stats["in_flight"] -= 1
+
+    @staticmethod
+    def _candidate(text: str) -> Dict:
+        return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+    def _chunks(self, reply: str) -> List[str]:
+        words = re.findall(r"\S+\s*", reply)
+        return ["".join(words[i:i + self.chunk_words]) for i in range(0, len(words), self.chunk_words)]
+
+    async def _send_stream(self, writer, reply: str):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        for index, chunk in enumerate(self._chunks(reply)):
+            if index and self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            event = f"data: {json.dumps(self._candidate(chunk))}\r\n\r\n".encode()
+            writer.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, data: Dict, extra_headers: Optional[Dict] = None):
+        body = json.dumps(data).encode()
+        head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: application/json\r\n"
+        for name, value in (extra_headers or {}).items():
+            head += f"{name}: {value}\r\n"
+        writer.write(f"{head}Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _send_error(self, writer, status: int, reason: str, message: str,
+                          extra_headers: Optional[Dict] = None):
+        await self._send_json(writer, status, {"error": {"code": status, "message": message, "status": reason}},
+                              extra_headers)
+
+
+def start_in_thread(**options) -> FakeGeminiServer:
+    """Run a FakeGeminiServer on its own event loop in a daemon thread; returns once it is listening"""
+    server = FakeGeminiServer(**options)
+    ready = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="fake-gemini", daemon=True).start()
+    ready.wait()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Reply latency in seconds (median for lognormal)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds (uniform) or sigma (lognormal)")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--chunk-words", type=int, default=4, help="Words per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="Seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-limit-rps", type=float, default=0.0, help="Requests per second before 429s (0: none)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429 responses")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for delays and injected failures")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeGeminiServer(**{key: value for key, value in vars(args).items()})
+
+    async def serve():
+        base_url = await server.start()
+        logger.info(f"🧪 Fake Gemini API listening on {base_url} (set GEMINI_API_BASE={base_url})")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        logger.info("👋 Fake Gemini API stopped")
+
+
+if __name__ == "__main__":
+    main()
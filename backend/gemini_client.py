@@ -5,20 +5,49 @@ This module provides a clean interface to the Google Gemini API for generating
 chatbot responses with mood context integration.
 """
 
+import asyncio
+import json
 import os
 import logging
 import re
-from typing import Dict, Tuple, Optional
+import threading
+import time
+from typing import AsyncIterator, Dict, Tuple, Optional
+
+from admission_control import AdmissionLimiter, AdmissionRejected
+from circuit_breaker import CircuitBreaker, CallTicket
+from config import (
+    GEMINI_API_BASE, GEMINI_TIMEOUT_SECONDS, GEMINI_DEADLINE_SECONDS,
+    GEMINI_MAX_CONNECTIONS, GEMINI_KEEPALIVE_SECONDS
+)
 
 logger = logging.getLogger(__name__)
 
-# Import Gemini SDK
+# Trailing mood tag Gemini may append to a reply (see _build_prompt)
+MOOD_TAG = "MOOD_UPDATE:"
+MOOD_PATTERN = r'MOOD_UPDATE:\s*(happy|sad|anxious|stressed|calm|excited|angry|tired|neutral|positive|negative)'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Gemini while the circuit breaker is open"""
+
+
+# Local replies used when Gemini is not called or does not answer
+EMPTY_MESSAGE_RESPONSE = "I'm here to listen. What's on your mind?"
+FALLBACK_RESPONSES = [
+    "I'm here to listen. Could you tell me more about how you're feeling?",
+    "Thank you for sharing. I'm here to support you. What's been on your mind?",
+    "I appreciate you opening up. How can I help you today?",
+    "I'm listening. Would you like to talk more about what's going on?",
+]
+
+# Gemini is called over its REST API with a pooled keep-alive HTTP client
 try:
-    import google.generativeai as genai
+    import httpx
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
-    logger.warning("google-generativeai package not installed. Gemini features will be disabled.")
+    logger.warning("httpx package not installed. Gemini features will be disabled.")
 
 
 class GeminiClient:
@@ -30,41 +59,321 @@ class GeminiClient:
     - Inject mood context into prompts
     - Parse mood updates from responses
     - Handle errors gracefully with fallback responses
+    
+    One instance is meant to live for the whole process (see
+    `get_gemini_client()`): it keeps a pool of keep-alive connections to the
+    API, so consecutive messages skip the TCP and TLS handshakes.
+    
+    Calls pass through an `AdmissionLimiter` first: beyond
+    GEMINI_MAX_CONCURRENCY in flight they wait briefly in a short queue, and
+    when that is full they get the fallback response at once.
+    
+    A `CircuitBreaker` tracks call outcomes. After repeated failures or
+    slow calls it opens and messages get the fallback response without
+    waiting on Gemini, until a half-open probe call succeeds again. Replies
+    that miss GEMINI_DEADLINE_SECONDS are hedged: the caller gets the local
+    fallback while the call finishes in the background, so its outcome
+    still reaches the breaker.
     """
     
-    def __init__(self, api_key: Optional[str] = None, model_name: str = "gemini-2.5-flash"):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model_name: str = "gemini-2.5-flash",
+        api_base: str = GEMINI_API_BASE
+    ):
         """
         Initialize Gemini client.
         
         Args:
             api_key: Google Gemini API key (defaults to GEMINI_API_KEY env var)
-            model_name: Gemini model to use (default: gemini-1.5-flash)
+            model_name: Gemini model to use (default: gemini-2.5-flash)
+            api_base: Base URL of the Gemini REST API
         """
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY", "")
-        self.model_name = model_name
-        self.model = None
+        self.api_key = None
+        self.model_name = None
+        self.api_base = None
+        self.http = None
+        # Async pool, bound to the event loop it was created on
+        self._async_http = None
+        self._async_loop = None
+        self._lock = threading.Lock()
+        self.admission = AdmissionLimiter("gemini")
+        self.breaker = CircuitBreaker("gemini")
+        self._stats = {
+            "requests": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "hedged": 0,
+            "connections_opened": 0,
+            "tls_handshakes": 0,
+        }
+        self.reconfigure(api_key=api_key or os.getenv("GEMINI_API_KEY", ""), model_name=model_name, api_base=api_base)
+    
+    @property
+    def available(self) -> bool:
+        """Whether calls go to Gemini (otherwise fallback responses are used)"""
+        return self.http is not None and bool(self.api_key)
+    
+    def reconfigure(
+        self,
+        api_key: Optional[str] = None,
+        model_name: Optional[str] = None,
+        api_base: Optional[str] = None
+    ):
+        """
+        Change the API key, model or endpoint without restarting.
         
+        The connection pool is only rebuilt when the endpoint changes; requests
+        in flight finish on the settings they started with.
+        
+        Args:
+            api_key: New API key (unchanged if None)
+            model_name: New model name (unchanged if None)
+            api_base: New base URL (unchanged if None)
+        """
         if not GEMINI_AVAILABLE:
-            logger.error("Gemini SDK not available. Install with: pip install google-generativeai")
+            logger.error("HTTP client not available. Install with: pip install httpx")
             return
         
+        with self._lock:
+            old_http = None
+            old_async = None
+            if api_key is not None:
+                self.api_key = api_key
+            if model_name is not None:
+                self.model_name = model_name
+            if api_base is not None and api_base.rstrip("/") != self.api_base:
+                self.api_base = api_base.rstrip("/")
+                old_http = self.http
+                old_async = (self._async_http, self._async_loop)
+                self._async_http = self._async_loop = None
+                self.http = httpx.Client(
+                    base_url=self.api_base,
+                    timeout=GEMINI_TIMEOUT_SECONDS,
+                    limits=httpx.Limits(
+                        max_connections=GEMINI_MAX_CONNECTIONS,
+                        max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+                        keepalive_expiry=GEMINI_KEEPALIVE_SECONDS
+                    )
+                )
+        
+        if old_http is not None:
+            # Let requests still using the old pool finish before closing it
+            closer = threading.Timer(GEMINI_TIMEOUT_SECONDS, old_http.close)
+            closer.daemon = True
+            closer.start()
+        if old_async and old_async[0] is not None:
+            self._close_async_later(*old_async, delay=GEMINI_TIMEOUT_SECONDS)
+        
         if not self.api_key:
             logger.warning("GEMINI_API_KEY not set. Gemini features will use fallback responses.")
+        else:
+            logger.info(f"✓ Gemini client configured with model: {self.model_name}")
+    
+    def close(self):
+        """Close pooled connections"""
+        with self._lock:
+            http, self.http = self.http, None
+            async_http, async_loop = self._async_http, self._async_loop
+            self._async_http = self._async_loop = None
+            self.api_base = None
+        if http is not None:
+            http.close()
+        if async_http is not None:
+            self._close_async_later(async_http, async_loop, delay=0)
+    
+    @staticmethod
+    def _close_async_later(async_http, loop, delay: float):
+        """Close an async pool on its own event loop once in-flight requests have finished"""
+        if loop is None or loop.is_closed():
             return
         
+        def schedule():
+            loop.call_later(delay, lambda: loop.create_task(async_http.aclose()))
+        
         try:
-            # Configure Gemini API
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(self.model_name)
-            logger.info(f"✓ Gemini client initialized with model: {self.model_name}")
-        except Exception as e:
-            logger.error(f"Failed to initialize Gemini client: {e}")
-            self.model = None
+            loop.call_soon_threadsafe(schedule)
+        except RuntimeError:
+            pass  # loop already shut down; its sockets are gone with it
+    
+    def _get_async_http(self):
+        """The async connection pool for the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._async_http is None or self._async_loop is not loop:
+                self._async_http = httpx.AsyncClient(
+                    base_url=self.api_base,
+                    timeout=GEMINI_TIMEOUT_SECONDS,
+                    limits=httpx.Limits(
+                        max_connections=GEMINI_MAX_CONNECTIONS,
+                        max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+                        keepalive_expiry=GEMINI_KEEPALIVE_SECONDS
+                    )
+                )
+                self._async_loop = loop
+            return self._async_http
+    
+    def _trace(self, event_name: str, info: Dict):
+        """httpcore trace hook: counts new connections and TLS handshakes"""
+        if event_name == "connection.connect_tcp.complete":
+            self._count("connections_opened")
+        elif event_name == "connection.start_tls.complete":
+            self._count("tls_handshakes")
+    
+    async def _async_trace(self, event_name: str, info: Dict):
+        self._trace(event_name, info)
+    
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+            if key == "in_flight":
+                self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+    
+    def stats(self) -> Dict:
+        """Request counts and how many connection handshakes the pool avoided"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["handshakes_avoided"] = max(0, stats["requests"] - stats["connections_opened"])
+        stats["connection_reuse_rate"] = (
+            stats["handshakes_avoided"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        stats["max_connections"] = GEMINI_MAX_CONNECTIONS
+        stats["admission"] = self.admission.stats()
+        stats["breaker"] = self.breaker.stats()
+        return stats
+    
+    def _breaker_ticket(self) -> CallTicket:
+        """Permission from the circuit breaker to call Gemini"""
+        ticket = self.breaker.allow()
+        if ticket is None:
+            raise CircuitOpenError("circuit open")
+        return ticket
+    
+    def _generate_content(self, prompt: str, priority: bool = False) -> str:
+        """
+        Call the generateContent endpoint on a pooled connection.
+        
+        Args:
+            prompt: Full prompt text
+            priority: Queue ahead of routine calls for a slot
+        
+        Returns:
+            Concatenated text of the first candidate
+        
+        Raises:
+            CircuitOpenError: The circuit breaker is open
+            AdmissionRejected: The call was shed by admission control
+        """
+        http = self.http
+        ticket = self._breaker_ticket()
+        try:
+            with self.admission.slot(priority):
+                self._count("requests")
+                self._count("in_flight")
+                start = time.perf_counter()
+                try:
+                    response = http.post(**self._request_args(prompt), extensions={"trace": self._trace})
+                    response.raise_for_status()
+                    text = self._extract_text(response.json())
+                except Exception:
+                    self._count("errors")
+                    self.breaker.on_failure(ticket)
+                    raise
+                finally:
+                    self._count("in_flight", -1)
+                self.breaker.on_success(ticket, time.perf_counter() - start)
+                return text
+        except AdmissionRejected:
+            self.breaker.on_abandoned(ticket)
+            raise
+    
+    async def _generate_content_async(
+        self,
+        prompt: str,
+        priority: bool = False,
+        timeout: Optional[float] = GEMINI_TIMEOUT_SECONDS
+    ) -> str:
+        """
+        Call the generateContent endpoint without blocking the event loop.
+        
+        Args:
+            prompt: Full prompt text
+            priority: Queue ahead of routine calls for a slot
+            timeout: Deadline for the HTTP call once admitted (None for no deadline)
+        
+        Returns:
+            Concatenated text of the first candidate
+        
+        Raises:
+            CircuitOpenError: The circuit breaker is open
+            AdmissionRejected: The call was shed by admission control
+            asyncio.TimeoutError: The call took longer than `timeout`
+        """
+        http = self._get_async_http()
+        ticket = self._breaker_ticket()
+        reached_remote = False
+        try:
+            async with self.admission.slot_async(priority):
+                reached_remote = True
+                self._count("requests")
+                self._count("in_flight")
+                start = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(
+                        http.post(**self._request_args(prompt), extensions={"trace": self._async_trace}),
+                        timeout
+                    )
+                    response.raise_for_status()
+                    text = self._extract_text(response.json())
+                except asyncio.TimeoutError:
+                    self._count("timeouts")
+                    self.breaker.on_failure(ticket)
+                    raise
+                except asyncio.CancelledError:
+                    self._count("cancelled")
+                    self.breaker.on_abandoned(ticket)
+                    raise
+                except Exception:
+                    self._count("errors")
+                    self.breaker.on_failure(ticket)
+                    raise
+                finally:
+                    self._count("in_flight", -1)
+                self.breaker.on_success(ticket, time.perf_counter() - start)
+                return text
+        except (AdmissionRejected, asyncio.CancelledError):
+            if not reached_remote:
+                # Shed or cancelled while queued: says nothing about Gemini's health
+                self.breaker.on_abandoned(ticket)
+            raise
+    
+    def _request_args(self, prompt: str) -> Dict:
+        """URL, headers and body of a generateContent request"""
+        return {
+            "url": f"/v1beta/models/{self.model_name}:generateContent",
+            "headers": {"x-goog-api-key": self.api_key},
+            "json": {"contents": [{"role": "user", "parts": [{"text": prompt}]}]},
+        }
+    
+    @staticmethod
+    def _extract_text(data: Dict) -> str:
+        """Concatenated text of the first candidate in a generateContent response"""
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
     
     def generate_chat_response(
         self, 
         user_message: str, 
-        mood_context: Dict[str, any]
+        mood_context: Dict[str, any],
+        priority: bool = False,
+        conversation: str = ""
     ) -> Tuple[str, Optional[str]]:
         """
         Generate a chat response using Gemini API with mood context.
@@ -75,6 +384,8 @@ class GeminiClient:
                 - mood_label: Current mood (e.g., 'happy', 'sad', 'anxious')
                 - mood_score: Confidence score (0-1)
                 - mood_timestamp: When mood was last updated
+            priority: Admit ahead of routine calls (high-severity crisis messages)
+            conversation: Rendered conversation context (see conversation_context.py)
         
         Returns:
             Tuple of (response_text, mood_update)
@@ -84,27 +395,27 @@ class GeminiClient:
         """
         # Validate inputs
         if not user_message or not user_message.strip():
-            return "I'm here to listen. What's on your mind?", None
+            return EMPTY_MESSAGE_RESPONSE, None
         
         # Check if Gemini is available
-        if not self.model:
+        if not self.available:
             logger.warning("Gemini model not available, using fallback response")
             return self._get_fallback_response(user_message), None
         
         try:
             # Build the prompt with mood context
-            prompt = self._build_prompt(user_message, mood_context)
+            prompt = self._build_prompt(user_message, mood_context, conversation)
             
             # Call Gemini API
             logger.info(f"Calling Gemini API for message: {user_message[:50]}...")
-            response = self.model.generate_content(prompt)
+            response_text = self._generate_content(prompt, priority)
             
             # Extract response text
-            if not response or not response.text:
+            if not response_text:
                 logger.error("Empty response from Gemini API")
                 return self._get_fallback_response(user_message), None
             
-            response_text = response.text.strip()
+            response_text = response_text.strip()
             
             # Parse mood update if present
             response_text, mood_update = self._parse_mood_update(response_text)
@@ -112,17 +423,168 @@ class GeminiClient:
             logger.info(f"✓ Gemini response generated successfully (mood_update: {mood_update})")
             return response_text, mood_update
             
+        except (AdmissionRejected, CircuitOpenError) as e:
+            logger.debug(f"Gemini call skipped ({e}), using fallback response")
+            return self._get_fallback_response(user_message), None
+        except Exception as e:
+            logger.error(f"Error calling Gemini API: {e}")
+            return self._get_fallback_response(user_message), None
+    
+    async def generate_chat_response_async(
+        self,
+        user_message: str,
+        mood_context: Dict[str, any],
+        timeout: Optional[float] = GEMINI_TIMEOUT_SECONDS,
+        priority: bool = False,
+        deadline: Optional[float] = GEMINI_DEADLINE_SECONDS,
+        conversation: str = ""
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Async version of `generate_chat_response` for use inside request handlers.
+        
+        The event loop keeps serving other requests while the call is in
+        flight. If the caller is cancelled (e.g. the client disconnected) the
+        HTTP request is cancelled too. If no reply arrives within `deadline`
+        the fallback response is returned at once and the call carries on in
+        the background (up to `timeout`) so the circuit breaker still learns
+        how it ended.
+        
+        Args:
+            user_message: The user's message
+            mood_context: Mood context dictionary (see generate_chat_response)
+            timeout: Hard limit for the HTTP call in seconds (None for no limit)
+            priority: Admit ahead of routine calls (high-severity crisis messages)
+            deadline: Seconds to wait for the reply before answering locally (None to wait up to `timeout`)
+            conversation: Rendered conversation context (see conversation_context.py)
+        
+        Returns:
+            Tuple of (response_text, mood_update); the fallback response on timeout,
+            error, a missed deadline, an open circuit or when the call is shed
+        """
+        if not user_message or not user_message.strip():
+            return EMPTY_MESSAGE_RESPONSE, None
+        
+        if not self.available:
+            logger.warning("Gemini model not available, using fallback response")
+            return self._get_fallback_response(user_message), None
+        
+        prompt = self._build_prompt(user_message, mood_context, conversation)
+        logger.info(f"Calling Gemini API for message: {user_message[:50]}...")
+        call = asyncio.ensure_future(self._generate_content_async(prompt, priority, timeout))
+        # Hedged calls finish unobserved; their outcome is already recorded by the breaker
+        call.add_done_callback(lambda task: task.cancelled() or task.exception())
+        hedge_after = deadline if deadline is not None and (timeout is None or deadline < timeout) else None
+        
+        try:
+            response_text = await asyncio.wait_for(asyncio.shield(call), hedge_after)
+            
+            if not response_text:
+                logger.error("Empty response from Gemini API")
+                return self._get_fallback_response(user_message), None
+            
+            response_text, mood_update = self._parse_mood_update(response_text.strip())
+            logger.info(f"✓ Gemini response generated successfully (mood_update: {mood_update})")
+            return response_text, mood_update
+            
+        except asyncio.TimeoutError:
+            if call.done():
+                logger.error(f"Gemini API call timed out after {timeout}s")
+            else:
+                self._count("hedged")
+                logger.warning(f"Gemini reply missed its {deadline}s deadline, using fallback response")
+            return self._get_fallback_response(user_message), None
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except (AdmissionRejected, CircuitOpenError) as e:
+            logger.debug(f"Gemini call skipped ({e}), using fallback response")
+            return self._get_fallback_response(user_message), None
         except Exception as e:
             logger.error(f"Error calling Gemini API: {e}")
             return self._get_fallback_response(user_message), None
     
-    def _build_prompt(self, user_message: str, mood_context: Dict[str, any]) -> str:
+    def stream_chat_response(
+        self,
+        user_message: str,
+        mood_context: Dict[str, any],
+        timeout: Optional[float] = GEMINI_TIMEOUT_SECONDS,
+        priority: bool = False,
+        deadline: Optional[float] = GEMINI_DEADLINE_SECONDS,
+        conversation: str = ""
+    ) -> "GeminiReplyStream":
+        """
+        Stream a chat response as Gemini generates it.
+        
+        Iterate the returned stream with `async for` to receive reply text
+        as it arrives; the MOOD_UPDATE tag is never forwarded. Once the
+        iteration ends, `stream.text` holds the full cleaned reply and
+        `stream.mood_update` the parsed mood (or None). `stream.outcome` is
+        "success" only if Gemini finished the reply; "truncated" means the
+        stream timed out or failed part way and `stream.text` is partial,
+        "fallback" that the local fallback reply was sent instead.
+        
+        Args:
+            user_message: The user's message
+            mood_context: Mood context dictionary (see generate_chat_response)
+            timeout: Overall deadline for the stream in seconds (None for no deadline)
+            priority: Admit ahead of routine calls (high-severity crisis messages)
+            deadline: Seconds to wait for the first chunk before sending the fallback response
+            conversation: Rendered conversation context (see conversation_context.py)
+        
+        Returns:
+            GeminiReplyStream
+        """
+        return GeminiReplyStream(self, user_message, mood_context, timeout, priority, deadline, conversation)
+    
+    async def _stream_content_async(self, prompt: str, priority: bool = False) -> AsyncIterator[str]:
+        """
+        Call the streamGenerateContent endpoint (server-sent events) and yield text chunks.
+        
+        Args:
+            prompt: Full prompt text
+            priority: Queue ahead of routine calls for a slot
+        
+        Yields:
+            Text of each streamed candidate chunk
+        
+        Raises:
+            AdmissionRejected: The call was shed by admission control
+        """
+        http = self._get_async_http()
+        args = self._request_args(prompt)
+        args["url"] = args["url"].replace(":generateContent", ":streamGenerateContent")
+        # The slot is held until the stream is fully read or closed
+        async with self.admission.slot_async(priority):
+            self._count("requests")
+            self._count("in_flight")
+            try:
+                async with http.stream(
+                    "POST", params={"alt": "sse"}, extensions={"trace": self._async_trace}, **args
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        text = self._extract_text(json.loads(line[len("data:"):]))
+                        if text:
+                            yield text
+            except (asyncio.CancelledError, GeneratorExit):
+                self._count("cancelled")
+                raise
+            except Exception:
+                self._count("errors")
+                raise
+            finally:
+                self._count("in_flight", -1)
+    
+    def _build_prompt(self, user_message: str, mood_context: Dict[str, any], conversation: str = "") -> str:
         """
         Build the prompt for Gemini with mood context.
         
         Args:
             user_message: User's message
             mood_context: Mood context dictionary
+            conversation: Rendered conversation context, already within its token budget
         
         Returns:
             Formatted prompt string
@@ -130,6 +592,8 @@ class GeminiClient:
         mood_label = mood_context.get('mood_label', 'neutral')
         mood_score = mood_context.get('mood_score', 0.5)
         mood_timestamp = mood_context.get('mood_timestamp', 'N/A')
+        # Earlier conversation for continuity; empty for a user's first message
+        history = f"\nConversation So Far (use for continuity, do not repeat it):\n{conversation}\n" if conversation else ""
         
         prompt = f"""You are CuraCore, a calm and supportive mental health assistant.
 
@@ -156,7 +620,7 @@ Guidelines:
 Response Style:
 - Friendly, human, and simple.
 - 3–6 sentences maximum.
-
+{history}
 User Message:
 "{user_message}"
 
@@ -193,7 +657,7 @@ Generate the best possible response."""
         """
         # Look for MOOD_UPDATE tag (case-insensitive)
         # Support both granular moods and legacy positive/neutral/negative
-        mood_pattern = r'MOOD_UPDATE:\s*(happy|sad|anxious|stressed|calm|excited|angry|tired|neutral|positive|negative)'
+        mood_pattern = MOOD_PATTERN
         match = re.search(mood_pattern, response_text, re.IGNORECASE)
         
         if match:
@@ -215,16 +679,212 @@ Generate the best possible response."""
         Returns:
             Fallback response string
         """
-        fallback_responses = [
-            "I'm here to listen. Could you tell me more about how you're feeling?",
-            "Thank you for sharing. I'm here to support you. What's been on your mind?",
-            "I appreciate you opening up. How can I help you today?",
-            "I'm listening. Would you like to talk more about what's going on?",
-        ]
-        
         # Simple hash to get consistent but varied fallback
-        index = len(user_message) % len(fallback_responses)
-        return fallback_responses[index]
+        index = len(user_message) % len(FALLBACK_RESPONSES)
+        return FALLBACK_RESPONSES[index]
+    
+    @staticmethod
+    def is_fallback_response(text: str) -> bool:
+        """Whether a reply is a local fallback rather than one from Gemini"""
+        return text in FALLBACK_RESPONSES or text == EMPTY_MESSAGE_RESPONSE
+
+
+class MoodTagFilter:
+    """
+    Incrementally strips the trailing MOOD_UPDATE tag from streamed reply text.
+    
+    Text is released as soon as it can no longer be the start of the tag;
+    anything from the tag onwards is held back and parsed when the stream
+    ends.
+    """
+    
+    def __init__(self):
+        self.buffer = ""
+        self.released = 0
+        self.tag_found = False
+    
+    def feed(self, chunk: str) -> str:
+        """
+        Add streamed text.
+        
+        Args:
+            chunk: Next piece of the reply
+        
+        Returns:
+            Text that is safe to show the user now
+        """
+        self.buffer += chunk
+        if self.tag_found:
+            return ""
+        
+        tag_at = self.buffer.upper().find(MOOD_TAG, max(0, self.released - len(MOOD_TAG)))
+        if tag_at >= 0:
+            self.tag_found = True
+            safe_end = tag_at
+        else:
+            # Hold back a tail that could still grow into the tag
+            safe_end = len(self.buffer)
+            tail = self.buffer.upper()
+            for size in range(min(len(MOOD_TAG) - 1, len(tail)), 0, -1):
+                if MOOD_TAG.startswith(tail[-size:]):
+                    safe_end = len(self.buffer) - size
+                    break
+        
+        safe_end = max(safe_end, self.released)
+        released, self.released = self.buffer[self.released:safe_end], safe_end
+        return released
+    
+    def finish(self) -> Tuple[str, str, Optional[str]]:
+        """
+        End of stream: parse the held-back text.
+        
+        Returns:
+            Tuple of (remaining_text, full_reply, mood_update)
+            - remaining_text: Text not yet released, without the tag
+            - full_reply: The whole cleaned reply
+            - mood_update: Parsed mood or None
+        """
+        match = re.search(MOOD_PATTERN, self.buffer, re.IGNORECASE)
+        if match:
+            cleaned = self.buffer[:match.start()] + self.buffer[match.end():]
+            mood_update = match.group(1).lower()
+        else:
+            cleaned, mood_update = self.buffer, None
+        remaining = cleaned[self.released:] if len(cleaned) > self.released else ""
+        return remaining.rstrip(), cleaned.strip(), mood_update
+
+
+class GeminiReplyStream:
+    """Async iterator over a streamed Gemini reply; see GeminiClient.stream_chat_response"""
+    
+    def __init__(self, client: GeminiClient, user_message: str, mood_context: Dict[str, any],
+                 timeout: Optional[float], priority: bool = False,
+                 deadline: Optional[float] = GEMINI_DEADLINE_SECONDS, conversation: str = ""):
+        self.client = client
+        self.user_message = user_message
+        self.mood_context = mood_context
+        self.timeout = timeout
+        self.priority = priority
+        self.deadline = deadline
+        self.conversation = conversation
+        self.text = ""
+        self.mood_update = None
+        self.completed = False
+        # "success" (Gemini finished the reply), "truncated" (timed out or failed after
+        # the first chunk, `text` is partial) or "fallback" (local reply); None while streaming
+        self.outcome = None
+    
+    async def __aiter__(self) -> AsyncIterator[str]:
+        client = self.client
+        if not self.user_message or not self.user_message.strip():
+            self.text = EMPTY_MESSAGE_RESPONSE
+        elif not client.available:
+            logger.warning("Gemini model not available, using fallback response")
+            self.text = client._get_fallback_response(self.user_message)
+        else:
+            async for text in self._stream_from_gemini():
+                yield text
+            if self.completed:
+                return
+        
+        # Fallback replies arrive as a single chunk
+        self.completed, self.outcome = True, "fallback"
+        yield self.text
+    
+    async def _stream_from_gemini(self) -> AsyncIterator[str]:
+        client = self.client
+        try:
+            ticket = client._breaker_ticket()
+        except CircuitOpenError as e:
+            logger.debug(f"Gemini call skipped ({e}), using fallback response")
+            self.text = client._get_fallback_response(self.user_message)
+            return
+        
+        mood_filter = MoodTagFilter()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        end = started + self.timeout if self.timeout else None
+        # Until the first chunk arrives the (shorter) reply deadline applies
+        first_chunk_end = started + self.deadline if self.deadline else end
+        if end is not None and first_chunk_end is not None:
+            first_chunk_end = min(first_chunk_end, end)
+        first_chunk_seconds = None
+        outcome = "abandoned"
+        prompt = client._build_prompt(self.user_message, self.mood_context, self.conversation)
+        logger.info(f"Streaming Gemini API reply for message: {self.user_message[:50]}...")
+        
+        chunks = client._stream_content_async(prompt, self.priority)
+        try:
+            while True:
+                limit = end if first_chunk_seconds is not None else first_chunk_end
+                remaining = None if limit is None else max(0.0, limit - loop.time())
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    outcome = "success"
+                    break
+                if first_chunk_seconds is None:
+                    first_chunk_seconds = loop.time() - started
+                safe_text = mood_filter.feed(chunk)
+                if safe_text:
+                    yield safe_text
+        except asyncio.TimeoutError:
+            outcome = "failure"
+            if first_chunk_seconds is None:
+                client._count("hedged")
+                logger.warning(f"Gemini stream missed its {self.deadline}s deadline, using fallback response")
+            else:
+                client._count("timeouts")
+                logger.error(f"Gemini API stream timed out after {self.timeout}s")
+        except AdmissionRejected as e:
+            logger.debug(f"Gemini call skipped ({e}), using fallback response")
+        except Exception as e:
+            outcome = "failure"
+            logger.error(f"Error streaming from Gemini API: {e}")
+        finally:
+            await chunks.aclose()
+            # Client disconnects and shed calls say nothing about Gemini's health
+            if outcome == "success":
+                client.breaker.on_success(ticket, first_chunk_seconds or (loop.time() - started))
+            elif outcome == "failure":
+                client.breaker.on_failure(ticket)
+            else:
+                client.breaker.on_abandoned(ticket)
+        
+        remaining_text, full_reply, mood_update = mood_filter.finish()
+        if not full_reply:
+            # Nothing usable arrived: the caller sends the fallback reply instead
+            self.text = client._get_fallback_response(self.user_message)
+            return
+        if remaining_text:
+            yield remaining_text
+        self.text, self.completed = full_reply, True
+        if outcome != "success":
+            # The user saw part of a reply: never treat it as a finished one
+            self.outcome = "truncated"
+            logger.warning(f"Gemini reply stream ended early after {len(full_reply)} characters")
+            return
+        self.mood_update, self.outcome = mood_update, "success"
+        logger.info(f"✓ Gemini reply streamed successfully (mood_update: {mood_update})")
+
+
+_gemini_client: Optional[GeminiClient] = None
+_gemini_client_lock = threading.Lock()
+
+
+def get_gemini_client() -> GeminiClient:
+    """
+    Process-wide GeminiClient, created on first use and shared by all requests.
+    
+    Returns:
+        The shared GeminiClient instance
+    """
+    global _gemini_client
+    if _gemini_client is None:
+        with _gemini_client_lock:
+            if _gemini_client is None:
+                _gemini_client = GeminiClient()
+    return _gemini_client
 
 
 # Convenience function for easy import
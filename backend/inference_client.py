@@ -0,0 +1,147 @@
+"""
+Thin client for the shared inference worker
+
+`RemoteAIService` is a drop-in AIService for API worker processes. It keeps
+only the lightweight keyword service in memory and forwards model-backed
+calls to `inference_worker.py` over a Unix socket. Each call has a
+timeout; when the worker is down, slow or failing, the call is answered
+by the lite implementation instead.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from multiprocessing.connection import Client
+from typing import AsyncIterator, Dict, List, Optional
+
+from ai_service_lite import AIService as LiteAIService
+from config import (
+    INFERENCE_SOCKET, INFERENCE_TIMEOUT_SECONDS, INFERENCE_RETRY_SECONDS, SECRET_KEY
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteAIService(LiteAIService):
+    """AIService that delegates inference to the shared worker, falling back to lite"""
+
+    def __init__(self, socket_path: str = INFERENCE_SOCKET, timeout: float = INFERENCE_TIMEOUT_SECONDS):
+        super().__init__()
+        # Fallbacks go to a plain lite instance so they never re-enter the remote path
+        self.lite = LiteAIService()
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.remote_model_version = None
+        # multiprocessing Connections are not thread-safe, so keep one per thread
+        self._local = threading.local()
+        self._retry_at = 0.0
+        self._stats_lock = threading.Lock()
+        self.stats = {"remote_calls": 0, "fallbacks": 0, "timeouts": 0, "errors": 0}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _connection(self):
+        """Return this thread's worker connection, connecting if needed"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        if time.monotonic() < self._retry_at:
+            raise ConnectionError("inference worker unavailable")
+
+        try:
+            conn = Client(self.socket_path, family="AF_UNIX", authkey=SECRET_KEY.encode())
+        except Exception:
+            # Don't pay a failed connect on every request while the worker is down
+            self._retry_at = time.monotonic() + INFERENCE_RETRY_SECONDS
+            raise
+
+        self._local.conn = conn
+        if self.remote_model_version is None:
+            self.remote_model_version = self._request(conn, "info")["emotion_model_version"]
+            logger.info(f"✓ Connected to inference worker ({self.remote_model_version})")
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _request(self, conn, method: str, *args, **kwargs):
+        conn.send((method, args, kwargs))
+        if not conn.poll(self.timeout):
+            raise TimeoutError(f"inference worker did not answer {method} within {self.timeout}s")
+        status, payload = conn.recv()
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def _remote(self, method: str, *args, **kwargs):
+        """Call the worker, raising on connection failure, timeout or remote error"""
+        result = self._request(self._connection(), method, *args, **kwargs)
+        self._count("remote_calls")
+        return result
+
+    def _fallback(self, method: str, error: Exception, fallback, *args, **kwargs):
+        """Record a failed remote call and answer it locally"""
+        if isinstance(error, TimeoutError):
+            self._count("timeouts")
+        elif not isinstance(error, ConnectionError):
+            self._count("errors")
+        # A timed-out or broken connection may still deliver a stale reply later
+        if not isinstance(error, RuntimeError):
+            self._drop_connection()
+        self._count("fallbacks")
+        logger.warning(f"Remote {method} failed ({error}), using lite AI service")
+        return fallback(*args, **kwargs)
+
+    def _call(self, method: str, fallback, *args, **kwargs):
+        """Call the worker, answering with `fallback` on any failure"""
+        try:
+            return self._remote(method, *args, **kwargs)
+        except Exception as e:
+            return self._fallback(method, e, fallback, *args, **kwargs)
+
+    def detect_emotion(self, text: str) -> Dict[str, float]:
+        """Emotion scores from the shared worker's model, cached locally"""
+        if self.remote_model_version:
+            cached_scores = self.emotion_cache.get(text, self.remote_model_version)
+            if cached_scores is not None:
+                return cached_scores
+
+        try:
+            scores = self._remote("detect_emotion", text)
+        except Exception as e:
+            return self._fallback("detect_emotion", e, self.lite.detect_emotion, text)
+
+        self.emotion_cache.set(text, self.remote_model_version, scores)
+        return scores
+
+    def detect_emotion_batch(self, texts: List[str], batch_size: int = 16) -> List[Dict[str, float]]:
+        """Batched emotion scores from the shared worker's model"""
+        return self._call("detect_emotion_batch", self.lite.detect_emotion_batch, texts, batch_size=batch_size)
+
+    def generate_response(self, message: str, detected_emotion: str = None, user_name: str = None) -> str:
+        return self._call("generate_response", self.lite.generate_response, message, detected_emotion, user_name)
+
+    def generate_chat_response(self, message: str, context: str = "") -> str:
+        # The lite service has no generative model; its templated reply is the fallback
+        return self._call("generate_chat_response", lambda m, c="": self.lite.generate_response(m), message, context)
+
+    async def stream_chat_response(self, message: str, conversation_id: Optional[str] = None) -> AsyncIterator[str]:
+        # The worker protocol is request/response, so the remote reply arrives as one chunk
+        loop = asyncio.get_running_loop()
+        yield await loop.run_in_executor(None, self.generate_chat_response, message)
+
+    def get_mood_insights(self, mood_history: List[Dict]) -> Dict:
+        return self._call("get_mood_insights", self.lite.get_mood_insights, mood_history)
+
+    def analyze_conversation_sentiment(self, messages: List[str]) -> Dict:
+        return self._call("analyze_conversation_sentiment", self.lite.analyze_conversation_sentiment, messages)
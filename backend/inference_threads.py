@@ -0,0 +1,113 @@
+"""
+Per-process CPU thread budget for torch inference
+
+With several API or inference worker processes on one host, every process
+would otherwise size torch's intra-op pool to all cores and they thrash.
+`configure_torch_threads()` splits the available CPUs between the
+configured number of processes, applies the intra-op/inter-op sizes and
+optionally pins the process to its own slice of cores.
+"""
+
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+from config import (
+    INFERENCE_WORKER_PROCESSES, TORCH_NUM_THREADS, TORCH_INTEROP_THREADS, TORCH_CPU_AFFINITY
+)
+
+logger = logging.getLogger(__name__)
+
+_thread_config: Optional[Dict] = None
+# Kept open for the life of the process so the claimed CPU slot stays reserved
+_slot_lock_file = None
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def compute_thread_budget(cpu_count: int, processes: int, requested: int = 0) -> int:
+    """Intra-op threads per process: an explicit request, or an even share of the CPUs"""
+    if requested > 0:
+        return requested
+    return max(1, cpu_count // max(1, processes))
+
+
+def _lock_file_nonblocking(handle) -> None:
+    """Take an exclusive lock on an open file without waiting; raises OSError if it is held"""
+    if os.name == "posix":
+        import fcntl
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        import msvcrt
+        msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _claim_worker_slot(processes: int) -> Optional[int]:
+    """Claim a free slot index among sibling processes using per-slot lock files"""
+    global _slot_lock_file
+    for slot in range(processes):
+        path = os.path.join(tempfile.gettempdir(), f"curacore-cpu-slot-{slot}.lock")
+        handle = open(path, "w")
+        try:
+            _lock_file_nonblocking(handle)
+        except OSError:
+            handle.close()
+            continue
+        _slot_lock_file = handle
+        return slot
+    return None
+
+
+def configure_torch_threads() -> Dict:
+    """Apply the thread budget (and optional CPU pinning) once per process"""
+    global _thread_config
+    if _thread_config is not None:
+        return _thread_config
+
+    import torch
+
+    cpus = available_cpus()
+    processes = max(1, INFERENCE_WORKER_PROCESSES)
+    intra_op = compute_thread_budget(len(cpus), processes, TORCH_NUM_THREADS)
+    slot = None
+
+    if TORCH_CPU_AFFINITY == "auto" and hasattr(os, "sched_setaffinity"):
+        slot = _claim_worker_slot(processes)
+        if slot is not None:
+            start = (slot * intra_op) % len(cpus)
+            pinned = [cpus[(start + i) % len(cpus)] for i in range(min(intra_op, len(cpus)))]
+            os.sched_setaffinity(0, pinned)
+        else:
+            logger.warning("No free CPU slot to claim; running without CPU pinning")
+
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_num_interop_threads(TORCH_INTEROP_THREADS)
+    except RuntimeError as e:
+        # Only allowed before any inter-op parallel work has started in this process
+        logger.warning(f"Could not set inter-op threads: {e}")
+
+    _thread_config = {"processes": processes, "worker_slot": slot}
+    logger.info(f"Torch threads configured: {thread_report()}")
+    return _thread_config
+
+
+def thread_report() -> Dict:
+    """Effective thread settings of this process"""
+    import torch
+
+    config = _thread_config or {}
+    return {
+        "pid": os.getpid(),
+        "worker_slot": config.get("worker_slot"),
+        "processes_sharing_host": config.get("processes"),
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads(),
+        "cpu_affinity": available_cpus(),
+    }
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Shared inference worker for CuraCore
+
+Owns the transformer models once per host and serves inference to any
+number of API worker processes over a local Unix socket. API workers run
+with AI_SERVICE_MODE=remote and use `inference_client.RemoteAIService`,
+so their memory stays flat no matter how many uvicorn workers are started.
+
+Usage:
+    python inference_worker.py
+"""
+
+import logging
+import os
+import threading
+from multiprocessing.connection import Listener
+
+from config import INFERENCE_SOCKET, INFERENCE_WORKER_CONCURRENCY, SECRET_KEY
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Methods API workers may call on the model-owning AIService
+REMOTE_METHODS = {
+    "detect_emotion",
+    "detect_emotion_batch",
+    "get_dominant_emotion",
+    "generate_chat_response",
+    "generate_response",
+    "get_mood_insights",
+    "analyze_conversation_sentiment",
+}
+
+
+class InferenceWorker:
+    """Serves AIService calls over an authenticated Unix socket"""
+
+    def __init__(self, socket_path: str = INFERENCE_SOCKET, concurrency: int = INFERENCE_WORKER_CONCURRENCY):
+        from ai_service import AIService
+
+        self.socket_path = socket_path
+        self.ai_service = AIService()
+        # Pay for first-request warm-up before accepting connections
+        self.ai_service.warm_up()
+        # Bounds concurrent forward passes; connections themselves are cheap threads
+        self.slots = threading.BoundedSemaphore(max(1, concurrency))
+
+    def info(self) -> dict:
+        """Describe the models this worker serves"""
+        return {
+            "pid": os.getpid(),
+            "emotion_model_version": self.ai_service.emotion_model_version,
+            "methods": sorted(REMOTE_METHODS),
+        }
+
+    def serve_forever(self):
+        """Accept client connections until interrupted"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        with Listener(self.socket_path, family="AF_UNIX", authkey=SECRET_KEY.encode()) as listener:
+            os.chmod(self.socket_path, 0o600)
+            logger.info(f"✓ Inference worker listening on {self.socket_path}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.error(f"Rejected inference client connection: {e}")
+                    continue
+                threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+
+    def _handle_connection(self, conn):
+        """Answer requests on one client connection until it closes"""
+        with conn:
+            while True:
+                try:
+                    method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self._dispatch(method, args, kwargs))
+
+    def _dispatch(self, method, args, kwargs):
+        if method == "info":
+            return ("ok", self.info())
+        if method not in REMOTE_METHODS:
+            return ("error", f"Unsupported method: {method}")
+
+        try:
+            with self.slots:
+                return ("ok", getattr(self.ai_service, method)(*args, **kwargs))
+        except Exception as e:
+            logger.error(f"Inference call {method} failed: {e}")
+            return ("error", str(e))
+
+
+if __name__ == "__main__":
+    try:
+        InferenceWorker().serve_forever()
+    except KeyboardInterrupt:
+        logger.info("👋 Inference worker stopped")
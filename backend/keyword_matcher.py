@@ -0,0 +1,147 @@
+"""
+Multi-pattern keyword matching for crisis and emotion detection
+
+`KeywordMatcher` compiles labelled keyword lists into an Aho-Corasick
+automaton and finds every keyword in a single pass over the text, instead
+of one substring scan per keyword. By default matches must start and end
+on word boundaries, so "mad" does not fire inside "made". A keyword ending
+in "*" matches as a word prefix ("stress*" also finds "stressful").
+With `whole_words=False` keywords match anywhere in the text, exactly like
+`keyword in text`; crisis detection uses this so that no inflection or
+compound ("self-harming", "attacked") is ever missed.
+
+Keyword lists can be replaced at runtime with `reload()`. The new
+automaton is built on the side and swapped in with a single assignment,
+so concurrent readers see either the old lists or the new ones.
+"""
+
+import hashlib
+import json
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+class KeywordMatch(NamedTuple):
+    label: str
+    keyword: str
+    start: int
+    end: int
+
+
+class _Automaton(NamedTuple):
+    # Per node: next node for every character that doesn't lead back to the root
+    transitions: List[Dict[str, int]]
+    # Per node: (label, keyword, length, is_prefix) for every keyword ending there
+    output: List[tuple]
+    labels: tuple
+    fingerprint: str
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _build_automaton(keywords: Dict[str, Iterable[str]]) -> _Automaton:
+    keywords = {label: list(words) for label, words in keywords.items()}
+    goto: List[Dict[str, int]] = [{}]
+    output: List[list] = [[]]
+
+    for label, words in keywords.items():
+        for word in words:
+            pattern = word.strip().lower()
+            is_prefix = pattern.endswith("*")
+            pattern = pattern.rstrip("*")
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto[node][char] = next_node
+                    goto.append({})
+                    output.append([])
+                node = next_node
+            output[node].append((label, pattern, len(pattern), is_prefix))
+
+    # Breadth-first failure links; each node also reports its suffixes' keywords.
+    # Failure links are folded into the transition tables, so matching never backtracks.
+    fail = [0] * len(goto)
+    transitions = [dict(goto[0])] + [None] * (len(goto) - 1)
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        transitions[node] = {**transitions[fail[node]], **goto[node]}
+        for char, child in goto[node].items():
+            queue.append(child)
+            fail[child] = transitions[fail[node]].get(char, 0)
+            output[child].extend(output[fail[child]])
+
+    fingerprint = hashlib.sha256(json.dumps(keywords, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return _Automaton(transitions, [tuple(entries) for entries in output], tuple(keywords), fingerprint)
+
+
+class KeywordMatcher:
+    """Aho-Corasick matcher over labelled keyword lists with optional word-boundary checks"""
+
+    def __init__(self, keywords: Dict[str, Iterable[str]], whole_words: bool = True):
+        self.whole_words = whole_words
+        self._automaton = _build_automaton(keywords)
+
+    def reload(self, keywords: Dict[str, Iterable[str]]):
+        """Atomically replace the keyword lists"""
+        self._automaton = _build_automaton(keywords)
+
+    @property
+    def labels(self) -> tuple:
+        return self._automaton.labels
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the current keyword lists"""
+        return self._automaton.fingerprint
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """Every keyword occurrence in `text` (whole words unless disabled), in order of where it ends"""
+        automaton = self._automaton  # one consistent snapshot even if reloaded meanwhile
+        transitions, output = automaton.transitions, automaton.output
+        whole_words = self.whole_words
+        text = text.lower()
+        matches = []
+        node = 0
+
+        for index, char in enumerate(text):
+            node = transitions[node].get(char, 0)
+            if not output[node]:
+                continue
+
+            end = index + 1
+            for label, keyword, length, is_prefix in output[node]:
+                start = end - length
+                if not whole_words:
+                    matches.append(KeywordMatch(label, keyword, start, end))
+                    continue
+                if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(keyword[0]):
+                    continue
+                if (not is_prefix and end < len(text) and _is_word_char(text[end])
+                        and _is_word_char(keyword[-1])):
+                    continue
+                matches.append(KeywordMatch(label, keyword, start, end))
+
+        return matches
+
+    def count_keywords(self, text: str) -> Dict[str, int]:
+        """Number of distinct keywords found per label (every label present, zero if none)"""
+        seen = {(match.label, match.keyword) for match in self.find_all(text)}
+        counts = {label: 0 for label in self._automaton.labels}
+        for label, _ in seen:
+            counts[label] += 1
+        return counts
+
+    def first_label(self, text: str) -> Optional[str]:
+        """The earliest-listed label with at least one keyword in `text`"""
+        found = {match.label for match in self.find_all(text)}
+        for label in self._automaton.labels:
+            if label in found:
+                return label
+        return None
@@ -1,21 +1,33 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request
+from fastapi import FastAPI, HTTPException, Depends, status, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from datetime import timedelta
+import asyncio
+import functools
+import json
 import logging
+import time
 from database import Database
 from auth import create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from models import UserRegister, UserLogin, UserResponse, Token, ChatMessage, ChatResponse, MoodEntry, MoodResponse, QuizAnswer
 from quiz_service import QuizService
-# Try to import full AI service, fallback to lite version
-try:
-    from ai_service import AIService
-    print("✓ Using full AI services & Agentic AI is Monitoring")
-except ImportError as e:
-    print(f"⚠️  Full AI dependencies not available: {e}")
-    print("📦 Using lightweight AI service (keyword-based)")
-    from ai_service_lite import AIService
+from emotion_cache import get_emotion_cache
+from sentiment_state import seed_emotion_vector, summarize_sentiment, parse_emotion_scores
+from config import AI_SERVICE_MODE
+from service_manager import AIServiceManager
+from cascade_service import CascadeAIService
+from gemini_client import get_gemini_client
+from response_cache import get_response_cache, cache_scope
+from conversation_context import ConversationContextManager, turn_timestamp
+from priority_scheduler import get_scheduler, lane_for, scheduler_stats
+from stage_timings import StageTrace, get_stage_timings, stage_timing_stats
+from write_behind import IdBlockAllocator, WriteBehindQueue
+# Remote mode: models live in the shared inference worker, this process stays thin
+if AI_SERVICE_MODE == "remote":
+    from inference_client import RemoteAIService
+    print("✓ Using shared inference worker (remote mode, lite fallback)")
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -49,8 +61,47 @@ async def options_handler(request: Request, path: str):
 
 # Initialize database, AI service, and quiz service
 db = Database()
-ai_service = AIService()
+ai_manager = None
+if AI_SERVICE_MODE == "remote":
+    ai_service = RemoteAIService()
+else:
+    # Serves the lite AI service until the full models finish loading in the background
+    ai_manager = AIServiceManager()
+    if ai_manager.load_full:
+        print("✓ Using full AI services & Agentic AI is Monitoring (models load in background)")
+    else:
+        print("📦 Using lightweight AI service (keyword-based)")
+    if AI_SERVICE_MODE == "cascade":
+        # Keyword pass answers confident messages; ambiguous ones escalate to the models
+        ai_service = CascadeAIService(ai_manager)
+        print("✓ Cascade mode: keyword pass first, transformer only for ambiguous messages")
+    else:
+        ai_service = ai_manager
 quiz_service = QuizService()
+# Per-user summary + recent turns added to Gemini prompts
+conversation_context = ConversationContextManager(db)
+# Chat turns are saved after the reply is sent, under ids reserved up front
+chat_ids = IdBlockAllocator(db, "chat_conversations")
+chat_writes = WriteBehindQueue("chat")
+
+@app.on_event("startup")
+async def start_model_loading():
+    """Kick off background model loading without blocking server start"""
+    if ai_manager is not None:
+        ai_manager.start_background_load()
+    # Create the shared Gemini client up front rather than on the first chat message
+    get_gemini_client()
+
+@app.on_event("shutdown")
+async def close_gemini_client():
+    """Close pooled Gemini API connections"""
+    get_gemini_client().close()
+
+@app.on_event("shutdown")
+async def flush_chat_writes():
+    """Finish queued chat writes before the process exits"""
+    if not await chat_writes.flush(timeout=10):
+        logger.error(f"Shutting down with {chat_writes.pending()} chat writes not saved")
 
 # Security
 security = HTTPBearer()
@@ -116,6 +167,113 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """Get current user information"""
     return current_user
 
+def fold_chat_sentiment(user_id, emotion_scores, sentiment_state):
+    """Fold a saved chat turn into the user's rolling conversation sentiment (a single write)"""
+    sentiment_state.update(db.update_conversation_sentiment(user_id, emotion_scores))
+
+def seed_new_chat_sentiment(user_id, sentiment_state):
+    """Seed a brand-new sentiment state from the chats saved before it existed"""
+    if sentiment_state["message_count"] == 1:
+        seed_conversation_sentiment(user_id)
+
+def queue_chat_turn(lane, chat_id, user_id, message, bot_response, final_mood, detected_emotion, emotion_scores, mood_update):
+    """Hand a chat turn's writes to the background queue; returns without touching the disk
+    
+    The Gemini mood update (if any), the chat message, the sentiment update and
+    the detected-emotion mood entry are saved in that order, after every earlier
+    turn of this user. Each write is its own step, so a retry never applies the
+    sentiment update twice.
+    """
+    # Recent turns feed the next prompt straight away; older ones are summarised in the background
+    timestamp = turn_timestamp()
+    conversation_context.record_turn(user_id, chat_id, message, bot_response, detected_emotion, timestamp)
+    
+    steps = []
+    if mood_update:
+        steps.append(functools.partial(
+            db.save_mood_entry, user_id, final_mood, f"Updated from chat: {message[:50]}...", emotion_scores
+        ))
+    steps.append(functools.partial(
+        db.save_chat_message, user_id, message, bot_response, final_mood, detected_emotion, emotion_scores,
+        chat_id=chat_id, timestamp=timestamp
+    ))
+    # Filled in by the sentiment step for the seeding step after it
+    sentiment_state = {}
+    steps.append(functools.partial(fold_chat_sentiment, user_id, emotion_scores, sentiment_state))
+    steps.append(functools.partial(seed_new_chat_sentiment, user_id, sentiment_state))
+    
+    # Save mood entry if emotion detected with high confidence
+    # (Only if mood wasn't already updated by Gemini)
+    if detected_emotion != "neutral" and emotion_scores.get(detected_emotion, 0) > 0.4 and not mood_update:
+        steps.append(functools.partial(
+            db.save_mood_entry, user_id, detected_emotion, f"Detected from chat: {message[:100]}...", emotion_scores
+        ))
+    chat_writes.submit(user_id, lane, steps)
+
+# Map Gemini mood categories to our mood labels
+# Support both granular moods and legacy positive/neutral/negative
+GEMINI_MOOD_MAPPING = {
+    # Granular moods (direct mapping)
+    'happy': 'happy',
+    'sad': 'sad',
+    'anxious': 'anxious',
+    'stressed': 'stressed',
+    'calm': 'calm',
+    'excited': 'excited',
+    'angry': 'angry',
+    'tired': 'tired',
+    'neutral': 'neutral',
+    # Legacy mappings (backward compatibility)
+    'positive': 'happy',
+    'negative': 'sad'
+}
+
+def cached_chat_reply(user_id, message, mood_context, crisis_info, context):
+    """Cached Gemini reply for a repeated or common message, or None; crisis messages always skip the cache"""
+    if crisis_info['crisis_detected']:
+        get_response_cache().bypass()
+        return None
+    return get_response_cache().get(user_id, message, mood_context, cache_scope(message, context))
+
+def remember_chat_reply(user_id, message, mood_context, crisis_info, context, bot_response, mood_update, seconds):
+    """Cache a genuine Gemini reply (never fallbacks or crisis replies)"""
+    if crisis_info['crisis_detected'] or get_gemini_client().is_fallback_response(bot_response):
+        return
+    get_response_cache().set(user_id, message, mood_context, bot_response, mood_update, seconds,
+                             cache_scope(message, context))
+
+def analyze_message_emotion(message: str):
+    """Emotion scores and dominant emotion for a chat message, from a single detection"""
+    emotion_scores = ai_service.detect_emotion(message)
+    dominant_emotion = max(emotion_scores, key=emotion_scores.get) if emotion_scores else "neutral"
+    # Same confidence cut-off as the AI services' get_dominant_emotion
+    if emotion_scores.get(dominant_emotion, 0) > 0.3:
+        return emotion_scores, dominant_emotion
+    return emotion_scores, "neutral"
+
+def latest_mood(user_id):
+    """Most recent mood entry for a user, or None"""
+    mood_history = db.get_mood_history(user_id, limit=1)
+    return mood_history[0] if mood_history else None
+
+def conversation_for_prompt(user_id):
+    """Conversation context for the next Gemini prompt"""
+    return conversation_context.context_for(user_id)
+
+def start_chat_input_stages(trace: StageTrace, user_id, message: str, lane: str):
+    """Start the independent inputs of a Gemini reply side by side
+    
+    Returns tasks for (emotion scores and dominant emotion, latest mood entry,
+    conversation context). None of them depends on another, so the reply can
+    start as soon as the slowest one is done instead of after all three in turn.
+    """
+    loop = asyncio.get_running_loop()
+    return (
+        trace.start("emotion", get_scheduler("inference").run(lane, analyze_message_emotion, message)),
+        trace.start("mood_lookup", loop.run_in_executor(None, latest_mood, user_id)),
+        trace.start("context", loop.run_in_executor(None, conversation_for_prompt, user_id)),
+    )
+
 @app.post("/chat/send")
 async def send_chat_message(
     chat_data: ChatMessage, 
@@ -124,27 +282,31 @@ async def send_chat_message(
     """Send a chat message and get AI response with emotion analysis"""
     user_id = current_user["id"]
     user_name = current_user["name"]
+    trace = StageTrace()
     
     # PRIORITY: Check for crisis situations first
-    crisis_info = ai_service.detect_crisis(chat_data.message)
+    crisis_info = trace.call("crisis", ai_service.detect_crisis, chat_data.message)
     
     # Log crisis situations for monitoring and follow-up
     if crisis_info['crisis_detected']:
         print(f"🚨 CRISIS ALERT - User {user_id} ({user_name}): {crisis_info}")
         # In production, this should trigger alerts to mental health professionals
         # For now, we log it for monitoring
-        
-    # Detect emotions using pretrained model
-    emotion_scores = ai_service.detect_emotion(chat_data.message)
-    detected_emotion = ai_service.get_dominant_emotion(chat_data.message)
+    
+    # High-severity crisis messages go ahead of routine chat in every stage below
+    lane = lane_for(crisis_info)
+    mood_update = None
+    
+    # Emotion detection, the latest mood and the conversation context run concurrently
+    emotion_task, mood_task, context_task = start_chat_input_stages(trace, user_id, chat_data.message, lane)
+    emotion_scores, detected_emotion = await emotion_task
     
     # Use provided mood or detected emotion
     final_mood = chat_data.mood or detected_emotion
     
     # === GEMINI INTEGRATION: Fetch latest mood for context ===
     try:
-        mood_history = db.get_mood_history(user_id, limit=1)
-        current_mood = mood_history[0] if mood_history else None
+        current_mood = await mood_task
         
         # Build mood context for Gemini
         mood_context = {
@@ -153,43 +315,34 @@ async def send_chat_message(
             'mood_timestamp': current_mood['timestamp'] if current_mood else 'N/A'
         }
         
-        # Import and initialize Gemini client
-        from gemini_client import GeminiClient
-        gemini_client = GeminiClient()
+        context = await context_task
+        conversation = context.render()
         
-        # Generate response using Gemini API with mood context
-        bot_response, mood_update = gemini_client.generate_chat_response(
-            chat_data.message,
-            mood_context
-        )
+        # Repeats and common questions are answered from this user's reply cache
+        cached = cached_chat_reply(user_id, chat_data.message, mood_context, crisis_info, context)
+        if cached:
+            bot_response, mood_update = cached.text, cached.mood_update
+        else:
+            # Shared client: keeps pooled keep-alive connections to the Gemini API
+            gemini_client = get_gemini_client()
+            
+            # Generate response using Gemini API with mood context
+            started = time.perf_counter()
+            bot_response, mood_update = await trace.run("gemini", get_scheduler("llm").run_async(
+                lane,
+                gemini_client.generate_chat_response_async,
+                chat_data.message,
+                mood_context,
+                priority=(lane == "crisis"),
+                conversation=conversation
+            ))
+            remember_chat_reply(user_id, chat_data.message, mood_context, crisis_info, context,
+                                bot_response, mood_update, time.perf_counter() - started)
         
-        # Update mood if Gemini detected a mood change
+        # Update mood if Gemini detected a mood change (saved with the chat turn below)
         if mood_update:
             # Map Gemini mood categories to our mood labels
-            # Support both granular moods and legacy positive/neutral/negative
-            mood_mapping = {
-                # Granular moods (direct mapping)
-                'happy': 'happy',
-                'sad': 'sad',
-                'anxious': 'anxious',
-                'stressed': 'stressed',
-                'calm': 'calm',
-                'excited': 'excited',
-                'angry': 'angry',
-                'tired': 'tired',
-                'neutral': 'neutral',
-                # Legacy mappings (backward compatibility)
-                'positive': 'happy',
-                'negative': 'sad'
-            }
-            new_mood = mood_mapping.get(mood_update, 'neutral')
-            
-            # Save mood update to database
-            db.save_mood_entry(
-                user_id, 
-                new_mood, 
-                f"Updated from chat: {chat_data.message[:50]}..."
-            )
+            new_mood = GEMINI_MOOD_MAPPING.get(mood_update, 'neutral')
             logger.info(f"Mood updated to '{new_mood}' based on Gemini analysis")
             
             # Update final_mood to reflect the change
@@ -200,22 +353,20 @@ async def send_chat_message(
         # Fallback to simple response if Gemini fails
         bot_response = "I'm here to listen. Could you tell me more about how you're feeling?"
     
-    # Save conversation to database with emotion data
-    chat_id = db.save_chat_message(
-        user_id, 
-        chat_data.message, 
-        bot_response, 
+    # Save conversation to database with emotion data, after the response is sent
+    chat_id = await trace.run("chat_id", chat_ids.next_id())
+    queue_chat_turn(
+        lane,
+        chat_id,
+        user_id,
+        chat_data.message,
+        bot_response,
         final_mood,
         detected_emotion,
-        emotion_scores
+        emotion_scores,
+        mood_update
     )
-    
-    # Save mood entry if emotion detected with high confidence
-    # (Only if mood wasn't already updated by Gemini)
-    if detected_emotion != "neutral" and emotion_scores.get(detected_emotion, 0) > 0.4:
-        # Check if we didn't already update mood via Gemini
-        if not (mood_update):
-            db.save_mood_entry(user_id, detected_emotion, f"Detected from chat: {chat_data.message[:100]}...")
+    get_stage_timings("chat_send").record(trace)
     
     return {
         "id": chat_id,
@@ -229,6 +380,157 @@ async def send_chat_message(
         "timestamp": "now"
     }
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def stream_chat_message(
+    chat_data: ChatMessage,
+    current_user: dict = Depends(get_current_user)
+):
+    """Send a chat message and stream the Gemini reply back as server-sent events
+    
+    Events: `meta` (emotion and crisis info, sent first), `chunk` (reply text as it
+    arrives) and `done` (final reply and mood update). The turn is saved after the
+    stream closes, and only if the client received the whole reply. A reply cut
+    off by a timeout or error is flagged `truncated` in `done` and has no id.
+    """
+    user_id = current_user["id"]
+    user_name = current_user["name"]
+    
+    trace = StageTrace()
+    crisis_info = trace.call("crisis", ai_service.detect_crisis, chat_data.message)
+    if crisis_info['crisis_detected']:
+        print(f"🚨 CRISIS ALERT - User {user_id} ({user_name}): {crisis_info}")
+    lane = lane_for(crisis_info)
+    
+    emotion_task, mood_task, context_task = start_chat_input_stages(trace, user_id, chat_data.message, lane)
+    emotion_scores, detected_emotion = await emotion_task
+    current_mood = await mood_task
+    mood_context = {
+        'mood_label': current_mood['mood'] if current_mood else 'neutral',
+        'mood_score': emotion_scores.get(detected_emotion, 0.5),
+        'mood_timestamp': current_mood['timestamp'] if current_mood else 'N/A'
+    }
+    context = await context_task
+    conversation = context.render()
+    cached = cached_chat_reply(user_id, chat_data.message, mood_context, crisis_info, context)
+    result = {"done": False, "truncated": False,
+              "text": cached.text if cached else "", "mood_update": cached.mood_update if cached else None}
+    
+    async def reply_events():
+        yield sse_event("meta", {
+            "detected_emotion": detected_emotion,
+            "emotion_scores": emotion_scores,
+            "crisis_detected": crisis_info['crisis_detected'],
+            "crisis_severity": crisis_info['severity'] if crisis_info['crisis_detected'] else None,
+        })
+        if cached:
+            yield sse_event("chunk", {"text": cached.text})
+        else:
+            reply = get_gemini_client().stream_chat_response(
+                chat_data.message, mood_context, priority=(lane == "crisis"),
+                conversation=conversation
+            )
+            started = time.perf_counter()
+            async with get_scheduler("llm").slot(lane):
+                async for text in reply:
+                    yield sse_event("chunk", {"text": text})
+            trace.stages["gemini"] = time.perf_counter() - started
+            result.update(text=reply.text, mood_update=reply.mood_update, truncated=reply.outcome == "truncated")
+            # Only replies Gemini finished are reused; a cut-off reply is never cached
+            if reply.outcome == "success":
+                remember_chat_reply(user_id, chat_data.message, mood_context, crisis_info, context,
+                                    reply.text, reply.mood_update, time.perf_counter() - started)
+        new_mood = GEMINI_MOOD_MAPPING.get(result["mood_update"], 'neutral') if result["mood_update"] else None
+        # A cut-off reply is never saved, so it gets no chat id
+        result["chat_id"] = None if result["truncated"] else await chat_ids.next_id()
+        yield sse_event("done", {
+            "id": result["chat_id"],
+            "bot_response": result["text"],
+            "mood": new_mood or chat_data.mood or detected_emotion,
+            "mood_updated": new_mood is not None,
+            "truncated": result["truncated"],
+        })
+        result["done"] = True
+        get_stage_timings("chat_stream").record(trace)
+    
+    async def persist_reply():
+        # Runs after the response has been sent; cut-off replies are not saved as finished turns
+        if not result["done"] or result["truncated"]:
+            return
+        final_mood = chat_data.mood or detected_emotion
+        if result["mood_update"]:
+            final_mood = GEMINI_MOOD_MAPPING.get(result["mood_update"], 'neutral')
+            logger.info(f"Mood updated to '{final_mood}' based on Gemini analysis")
+        queue_chat_turn(
+            lane,
+            result["chat_id"],
+            user_id,
+            chat_data.message,
+            result["text"],
+            final_mood,
+            detected_emotion,
+            emotion_scores,
+            result["mood_update"]
+        )
+    
+    return StreamingResponse(
+        reply_events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(persist_reply)
+    )
+
+@app.post("/chat/local/stream")
+async def stream_local_chat(
+    chat_data: ChatMessage,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream a reply from the local chat model as it is generated
+    
+    Crisis messages never reach the model: they get the crisis response with
+    support resources in one piece.
+    """
+    user_id = current_user["id"]
+    user_name = current_user["name"]
+    
+    # PRIORITY: Check for crisis situations first
+    crisis_info = ai_service.detect_crisis(chat_data.message)
+    if crisis_info['crisis_detected']:
+        print(f"🚨 CRISIS ALERT - User {user_id} ({user_name}): {crisis_info}")
+    lane = lane_for(crisis_info)
+    
+    emotion_scores, detected_emotion = await get_scheduler("inference").run(
+        lane, analyze_message_emotion, chat_data.message
+    )
+
+    async def reply_chunks():
+        parts = []
+        if crisis_info['crisis_detected']:
+            parts.append(ai_service.generate_crisis_response(crisis_info))
+            yield parts[0]
+        else:
+            # One conversation per user, so follow-up turns reuse the cached context
+            async for text in ai_service.stream_chat_response(chat_data.message, conversation_id=f"user-{user_id}"):
+                parts.append(text)
+                yield text
+        # Only persisted when the client read the whole reply
+        chat_writes.submit(user_id, lane, [functools.partial(
+            db.save_chat_message,
+            user_id,
+            chat_data.message,
+            "".join(parts).strip(),
+            chat_data.mood or detected_emotion,
+            detected_emotion,
+            emotion_scores,
+            chat_id=await chat_ids.next_id()
+        )])
+
+    return StreamingResponse(reply_chunks(), media_type="text/plain; charset=utf-8")
+
 @app.get("/chat/history")
 async def get_chat_history(current_user: dict = Depends(get_current_user)):
     """Get chat history for current user"""
@@ -236,15 +538,28 @@ async def get_chat_history(current_user: dict = Depends(get_current_user)):
     history = db.get_chat_history(user_id)
     return {"history": history}
 
+def score_mood_notes(mood_id: int, notes: str):
+    """Compute and store emotion scores for a mood entry's notes (runs after the response)"""
+    try:
+        emotion_scores = ai_service.detect_emotion(notes)
+        db.update_mood_emotion_scores([(mood_id, emotion_scores)])
+    except Exception as e:
+        logger.error(f"Failed to score notes for mood entry {mood_id}: {e}")
+
 @app.post("/mood/track")
 async def track_mood(
     mood_data: MoodEntry, 
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user)
 ):
     """Track user mood"""
     user_id = current_user["id"]
     mood_id = db.save_mood_entry(user_id, mood_data.mood, mood_data.notes)
     
+    # Score the notes once, right after the write, so insights never re-run inference
+    if mood_data.notes:
+        background_tasks.add_task(score_mood_notes, mood_id, mood_data.notes)
+    
     return {
         "id": mood_id,
         "mood": mood_data.mood,
@@ -267,22 +582,40 @@ async def get_mood_insights(current_user: dict = Depends(get_current_user)):
     insights = ai_service.get_mood_insights(mood_history)
     return insights
 
+def seed_conversation_sentiment(user_id: int):
+    """Build the rolling sentiment state from recent chat history (once per user)"""
+    chat_history = db.get_chat_history(user_id, limit=20)
+    if not chat_history:
+        return None
+    
+    # History is newest first; reuse stored per-message scores where available
+    score_history = [
+        parse_emotion_scores(chat["emotion_scores"]) or ai_service.detect_emotion(chat["user_message"])
+        for chat in reversed(chat_history)
+    ]
+    emotion_vector = seed_emotion_vector(score_history)
+    db.save_conversation_sentiment(user_id, emotion_vector, len(chat_history))
+    return {"emotion_vector": emotion_vector, "message_count": len(chat_history)}
+
+def get_conversation_sentiment(user_id: int):
+    """Rolling conversation sentiment for a user, seeding it on first read"""
+    state = db.get_conversation_sentiment(user_id) or seed_conversation_sentiment(user_id)
+    if not state:
+        return summarize_sentiment(None), 0
+    return summarize_sentiment(state["emotion_vector"]), state["message_count"]
+
 @app.get("/chat/analysis")
 async def analyze_conversation(current_user: dict = Depends(get_current_user)):
     """Analyze conversation sentiment and emotions"""
     user_id = current_user["id"]
-    chat_history = db.get_chat_history(user_id, limit=20)
-    
-    # Extract user messages for analysis
-    user_messages = [chat["user_message"] for chat in chat_history]
     
-    # Analyze conversation sentiment
-    analysis = ai_service.analyze_conversation_sentiment(user_messages)
+    # O(1) read of the rolling state maintained by /chat/send
+    analysis, message_count = get_conversation_sentiment(user_id)
     
     return {
         "conversation_analysis": analysis,
-        "total_messages": len(user_messages),
-        "recent_messages_analyzed": min(20, len(user_messages))
+        "total_messages": message_count,
+        "recent_messages_analyzed": message_count
     }
 
 @app.get("/")
@@ -302,10 +635,8 @@ async def get_dashboard_insights(current_user: dict = Depends(get_current_user))
     # Get mood history
     mood_history = db.get_mood_history(user_id, limit=30)
     
-    # Get chat analysis
-    chat_history = db.get_chat_history(user_id, limit=20)
-    user_messages = [chat["user_message"] for chat in chat_history]
-    conversation_analysis = ai_service.analyze_conversation_sentiment(user_messages)
+    # Get chat analysis from the rolling sentiment state
+    conversation_analysis, _ = get_conversation_sentiment(user_id)
     
     # Generate comprehensive insights
     insights = {
@@ -699,14 +1030,58 @@ def generate_quiz_suggestions(quiz_results):
     
     return suggestions[:6]  # Limit to 6 suggestions
 
+def get_ai_readiness():
+    """Readiness/loading status of the AI service"""
+    if ai_manager is not None:
+        return ai_manager.status()
+    return {"state": "ready", "ready": True, "serving": "remote", "progress": 1.0, "stages": {}}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    readiness = get_ai_readiness()
     return {
         "status": "healthy",
         "service": "CuraCore Backend",
-        "ai_service": "full" if "ai_service" in str(type(ai_service)) else "lite"
+        "ai_service": readiness["serving"],
+        "ai_state": readiness["state"]
+    }
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the AI models have finished loading"""
+    readiness = get_ai_readiness()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if readiness["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=readiness
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """Performance counters for caches and AI services"""
+    metrics = {
+        "emotion_cache": get_emotion_cache().stats()
     }
+    if hasattr(ai_service, "stats"):
+        metrics["inference_client"] = dict(ai_service.stats)
+    if hasattr(ai_service, "memory_report"):
+        metrics["ai_components"] = ai_service.memory_report()
+    if hasattr(ai_service, "thread_report"):
+        metrics["inference_threads"] = ai_service.thread_report()
+    if hasattr(ai_service, "cascade_stats"):
+        metrics["cascade"] = ai_service.cascade_stats()
+    metrics["priority_lanes"] = scheduler_stats()
+    metrics["gemini_client"] = get_gemini_client().stats()
+    metrics["response_cache"] = get_response_cache().stats()
+    metrics["conversation_context"] = conversation_context.stats()
+    metrics["chat_stages"] = stage_timing_stats()
+    metrics["chat_writes"] = {**chat_writes.stats(), "ids": chat_ids.stats()}
+    return metrics
 
 if __name__ == "__main__":
     import uvicorn
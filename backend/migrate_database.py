@@ -42,8 +42,20 @@ def migrate_database(db_path="users.db"):
                 ADD COLUMN emotion_scores TEXT
             ''')
         
+        # Mood entries store emotion scores computed at write time
+        cursor.execute("PRAGMA table_info(mood_entries)")
+        mood_columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'emotion_scores' not in mood_columns:
+            logger.info("Adding mood_entries.emotion_scores column...")
+            cursor.execute('''
+                ALTER TABLE mood_entries 
+                ADD COLUMN emotion_scores TEXT
+            ''')
+        
         conn.commit()
         logger.info("✅ Database migration completed successfully")
+        logger.info("💡 Run 'python backfill_mood_emotions.py' to score existing mood notes")
         
         # Verify the migration
         cursor.execute("PRAGMA table_info(chat_conversations)")
@@ -0,0 +1,187 @@
+"""
+Priority lanes for crisis-flagged work
+
+Chat requests pass through three bounded stages: emotion inference, the
+LLM call and database writes. Each stage has a `PriorityScheduler` with a
+fixed number of slots. Work in the "crisis" lane is admitted ahead of any
+queued routine work, and some slots are reserved so that routine traffic
+can never fill a stage completely. Running work is never interrupted;
+crisis work goes first at admission.
+
+Blocking calls run on the default thread pool once admitted and coroutines
+are awaited directly, so the event loop stays free while a stage is busy. Each stage keeps wait and end-to-end
+latency samples per lane and counts how often a lane exceeded its latency
+budget.
+"""
+
+import asyncio
+import contextlib
+import functools
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from config import (
+    SCHEDULER_INFERENCE_CONCURRENCY, SCHEDULER_LLM_CONCURRENCY, SCHEDULER_WRITE_CONCURRENCY,
+    CRISIS_RESERVED_SLOTS, CRISIS_LATENCY_BUDGET_SECONDS, ROUTINE_LATENCY_BUDGET_SECONDS
+)
+
+# Lanes in priority order (first is served first)
+LANES = ("crisis", "routine")
+_LANE_PRIORITY = {lane: index for index, lane in enumerate(LANES)}
+# Latency samples kept per lane for percentiles
+_SAMPLE_WINDOW = 1024
+
+
+def lane_for(crisis_info: Optional[Dict]) -> str:
+    """Lane for a message given its detect_crisis result"""
+    if crisis_info and crisis_info.get('crisis_detected') and crisis_info.get('severity') == 'high':
+        return "crisis"
+    return "routine"
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+
+class PriorityScheduler:
+    """Bounded async stage that admits crisis work before routine work"""
+
+    def __init__(self, name: str, capacity: int, reserved: int = CRISIS_RESERVED_SLOTS,
+                 budgets: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.capacity = max(1, capacity)
+        # Routine work may never take the last `reserved` slots
+        self.reserved = min(max(0, reserved), self.capacity - 1)
+        self.budgets = budgets or {"crisis": CRISIS_LATENCY_BUDGET_SECONDS, "routine": ROUTINE_LATENCY_BUDGET_SECONDS}
+        self.in_use = 0
+        self._waiters: List = []  # heap of (priority, sequence, lane, future)
+        self._sequence = itertools.count()
+        self._lanes = {
+            lane: {
+                "completed": 0,
+                "failed": 0,
+                "budget_misses": 0,
+                "waits": deque(maxlen=_SAMPLE_WINDOW),
+                "latencies": deque(maxlen=_SAMPLE_WINDOW),
+            }
+            for lane in LANES
+        }
+
+    def _limit(self, lane: str) -> int:
+        return self.capacity if lane == "crisis" else self.capacity - self.reserved
+
+    def _dispatch(self):
+        """Hand free slots to the highest-priority waiters"""
+        while self._waiters:
+            _, _, lane, future = self._waiters[0]
+            if future.done():
+                # Waiter was cancelled
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_use >= self._limit(lane):
+                break
+            heapq.heappop(self._waiters)
+            self.in_use += 1
+            future.set_result(None)
+
+    async def acquire(self, lane: str = "routine"):
+        """Wait for a slot in this stage"""
+        priority = _LANE_PRIORITY[lane]
+        queued_ahead = any(not f.done() and p <= priority for p, _, _, f in self._waiters)
+        if not queued_ahead and self.in_use < self._limit(lane):
+            self.in_use += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), lane, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as the caller gave up: pass it on
+                self.release()
+            raise
+
+    def release(self):
+        self.in_use -= 1
+        self._dispatch()
+
+    async def run(self, lane: str, fn, *args, **kwargs):
+        """Run a blocking call in this stage's lane and record its wait and latency"""
+        loop = asyncio.get_running_loop()
+        return await self.run_async(lane, lambda: loop.run_in_executor(None, functools.partial(fn, *args, **kwargs)))
+
+    async def run_async(self, lane: str, coroutine_fn, *args, **kwargs):
+        """Await a coroutine in this stage's lane and record its wait and latency"""
+        async with self.slot(lane):
+            return await coroutine_fn(*args, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, lane: str = "routine"):
+        """Hold a slot for the body of an `async with` block (e.g. while streaming)"""
+        start = time.perf_counter()
+        await self.acquire(lane)
+        admitted = time.perf_counter()
+        stats = self._lanes[lane]
+        try:
+            yield
+        except Exception:
+            stats["failed"] += 1
+            raise
+        finally:
+            self.release()
+            latency = time.perf_counter() - start
+            stats["waits"].append(admitted - start)
+            stats["latencies"].append(latency)
+            if latency > self.budgets.get(lane, float("inf")):
+                stats["budget_misses"] += 1
+        stats["completed"] += 1
+
+    def stats(self) -> Dict:
+        """Slot usage plus per-lane wait/latency percentiles and budget misses"""
+        queued = {lane: 0 for lane in LANES}
+        for _, _, lane, future in self._waiters:
+            if not future.done():
+                queued[lane] += 1
+        lanes = {}
+        for lane, info in self._lanes.items():
+            waits, latencies = list(info["waits"]), list(info["latencies"])
+            lanes[lane] = {
+                "completed": info["completed"],
+                "failed": info["failed"],
+                "queued": queued[lane],
+                "wait_p50_ms": 1000.0 * _percentile(waits, 50),
+                "wait_p99_ms": 1000.0 * _percentile(waits, 99),
+                "latency_p50_ms": 1000.0 * _percentile(latencies, 50),
+                "latency_p99_ms": 1000.0 * _percentile(latencies, 99),
+                "budget_seconds": self.budgets.get(lane),
+                "budget_misses": info["budget_misses"],
+            }
+        return {"capacity": self.capacity, "reserved_for_crisis": self.reserved, "in_use": self.in_use, "lanes": lanes}
+
+
+_schedulers: Dict[str, PriorityScheduler] = {}
+
+
+def get_scheduler(name: str) -> PriorityScheduler:
+    """Process-wide scheduler for a stage (inference, llm or writes)"""
+    if name not in _schedulers:
+        capacity = {
+            "inference": SCHEDULER_INFERENCE_CONCURRENCY,
+            "llm": SCHEDULER_LLM_CONCURRENCY,
+            "writes": SCHEDULER_WRITE_CONCURRENCY,
+        }[name]
+        _schedulers[name] = PriorityScheduler(name, capacity)
+    return _schedulers[name]
+
+
+def scheduler_stats() -> Dict:
+    """Stats for every stage scheduler created so far"""
+    return {name: scheduler.stats() for name, scheduler in _schedulers.items()}
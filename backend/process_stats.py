@@ -0,0 +1,19 @@
+"""
+Process resource helpers shared by the AI services and health endpoints
+"""
+
+import os
+import resource
+import sys
+
+
+def current_rss_mb() -> float:
+    """Current resident set size of this process in MB (peak RSS where unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux and bytes on macOS
+        return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
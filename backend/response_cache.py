@@ -0,0 +1,187 @@
+"""
+Per-user cache of chat replies
+
+Greetings, common "how do I ..." questions and exact repeats of a message
+each cost a full Gemini round trip. `ResponseCache` keeps recent replies
+per user, keyed by the normalized message and a coarse bucket of the mood
+context, so a repeat within the TTL is answered without calling the LLM.
+Users never share entries.
+
+The prompt also carries the conversation so far, which changes with every
+turn, so keying on all of it would never hit. `cache_scope` decides what a
+reply may depend on instead:
+
+- greetings, how-to questions, an exact repeat of the last message and
+  messages with no conversation yet are keyed on message and mood only;
+- short follow-ups such as "yes" or "tell me more" also key on the last
+  turn, since that is what they answer;
+- any other message with conversation context skips the lookup. Its reply
+  is still stored, so an exact repeat of it can be answered next turn.
+
+Only genuine Gemini replies are stored (never fallbacks), and callers must
+not consult the cache for crisis messages. Hit rate and the LLM time the
+hits saved are reported by `stats()`.
+"""
+
+import hashlib
+import threading
+from typing import Dict, Hashable, NamedTuple, Optional
+
+from config import RESPONSE_CACHE_USERS, RESPONSE_CACHE_PER_USER, RESPONSE_CACHE_TTL_SECONDS
+from emotion_cache import normalize_text
+from ttl_cache import TTLCache
+
+# Mood score buckets: replies are reused within the same label and bucket
+_SCORE_BUCKETS = ("low", "medium", "high")
+# Replies to these don't depend on the conversation
+_GREETINGS = frozenset({
+    "hi", "hello", "hey", "hi there", "hello there", "hey there", "good morning", "good afternoon",
+    "good evening", "thanks", "thank you", "thank you so much",
+})
+_TEMPLATE_PREFIXES = (
+    "how do i ", "how can i ", "how to ", "what is ", "what are ", "what's ", "tips for ", "ways to ",
+)
+# Short follow-ups answer the last reply
+_FOLLOW_UPS = frozenset({
+    "yes", "yeah", "yep", "no", "nope", "ok", "okay", "sure", "why", "how", "really", "please",
+    "tell me more", "go on", "more", "what do you mean", "what else", "and then",
+})
+
+
+class CachedReply(NamedTuple):
+    text: str
+    mood_update: Optional[str]
+    seconds: float  # how long the LLM took to produce it
+
+
+def mood_bucket(mood_context: Dict) -> str:
+    """Coarse mood context: label plus low/medium/high score"""
+    label = str(mood_context.get('mood_label') or 'neutral').lower()
+    try:
+        score = float(mood_context.get('mood_score', 0.5))
+    except (TypeError, ValueError):
+        score = 0.5
+    index = min(len(_SCORE_BUCKETS) - 1, max(0, int(score * len(_SCORE_BUCKETS))))
+    return f"{label}:{_SCORE_BUCKETS[index]}"
+
+
+def normalize_message(message: str) -> str:
+    """Message as compared by the cache: case and trailing punctuation are ignored"""
+    return normalize_text(message).casefold().rstrip(" .!?")
+
+
+def cache_scope(message: str, context) -> Optional[str]:
+    """What a cached reply to `message` may depend on besides the mood
+    
+    `context` is the ConversationContext sent with the prompt. Returns "" when
+    the reply doesn't depend on the conversation, a fingerprint of the last turn
+    for short follow-ups, or None when the reply depends on the whole
+    conversation and must not be looked up.
+    """
+    text = normalize_message(message)
+    turns = context.turns
+    if not turns and not context.summary:
+        return ""
+    if text in _GREETINGS or text.startswith(_TEMPLATE_PREFIXES):
+        return ""
+    if turns and text == normalize_message(turns[-1].user_message):
+        return ""
+    if text in _FOLLOW_UPS and turns:
+        last = turns[-1]
+        turn = f"{last.chat_id}\x00{last.user_message}\x00{last.bot_response}".encode("utf-8")
+        return "turn:" + hashlib.sha256(turn).hexdigest()
+    return None
+
+
+def response_cache_key(message: str, mood_context: Dict, scope: str = "") -> str:
+    """Key for a message under a mood bucket and cache scope"""
+    payload = f"{mood_bucket(mood_context)}\x00{scope}\x00{normalize_message(message)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ResponseCache:
+    """LRU of users, each with a small TTL cache of replies"""
+
+    def __init__(self, max_users: int = RESPONSE_CACHE_USERS, per_user: int = RESPONSE_CACHE_PER_USER,
+                 ttl_seconds: Optional[float] = RESPONSE_CACHE_TTL_SECONDS):
+        self.enabled = per_user > 0
+        self.per_user = per_user
+        self.ttl_seconds = ttl_seconds
+        self._users = TTLCache(max_size=max_users, ttl_seconds=None)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "skipped_context": 0,
+                       "saved_seconds": 0.0}
+
+    def _user_cache(self, user_id: Hashable, create: bool) -> Optional[TTLCache]:
+        with self._lock:
+            cache = self._users.get(user_id)
+            if cache is None and create:
+                cache = TTLCache(max_size=self.per_user, ttl_seconds=self.ttl_seconds)
+                self._users.set(user_id, cache)
+            return cache
+
+    def get(self, user_id: Hashable, message: str, mood_context: Dict,
+            scope: Optional[str] = "") -> Optional[CachedReply]:
+        """Cached reply for this user, message, mood bucket and scope (see cache_scope), or None"""
+        if not self.enabled:
+            return None
+        if scope is None:
+            with self._lock:
+                self._stats["skipped_context"] += 1
+            return None
+        cache = self._user_cache(user_id, create=False)
+        key = response_cache_key(message, mood_context, scope)
+        reply = cache.get(key) if cache is not None else None
+        with self._lock:
+            if reply is None:
+                self._stats["misses"] += 1
+            else:
+                self._stats["hits"] += 1
+                self._stats["saved_seconds"] += reply.seconds
+        return reply
+
+    def set(self, user_id: Hashable, message: str, mood_context: Dict,
+            text: str, mood_update: Optional[str], seconds: float, scope: Optional[str] = "") -> None:
+        """Store a Gemini reply and how long it took"""
+        if not self.enabled:
+            return
+        cache = self._user_cache(user_id, create=True)
+        # A context-dependent reply is kept for an exact repeat of the message
+        key = response_cache_key(message, mood_context, "" if scope is None else scope)
+        cache.set(key, CachedReply(text, mood_update, seconds))
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def bypass(self) -> None:
+        """Count a message that skipped the cache (crisis)"""
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def clear_user(self, user_id: Hashable) -> None:
+        self._users.delete(user_id)
+
+    def stats(self) -> Dict:
+        """Hit rate (of the lookups made), LLM time saved by hits and occupancy"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "enabled": self.enabled,
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+            "mean_saved_ms": 1000.0 * stats["saved_seconds"] / stats["hits"] if stats["hits"] else 0.0,
+            "users": len(self._users),
+            "per_user": self.per_user,
+            "ttl_seconds": self.ttl_seconds,
+        })
+        return stats
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide reply cache"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
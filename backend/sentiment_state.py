@@ -0,0 +1,84 @@
+"""
+Rolling per-user conversation sentiment
+
+Instead of re-running emotion inference over a user's recent chat history
+on every analysis view, each user keeps an exponentially weighted emotion
+vector. `/chat/send` folds in the scores it already computed for the new
+message, so reading conversation sentiment is O(1).
+"""
+
+import ast
+import json
+from typing import Dict, Iterable, Optional
+
+from config import CONVERSATION_SENTIMENT_ALPHA
+
+
+def blend_emotion_vector(
+    previous: Optional[Dict[str, float]],
+    scores: Dict[str, float],
+    alpha: float = CONVERSATION_SENTIMENT_ALPHA
+) -> Dict[str, float]:
+    """Exponentially weighted update: new = alpha * scores + (1 - alpha) * previous"""
+    if not previous:
+        return dict(scores)
+
+    labels = set(previous) | set(scores)
+    return {
+        label: alpha * scores.get(label, 0.0) + (1.0 - alpha) * previous.get(label, 0.0)
+        for label in labels
+    }
+
+
+def seed_emotion_vector(
+    score_history: Iterable[Dict[str, float]],
+    alpha: float = CONVERSATION_SENTIMENT_ALPHA
+) -> Optional[Dict[str, float]]:
+    """Build a rolling vector from per-message scores, oldest first"""
+    vector = None
+    for scores in score_history:
+        vector = blend_emotion_vector(vector, scores, alpha)
+    return vector
+
+
+def summarize_sentiment(emotions: Optional[Dict[str, float]]) -> Dict:
+    """Classify an emotion vector as positive / negative / neutral overall"""
+    if not emotions:
+        return {"overall_sentiment": "neutral", "confidence": 0.0}
+
+    positive_emotions = emotions.get('joy', 0)
+    negative_emotions = emotions.get('sadness', 0) + emotions.get('anger', 0) + emotions.get('fear', 0)
+    neutral_emotions = emotions.get('neutral', 0)
+
+    if positive_emotions > negative_emotions and positive_emotions > neutral_emotions:
+        sentiment = "positive"
+        confidence = positive_emotions
+    elif negative_emotions > positive_emotions and negative_emotions > neutral_emotions:
+        sentiment = "negative"
+        confidence = negative_emotions
+    else:
+        sentiment = "neutral"
+        confidence = neutral_emotions
+
+    return {
+        "overall_sentiment": sentiment,
+        "confidence": confidence,
+        "emotion_breakdown": emotions
+    }
+
+
+def parse_emotion_scores(raw) -> Optional[Dict[str, float]]:
+    """Parse emotion scores stored on chat rows (JSON or legacy Python repr)"""
+    if not raw:
+        return None
+    if isinstance(raw, dict):
+        return raw
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = ast.literal_eval(raw)
+        return parsed if isinstance(parsed, dict) else None
+    except (ValueError, SyntaxError):
+        return None
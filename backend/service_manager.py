@@ -0,0 +1,146 @@
+"""
+Background loading of the full AI service with readiness gating
+
+`AIServiceManager` is what `main.py` exposes as `ai_service`. It answers
+immediately with the lightweight keyword service and loads the
+transformer-based service on a background thread. Once the models are
+loaded, calls are routed to the full service. Loading progress is exposed
+for the liveness/readiness endpoints, so a restarting instance keeps
+serving (in lite mode) instead of blocking server start.
+"""
+
+import importlib.util
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from ai_service_lite import AIService as LiteAIService
+
+logger = logging.getLogger(__name__)
+
+# Stages reported while the full service loads, in order
+LOAD_STAGES = ["import", "emotion_model", "chat_model", "warm_up"]
+
+
+def full_ai_available() -> bool:
+    """Whether the full AI service's dependencies are installed (without importing them)"""
+    return all(importlib.util.find_spec(module) is not None for module in ("torch", "transformers"))
+
+
+class AIServiceManager:
+    """Serves the lite AI service until the full one has finished loading"""
+
+    def __init__(self, load_full: Optional[bool] = None):
+        self.lite = LiteAIService()
+        self.full = None
+        self.load_full = full_ai_available() if load_full is None else load_full
+        self.state = "loading" if self.load_full else "lite"
+        self.error = None
+        self.started_at = None
+        self.ready_at = None
+        self.stages: Dict[str, Dict] = {stage: {"status": "pending"} for stage in LOAD_STAGES}
+        self._lock = threading.Lock()
+        self._thread = None
+        # Crisis keyword lists reloaded before the full service finished loading
+        self._crisis_keywords = None
+
+    @property
+    def active(self):
+        """The service currently answering requests"""
+        return self.full if self.full is not None else self.lite
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("ready", "lite", "failed")
+
+    def __getattr__(self, name):
+        # Only called for attributes not defined on the manager: delegate to the active service
+        if name.startswith("_") or name in ("lite", "full"):
+            raise AttributeError(name)
+        return getattr(self.active, name)
+
+    def start_background_load(self):
+        """Start loading the full AI service on a daemon thread (idempotent)"""
+        with self._lock:
+            if not self.load_full or self._thread is not None:
+                return
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._load, name="ai-model-loader", daemon=True)
+            self._thread.start()
+        logger.info("Loading full AI models in the background; serving lite AI service meanwhile")
+
+    def _set_stage(self, stage: str, status: str):
+        with self._lock:
+            info = self.stages.setdefault(stage, {"status": "pending"})
+            now = time.time()
+            if status == "loading":
+                info["started_at"] = now
+            elif "started_at" in info:
+                info["duration_seconds"] = round(now - info["started_at"], 3)
+            info["status"] = status
+
+    def _load(self):
+        try:
+            self._set_stage("import", "loading")
+            from ai_service import AIService
+            self._set_stage("import", "loaded")
+
+            full = AIService(progress_callback=self._set_stage)
+
+            # Warm the models before routing traffic to them; a failed warm-up doesn't block readiness
+            self._set_stage("warm_up", "loading")
+            try:
+                full.warm_up()
+                self._set_stage("warm_up", "loaded")
+            except Exception as e:
+                logger.warning(f"AI model warm-up failed: {e}")
+                self._set_stage("warm_up", "failed")
+        except Exception as e:
+            logger.error(f"Full AI service failed to load, staying on lite AI service: {e}")
+            with self._lock:
+                self.state = "failed"
+                self.error = str(e)
+            return
+
+        with self._lock:
+            if self._crisis_keywords is not None:
+                full.reload_keywords(crisis_keywords=self._crisis_keywords)
+            self.full = full
+            self.state = "ready"
+            self.ready_at = time.time()
+        logger.info(f"✓ Full AI service ready after {self.ready_at - self.started_at:.1f}s")
+
+    def reload_keywords(self, crisis_keywords=None, emotion_keywords=None):
+        """Reload keyword lists in the lite service and, for crisis keywords, the full one"""
+        self.lite.reload_keywords(crisis_keywords=crisis_keywords, emotion_keywords=emotion_keywords)
+        if crisis_keywords is not None:
+            with self._lock:
+                self._crisis_keywords = crisis_keywords
+                full = self.full
+            if full is not None:
+                full.reload_keywords(crisis_keywords=crisis_keywords)
+
+    @property
+    def service_name(self) -> str:
+        return "full" if self.full is not None else "lite"
+
+    def status(self) -> Dict:
+        """Readiness and loading progress for health endpoints"""
+        with self._lock:
+            done = sum(1 for info in self.stages.values() if info["status"] in ("loaded", "failed", "deferred"))
+            status = {
+                "state": self.state,
+                "ready": self.ready,
+                "serving": self.service_name,
+                "progress": done / len(self.stages) if self.load_full else 1.0,
+                "stages": {stage: dict(info) for stage, info in self.stages.items()} if self.load_full else {},
+            }
+            if self.started_at:
+                end = self.ready_at or time.time()
+                status["load_seconds"] = round(end - self.started_at, 3)
+            if self.full is not None and self.full.warmup_report is not None:
+                status["warm_up"] = self.full.warmup_report
+            if self.error:
+                status["error"] = self.error
+            return status
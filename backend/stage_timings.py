@@ -0,0 +1,127 @@
+"""
+Per-stage timings for request handlers that fan out independent work
+
+`/chat/send` runs emotion inference, the latest-mood lookup and the
+conversation context load concurrently, then starts the Gemini call as soon
+as all three are ready. A `StageTrace` times each stage of one request;
+`StageTimings` aggregates finished traces so `/metrics` can show that the
+end-to-end latency tracks the slowest stage rather than the sum of all of
+them.
+
+Usage:
+    trace = StageTrace()
+    crisis_info = trace.call("crisis", detect_crisis, message)
+    emotion = trace.start("emotion", run_emotion(message))
+    mood = trace.start("mood_lookup", load_mood(user_id))
+    ...
+    reply = await trace.run("gemini", call_gemini(...))
+    get_stage_timings("chat_send").record(trace)
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Dict, Optional
+
+# Samples kept per stage for percentiles
+_SAMPLE_WINDOW = 1024
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+
+class StageTrace:
+    """Stage durations of a single request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def call(self, stage: str, fn, *args, **kwargs):
+        """Run a quick synchronous step and time it"""
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.stages[stage] = time.perf_counter() - start
+
+    async def run(self, stage: str, awaitable: Awaitable):
+        """Await a stage and time it"""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.stages[stage] = time.perf_counter() - start
+
+    def start(self, stage: str, awaitable: Awaitable) -> asyncio.Task:
+        """Start a stage concurrently; await the returned task for its result"""
+        return asyncio.ensure_future(self.run(stage, awaitable))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class StageTimings:
+    """Per-stage and end-to-end latency percentiles over recent requests"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._stages: Dict[str, deque] = {}
+        self._end_to_end = deque(maxlen=_SAMPLE_WINDOW)
+        # What the same request would have taken with every stage run back to back
+        self._serial = deque(maxlen=_SAMPLE_WINDOW)
+
+    def record(self, trace: StageTrace, total: Optional[float] = None) -> None:
+        """Add a finished request"""
+        total = trace.elapsed() if total is None else total
+        with self._lock:
+            self._requests += 1
+            for stage, seconds in trace.stages.items():
+                self._stages.setdefault(stage, deque(maxlen=_SAMPLE_WINDOW)).append(seconds)
+            self._end_to_end.append(total)
+            self._serial.append(sum(trace.stages.values()))
+
+    def stats(self) -> Dict:
+        """p50/p99 per stage and end to end, plus the serial sum for comparison"""
+        with self._lock:
+            stages = {stage: list(samples) for stage, samples in self._stages.items()}
+            end_to_end, serial = list(self._end_to_end), list(self._serial)
+            requests = self._requests
+        saved = [s - e for s, e in zip(serial, end_to_end)]
+        return {
+            "requests": requests,
+            "stages": {
+                stage: {
+                    "p50_ms": 1000.0 * _percentile(samples, 50),
+                    "p99_ms": 1000.0 * _percentile(samples, 99),
+                }
+                for stage, samples in stages.items()
+            },
+            "end_to_end_p50_ms": 1000.0 * _percentile(end_to_end, 50),
+            "end_to_end_p99_ms": 1000.0 * _percentile(end_to_end, 99),
+            "serial_sum_p50_ms": 1000.0 * _percentile(serial, 50),
+            "overlap_saved_mean_ms": 1000.0 * sum(saved) / len(saved) if saved else 0.0,
+        }
+
+
+_stage_timings: Dict[str, StageTimings] = {}
+
+
+def get_stage_timings(name: str) -> StageTimings:
+    """Process-wide timings for a handler (e.g. "chat_send")"""
+    if name not in _stage_timings:
+        _stage_timings[name] = StageTimings(name)
+    return _stage_timings[name]
+
+
+def stage_timing_stats() -> Dict:
+    """Stats for every handler traced so far"""
+    return {name: timings.stats() for name, timings in _stage_timings.items()}
@@ -6,6 +6,9 @@ This script tests the Gemini client functionality including:
 - Response generation
 - Mood context injection
 - Mood update detection
+
+Run with --fake to test against the local stand-in server
+(fake_gemini_server.py) instead of the real API; no key or network needed.
 """
 
 import os
@@ -17,7 +20,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 from gemini_client import GeminiClient
 
 
-def test_gemini_client():
+def test_gemini_client(api_base=None):
     """Test Gemini client initialization and basic functionality"""
     print("=" * 60)
     print("GEMINI API INTEGRATION TEST")
@@ -38,8 +41,8 @@ def test_gemini_client():
     print("TEST 1: Initialize Gemini Client")
     print("-" * 60)
     try:
-        client = GeminiClient()
-        if client.model:
+        client = GeminiClient(api_base=api_base) if api_base else GeminiClient()
+        if client.available:
             print("✓ Gemini client initialized successfully")
             print(f"  Model: {client.model_name}")
         else:
@@ -193,5 +196,13 @@ if __name__ == "__main__":
     from dotenv import load_dotenv
     load_dotenv()
     
-    success = test_gemini_client()
+    api_base = None
+    if "--fake" in sys.argv[1:]:
+        from fake_gemini_server import start_in_thread
+        fake_server = start_in_thread(latency=0.05, seed=0)
+        api_base = fake_server.base_url
+        os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+        print(f"🧪 Using fake Gemini server at {api_base}")
+    
+    success = test_gemini_client(api_base)
     sys.exit(0 if success else 1)
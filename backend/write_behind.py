@@ -0,0 +1,210 @@
+"""
+Write-behind persistence for chat turns
+
+`/chat/send` used to save the chat turn and up to two mood entries before
+returning, so every reply waited on the disk. The handler now allocates the
+chat id up front, returns the reply and hands the writes to a
+`WriteBehindQueue`:
+
+- Jobs for the same user run one at a time, in submission order, so a
+  user's chat turns and mood entries land in the order they happened.
+  Different users' jobs run concurrently (bounded by the "writes" stage of
+  the priority scheduler, so crisis turns are still written first).
+- A job is a list of steps. A failed step is retried with exponential
+  backoff, resuming at the step that failed; steps that already succeeded
+  are not repeated. After `WRITE_BEHIND_MAX_ATTEMPTS` the job is dropped,
+  logged and counted as `failed` in `stats()`, and the user's next job goes
+  ahead. The unsaved writes of a dropped job are lost.
+
+Chat ids come from an `IdBlockAllocator`, which reserves blocks of ids in
+the database (`Database.reserve_id_block`) ahead of need and hands them out
+from memory.
+Saving a turn under its id is idempotent, so a retry never duplicates it.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, List, Optional
+
+from config import WRITE_BEHIND_MAX_ATTEMPTS, WRITE_BEHIND_RETRY_SECONDS, CHAT_ID_BLOCK_SIZE
+from priority_scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Queue lag samples kept for percentiles
+_SAMPLE_WINDOW = 1024
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+
+class IdBlockAllocator:
+    """Hands out ids for a table from blocks reserved in the database
+
+    Ids are handed out on the event loop. The database is only touched on the
+    default executor: once half of the current block is used, the next block
+    is reserved in the background, so a request waits on SQLite only if it
+    drains a whole block before that reservation lands.
+    """
+
+    def __init__(self, db, table: str, block_size: int = CHAT_ID_BLOCK_SIZE):
+        self.db = db
+        self.table = table
+        self.block_size = max(1, block_size)
+        self._next = 0
+        self._end = 0  # exclusive
+        self._spare: Optional[int] = None  # start of a reserved block not yet in use
+        self._reserving: Optional[asyncio.Future] = None
+        self._blocks_reserved = 0
+        self._waits = 0
+
+    async def next_id(self) -> int:
+        """Next id; call from the event loop"""
+        while self._next >= self._end:
+            if self._spare is not None:
+                self._next, self._end, self._spare = self._spare, self._spare + self.block_size, None
+                break
+            self._waits += 1
+            # Shielded: a cancelled request must not cancel a reservation others wait on
+            await asyncio.shield(self._reserve_ahead())
+        chat_id = self._next
+        self._next += 1
+        if self._spare is None and self._end - self._next <= self.block_size // 2:
+            self._reserve_ahead()
+        return chat_id
+
+    def _reserve_ahead(self) -> asyncio.Future:
+        """Reserve the next block on the executor (at most one reservation in flight)"""
+        if self._reserving is None:
+            loop = asyncio.get_running_loop()
+            self._reserving = loop.run_in_executor(None, self.db.reserve_id_block, self.table, self.block_size)
+            self._reserving.add_done_callback(self._on_reserved)
+        return self._reserving
+
+    def _on_reserved(self, future: asyncio.Future):
+        # Runs before any waiter resumes, so they find the spare block in place
+        self._reserving = None
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Could not reserve {self.table} ids: {error}")
+            return
+        self._spare = future.result()
+        self._blocks_reserved += 1
+
+    def stats(self) -> Dict:
+        return {
+            "table": self.table,
+            "block_size": self.block_size,
+            "blocks_reserved": self._blocks_reserved,
+            "ids_left_in_block": self._end - self._next,
+            "next_block_ready": self._spare is not None,
+            "waits": self._waits,
+        }
+
+
+class _Job:
+    __slots__ = ("lane", "steps", "next_step", "attempts", "submitted")
+
+    def __init__(self, lane: str, steps: List[Callable]):
+        self.lane = lane
+        self.steps = steps
+        self.next_step = 0
+        self.attempts = 0
+        self.submitted = time.perf_counter()
+
+
+class WriteBehindQueue:
+    """Per-user ordered background writes with retries"""
+
+    def __init__(self, name: str, max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS,
+                 retry_seconds: float = WRITE_BEHIND_RETRY_SECONDS):
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.retry_seconds = retry_seconds
+        # Queued jobs per user; a user has an entry only while their worker runs
+        self._queues: Dict[Hashable, Deque[_Job]] = {}
+        self._workers = set()
+        self._lags = deque(maxlen=_SAMPLE_WINDOW)
+        # "failed" counts dropped jobs, whose writes are lost
+        self._stats = {"submitted": 0, "completed": 0, "retries": 0, "failed": 0, "max_pending": 0}
+        self._last_failure: Optional[str] = None
+
+    def submit(self, user_id: Hashable, lane: str, steps: List[Callable]) -> None:
+        """Queue blocking write steps for a user; call from the event loop"""
+        job = _Job(lane, steps)
+        self._stats["submitted"] += 1
+        queue = self._queues.get(user_id)
+        if queue is not None:
+            queue.append(job)
+        else:
+            self._queues[user_id] = deque([job])
+            worker = asyncio.ensure_future(self._drain(user_id))
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+        self._stats["max_pending"] = max(self._stats["max_pending"], self.pending())
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def _drain(self, user_id: Hashable):
+        """Run a user's jobs in order until their queue is empty"""
+        queue = self._queues[user_id]
+        try:
+            while queue:
+                job = queue[0]
+                await self._run(user_id, job)
+                queue.popleft()
+        finally:
+            del self._queues[user_id]
+
+    async def _run(self, user_id: Hashable, job: _Job):
+        scheduler = get_scheduler("writes")
+        while job.next_step < len(job.steps):
+            try:
+                await scheduler.run(job.lane, job.steps[job.next_step])
+                job.next_step += 1
+            except Exception as e:
+                job.attempts += 1
+                if job.attempts >= self.max_attempts:
+                    self._stats["failed"] += 1
+                    self._last_failure = f"{type(e).__name__}: {e}"
+                    logger.error(f"Dropping {self.name} write for user {user_id} after "
+                                 f"{job.attempts} attempts: {e}")
+                    return
+                self._stats["retries"] += 1
+                delay = self.retry_seconds * 2 ** (job.attempts - 1)
+                logger.warning(f"{self.name} write for user {user_id} failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        self._stats["completed"] += 1
+        self._lags.append(time.perf_counter() - job.submitted)
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued writes to finish (e.g. at shutdown); False if some are still pending"""
+        while self._workers:
+            done, pending = await asyncio.wait(set(self._workers), timeout=timeout)
+            if pending:
+                return False
+        return True
+
+    def stats(self) -> Dict:
+        """Job counts, pending writes and submit-to-saved lag"""
+        lags = list(self._lags)
+        stats = dict(self._stats)
+        stats.update({
+            "pending": self.pending(),
+            "last_failure": self._last_failure,
+            "users_writing": len(self._queues),
+            "lag_p50_ms": 1000.0 * _percentile(lags, 50),
+            "lag_p99_ms": 1000.0 * _percentile(lags, 99),
+            "max_attempts": self.max_attempts,
+        })
+        return stats
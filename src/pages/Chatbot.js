@@ -10,6 +10,7 @@ const Chatbot = () => {
   const [messages, setMessages] = useState([]);
   const [inputMessage, setInputMessage] = useState('');
   const [isTyping, setIsTyping] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
   const [selectedMood, setSelectedMood] = useState('');
   const [showMoodSelector, setShowMoodSelector] = useState(false);
   const [moodHistory, setMoodHistory] = useState([]);
@@ -152,46 +153,123 @@ const Chatbot = () => {
     e.preventDefault();
     if (!inputMessage.trim()) return;
 
+    setInputMessage('');
+    await sendMessage(inputMessage, selectedMood || null);
+  };
+
+  const retryMessage = (message) => {
+    // Drop the cut-off reply and the message it answered, then send that message again
+    setMessages(prev => prev.filter(m => m.id !== message.id && m.id !== message.retryOf));
+    sendMessage(message.retryText, message.retryMood);
+  };
+
+  const sendMessage = async (text, mood) => {
     const userMessage = {
       id: `user-${Date.now()}`,
-      text: inputMessage,
+      text,
       sender: 'user',
       timestamp: new Date(),
-      mood: selectedMood || null
+      mood
     };
 
     setMessages(prev => [...prev, userMessage]);
-    setInputMessage('');
     setIsTyping(true);
     setShouldAutoScroll(true);
 
     try {
-      const response = await fetch(`${API_BASE_URL}/chat/send`, {
+      // Reply is streamed as server-sent events: meta, then chunks as Gemini writes them, then done
+      const response = await fetch(`${API_BASE_URL}/chat/stream`, {
         method: 'POST',
         headers: getAuthHeaders(),
         body: JSON.stringify({
-          message: inputMessage,
-          mood: selectedMood || null
+          message: text,
+          mood
         }),
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        const botMessage = {
-          id: `bot-${data.id}`,
-          text: data.bot_response,
-          sender: 'bot',
-          timestamp: new Date(),
-          mood: null
-        };
-        
-        setMessages(prev => [...prev, botMessage]);
-        
-        if (data.mood) {
-          loadMoodHistory();
+      if (!response.ok || !response.body) {
+        throw new Error(`Failed to send message (${response.status})`);
+      }
+
+      // Replaced by the server chat id from the done event, as used by /chat/history
+      let botMessageId = `bot-pending-${Date.now()}`;
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let replyText = '';
+      let started = false;
+      let finished = false;
+
+      const showReply = (text) => {
+        if (!started) {
+          started = true;
+          setIsTyping(false);
+          setIsStreaming(true);
+          setMessages(prev => [...prev, {
+            id: botMessageId,
+            text,
+            sender: 'bot',
+            timestamp: new Date(),
+            mood: null
+          }]);
+        } else {
+          setMessages(prev => prev.map(message => (
+            message.id === botMessageId ? { ...message, text } : message
+          )));
+        }
+      };
+
+      const handleEvent = (rawEvent) => {
+        let eventName = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach(line => {
+          if (line.startsWith('event:')) eventName = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        });
+        if (!data) return;
+        const payload = JSON.parse(data);
+
+        if (eventName === 'chunk') {
+          replyText += payload.text;
+          showReply(replyText);
+        } else if (eventName === 'done') {
+          finished = true;
+          showReply(payload.bot_response);
+          if (payload.truncated) {
+            // Cut off mid-reply: the server does not save it, so offer to ask again
+            setMessages(prev => prev.map(message => (
+              message.id === botMessageId
+                ? { ...message, incomplete: true, retryOf: userMessage.id, retryText: text, retryMood: mood }
+                : message
+            )));
+          } else if (payload.id != null) {
+            const pendingId = botMessageId;
+            botMessageId = `bot-${payload.id}`;
+            setMessages(prev => prev.map(message => (
+              message.id === pendingId ? { ...message, id: botMessageId } : message
+            )));
+          }
+          if (payload.mood_updated) {
+            // Gemini changed the mood; the entry is saved once the stream closes
+            setTimeout(loadMoodHistory, 500);
+          }
+        }
+      };
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+          handleEvent(buffer.slice(0, boundary));
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf('\n\n');
         }
-      } else {
-        throw new Error('Failed to send message');
+      }
+
+      if (!finished) {
+        throw new Error('Reply stream ended early');
       }
     } catch (error) {
       console.error('Failed to send message:', error);
@@ -214,6 +292,7 @@ const Chatbot = () => {
       setMessages(prev => [...prev, errorMessage]);
     } finally {
       setIsTyping(false);
+      setIsStreaming(false);
       setSelectedMood('');
     }
   };
@@ -361,6 +440,19 @@ const Chatbot = () => {
                           : 'bg-gray-100 text-gray-800'
                       }`}>
                         <p className="text-sm">{message.text}</p>
+                        {message.incomplete && (
+                          <div className="flex items-center space-x-2 mt-1 text-xs text-gray-500">
+                            <span>This reply was cut off.</span>
+                            <button
+                              type="button"
+                              onClick={() => retryMessage(message)}
+                              disabled={isTyping || isStreaming}
+                              className="text-purple-600 hover:text-purple-700 underline disabled:opacity-50"
+                            >
+                              Retry
+                            </button>
+                          </div>
+                        )}
                         <div className="flex items-center justify-between mt-1">
                           <p className={`text-xs ${
                             message.sender === 'user' ? 'text-purple-200' : 'text-gray-500'
@@ -450,13 +542,13 @@ const Chatbot = () => {
                 onChange={(e) => setInputMessage(e.target.value)}
                 placeholder="Share your thoughts..."
                 className="flex-1 p-3 border border-gray-300 rounded-full focus:outline-none focus:ring-2 focus:ring-purple-500 focus:border-transparent"
-                disabled={isTyping}
+                disabled={isTyping || isStreaming}
               />
               <motion.button
                 whileHover={{ scale: 1.05 }}
                 whileTap={{ scale: 0.95 }}
                 type="submit"
-                disabled={isTyping || !inputMessage.trim()}
+                disabled={isTyping || isStreaming || !inputMessage.trim()}
                 className="bg-gradient-to-r from-purple-600 to-blue-600 text-white p-3 rounded-full hover:from-purple-700 hover:to-blue-700 disabled:opacity-50 disabled:cursor-not-allowed transition-all duration-200"
               >
                 <Send className="w-5 h-5" />